@@ -0,0 +1,4 @@
+cdef extern from *:
+    ctypedef bint bool
+    ctypedef void* nullptr_t
+    nullptr_t nullptr
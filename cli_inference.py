@@ -1,22 +1,32 @@
 #!/usr/bin/env python
 import tensorflow as tf
 from keras_retinanet import models
-from keras_retinanet.utils.image import read_image_bgr, preprocess_image, resize_image, compute_resize_scale
+from keras_retinanet.utils.image import read_image_bgr_resized, preprocess_image
+from keras_retinanet.utils.inference_io import list_images, detections_to_json
 from keras_retinanet.utils.visualization import draw_box, draw_caption
 from keras_retinanet.utils.colors import label_color
+from keras_retinanet.utils.grid_cropper import ImageGridCropper
+from keras_retinanet.utils.tiling import predict_tiled
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import argparse
+import sys
 import numpy as np
 import time
 
 
 def parse_args(args):
     parser = argparse.ArgumentParser(description='convert model')
-    parser.add_argument(
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument(
         '--img',
         help='path to image',
-        type=str,
-        required=True
+        type=str
+    )
+    inputs.add_argument(
+        '--input',
+        help='directory or glob pattern with images for batched inference',
+        type=str
     )
     parser.add_argument(
         '--bin',
@@ -58,6 +68,74 @@ def parse_args(args):
         action='store_true',
         required=False,
     )
+    parser.add_argument(
+        '--batch-size',
+        help='batch size for --input mode (number of tiles per batch in --tiled mode)',
+        type=int,
+        required=False,
+        default=4
+    )
+    parser.add_argument(
+        '--workers',
+        help='number of threads decoding and preprocessing images in --input mode',
+        type=int,
+        required=False,
+        default=4
+    )
+    parser.add_argument(
+        '--output',
+        help='path to JSONL file with detections in --input and --tiled mode (defaults to stdout)',
+        type=str,
+        required=False,
+        default='-'
+    )
+    parser.add_argument(
+        '--score-threshold',
+        help='minimal score of reported detections',
+        type=float,
+        required=False,
+        default=0.5
+    )
+    parser.add_argument(
+        '--tiled',
+        help='run full resolution overlapping tiles instead of resizing the whole image',
+        action='store_true',
+        required=False,
+    )
+    parser.add_argument(
+        '--tile-width',
+        help='tile width in --tiled mode',
+        type=int,
+        required=False,
+        default=1333
+    )
+    parser.add_argument(
+        '--tile-height',
+        help='tile height in --tiled mode',
+        type=int,
+        required=False,
+        default=800
+    )
+    parser.add_argument(
+        '--tile-overlap',
+        help='overlap of neighbouring tiles in pixels in --tiled mode',
+        type=int,
+        required=False,
+        default=200
+    )
+    parser.add_argument(
+        '--nms-threshold',
+        help='IoU threshold for merging detections of neighbouring tiles in --tiled mode',
+        type=float,
+        required=False,
+        default=0.5
+    )
+    parser.add_argument(
+        '--preprocess-in-graph',
+        help='feed uint8 images and normalize them inside the network',
+        action='store_true',
+        required=False,
+    )
     return parser.parse_args(args)
 
 def create_model(backbone_name, num_classes=1):
@@ -81,6 +159,92 @@ def setup_gpu(gpu_id: int):
         except RuntimeError as e:
             print(e)
 
+def load_image(path, min_side, max_side, preprocess=True):
+    """ Decode, resize and optionally preprocess a single image, returns the image and its resize scale.
+    """
+    # apply the EXIF orientation, like cv2.imread in tiled mode
+    image, scale = read_image_bgr_resized(path, min_side=min_side, max_side=max_side, exif_transpose=True)
+    if preprocess:
+        image = preprocess_image(image)
+    return image, scale
+
+
+def pad_batch(images, batch_size):
+    """ Copy images to the upper left corner of a zero padded batch of batch_size images.
+    """
+    max_shape = tuple(max(image.shape[x] for image in images) for x in range(3))
+    batch = np.zeros((batch_size,) + max_shape, dtype=images[0].dtype)
+    for index, image in enumerate(images):
+        batch[index, :image.shape[0], :image.shape[1], :image.shape[2]] = image
+    return batch
+
+
+def predict_images(model, paths, output, labels_to_names, batch_size=4, workers=4, min_side=2100, max_side=2100, score_threshold=0.5, preprocess_in_graph=False):
+    """ Run the model on images in fixed-size batches and stream detections as JSONL.
+
+    Images of the next batch are decoded and preprocessed on a thread pool while the current batch runs through the network.
+    With preprocess_in_graph the model normalizes the images itself and uint8 batches are passed.
+    """
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(batch_paths):
+            return [executor.submit(load_image, path, min_side, max_side, not preprocess_in_graph) for path in batch_paths]
+
+        pending = submit(batches[0]) if batches else []
+        for index, batch_paths in enumerate(batches):
+            loaded = [future.result() for future in pending]
+            if index + 1 < len(batches):
+                pending = submit(batches[index + 1])
+
+            start_time = time.time()
+            boxes, scores, labels = model.predict_on_batch(pad_batch([image for image, _ in loaded], batch_size))[:3]
+            print('batch {}/{}: {} s'.format(index + 1, len(batches), time.time() - start_time), file=sys.stderr)
+
+            for i, (path, (_, scale)) in enumerate(zip(batch_paths, loaded)):
+                output.write(detections_to_json(path, boxes[i] / scale, scores[i], labels[i], labels_to_names, score_threshold) + '\n')
+            output.flush()
+
+
+def read_image(path):
+    """ Decode a single image at full resolution.
+    """
+    image = cv2.imread(path)
+    if image is None:
+        raise ValueError('unable to read image {}'.format(path))
+    return image
+
+
+def predict_images_tiled(model, paths, output, labels_to_names, cropper, batch_size=4, workers=4, score_threshold=0.5, nms_threshold=0.5, preprocess_in_graph=False):
+    """ Run the model on full resolution tiles of every image and stream merged detections as JSONL.
+
+    The next image is decoded on a thread pool while the tiles of the current image run through the network.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = executor.submit(read_image, paths[0]) if paths else None
+        for index, path in enumerate(paths):
+            image = pending.result()
+            if index + 1 < len(paths):
+                pending = executor.submit(read_image, paths[index + 1])
+
+            start_time = time.time()
+            boxes, scores, labels = predict_tiled(
+                model,
+                image,
+                cropper,
+                preprocess_image=(lambda x: x) if preprocess_in_graph else preprocess_image,
+                batch_size=batch_size,
+                score_threshold=score_threshold,
+                nms_threshold=nms_threshold
+            )
+            print('image {}/{}: {} tiles, {} s'.format(
+                index + 1, len(paths), cropper.calc_crops_count(image.shape[1], image.shape[0]), time.time() - start_time
+            ), file=sys.stderr)
+
+            output.write(detections_to_json(path, boxes, scores, labels, labels_to_names, score_threshold) + '\n')
+            output.flush()
+
+
 def main(args=None):
     args=parse_args(args)
 
@@ -91,19 +255,73 @@ def main(args=None):
     min_side = min(args.height, args.width)
     max_side = max(args.height, args.width)
 
-    print("loading model...")
+    # keep stdout clean for JSONL detections in batched and tiled mode
+    log = sys.stderr if args.input is not None or args.tiled else sys.stdout
+
+    print("loading model...", file=log)
     if args.gpu:
         setup_gpu(0)
 
     model = models.load_model(model_bin, backbone_name=backbone)
+    if args.preprocess_in_graph:
+        model = models.add_preprocessing(model, models.backbone(backbone).preprocess_layer())
+
+    print(f'model input shape: {model.inputs[0].shape}', file=log)
+
+    if args.tiled:
+        paths = list_images(args.input) if args.input is not None else [img_fn]
+        print(f'found {len(paths)} images', file=log)
+        cropper = ImageGridCropper(
+            window_w=args.tile_width,
+            window_h=args.tile_height,
+            overlap_w=args.tile_overlap,
+            overlap_h=args.tile_overlap,
+            min_cropped_bbox_square=0
+        )
+        output = sys.stdout if args.output == '-' else open(args.output, 'w')
+        try:
+            predict_images_tiled(
+                model,
+                paths,
+                output,
+                labels_to_names={0: 'Pedestrian'},
+                cropper=cropper,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                score_threshold=args.score_threshold,
+                nms_threshold=args.nms_threshold,
+                preprocess_in_graph=args.preprocess_in_graph
+            )
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        return
 
-    print(f'model input shape: {model.inputs[0].shape}')
+    if args.input is not None:
+        paths = list_images(args.input)
+        print(f'found {len(paths)} images', file=log)
+        output = sys.stdout if args.output == '-' else open(args.output, 'w')
+        try:
+            predict_images(
+                model,
+                paths,
+                output,
+                labels_to_names={0: 'Pedestrian'},
+                batch_size=args.batch_size,
+                workers=args.workers,
+                min_side=min_side,
+                max_side=max_side,
+                score_threshold=args.score_threshold,
+                preprocess_in_graph=args.preprocess_in_graph
+            )
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        return
 
     start_time = time.time()
 
-    image = cv2.imread(img_fn)
-    image, scale = resize_image(image, min_side=min_side, max_side=max_side)
-    image = preprocess_image(image)
+    image, scale = load_image(img_fn, min_side, max_side, not args.preprocess_in_graph)
     print("prepoocess image at {} s".format(time.time() - start_time))
 
     labels_to_names = {0: 'Pedestrian'}
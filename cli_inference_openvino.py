@@ -1,19 +1,29 @@
 #!/usr/bin/env python
 import time
 import argparse
+import sys
 
 import cv2
 import numpy as np
-from openvino.inference_engine import IENetwork, IECore
+from PIL import Image
+
+from keras_retinanet.utils.inference_io import list_images, detections_to_json
+
+REDUCED_READ_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
 
 
 def parse_args(args):
     parser = argparse.ArgumentParser(description='convert model')
-    parser.add_argument(
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument(
         '--img',
         help='path to image',
-        type=str,
-        required=True
+        type=str
+    )
+    inputs.add_argument(
+        '--input',
+        help='directory or glob pattern with images for the asynchronous pipeline',
+        type=str
     )
     parser.add_argument(
         '--bin',
@@ -34,6 +44,27 @@ def parse_args(args):
         required=False,
         default=1
     )
+    parser.add_argument(
+        '--async-requests',
+        help='number of infer requests kept in flight in --input mode',
+        type=int,
+        required=False,
+        default=4
+    )
+    parser.add_argument(
+        '--streams',
+        help='number of CPU streams (CPU_THROUGHPUT_STREAMS), an integer or CPU_THROUGHPUT_AUTO',
+        type=str,
+        required=False,
+        default='CPU_THROUGHPUT_AUTO'
+    )
+    parser.add_argument(
+        '--score-threshold',
+        help='minimal score of reported detections',
+        type=float,
+        required=False,
+        default=0.5
+    )
     return parser.parse_args(args)
 
 
@@ -133,6 +164,38 @@ def preprocess_image(x, mode='caffe'):
 
     return x
 
+def read_image_resized(path, min_side=800, max_side=1333):
+    """
+    Read an image resized such that the size is constrained to min_side and max_side.
+
+    The scale is computed from the image header, so large JPEG images are decoded at 1/2, 1/4 or 1/8 of their size
+    whenever the final scale allows it instead of decoding all pixels first.
+
+    Returns:
+    The resized image and the scale relative to the original image.
+    """
+    with Image.open(path) as header:
+        width, height = header.size
+        # cv2.imread applies the EXIF orientation, orientations 5 to 8 rotate the image by 90 degrees
+        if header.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            width, height = height, width
+    scale = compute_resize_scale((height, width, 3), min_side=min_side, max_side=max_side)
+
+    flags = cv2.IMREAD_COLOR
+    for reduce_factor, reduced_flags in REDUCED_READ_FLAGS:
+        if reduce_factor * scale <= 1:
+            flags = reduced_flags
+            break
+    image = cv2.imread(path, flags)
+    if image is None:
+        raise ValueError('unable to read image {}'.format(path))
+
+    # same size as cv2.resize with fx and fy on the full image
+    size = (int(round(width * scale)), int(round(height * scale)))
+    if (image.shape[1], image.shape[0]) != size:
+        image = cv2.resize(image, size)
+    return image, scale
+
 def create_blank(image, w, h, color=(0, 0, 0)):
     """Create new image(numpy array) filled with certain color in BGR"""
     r_image = np.zeros((h, w, 3), np.uint8)
@@ -140,9 +203,96 @@ def create_blank(image, w, h, color=(0, 0, 0)):
     r_image[:image.shape[0],:image.shape[1],:image.shape[2]] = image
     return r_image
 
+def prepare_image(path, w, h):
+    """Read, resize, pad and preprocess an image into a NCHW blob, returns the blob and the resize scale."""
+    image, scale = read_image_resized(path, min_side=min(h, w), max_side=max(h, w))
+    image = create_blank(image, w, h)
+    image = preprocess_image(image)
+    image = image.transpose((2, 0, 1))  # Change data layout from HWC to CHW
+    return np.expand_dims(image, axis=0), scale
+
+def request_output(request, name):
+    """Copy an output of a finished infer request, so the request can be reused."""
+    # InferRequest.outputs was replaced by InferRequest.output_blobs in OpenVINO 2021
+    if hasattr(request, 'output_blobs'):
+        return request.output_blobs[name].buffer.copy()
+    return request.outputs[name].copy()
+
+def infer_async(executable, input_blob, output_layer, blobs, num_requests):
+    """
+    Run blobs through the network keeping up to num_requests infer requests in flight.
+
+    Parameters:
+    executable: Network loaded with load_network(num_requests=num_requests).
+    blobs: Iterable of (key, blob) pairs. It is consumed lazily, so preparing the next blob overlaps with inference of previous ones.
+
+    Returns:
+    Generator of (key, output) pairs in input order.
+    """
+    in_flight = {}
+    request_id = 0
+    for key, blob in blobs:
+        # requests are used round robin, so the oldest request is always the one to reuse
+        if request_id in in_flight:
+            executable.requests[request_id].wait(-1)
+            yield in_flight.pop(request_id), request_output(executable.requests[request_id], output_layer)
+        executable.start_async(request_id=request_id, inputs={input_blob: blob})
+        in_flight[request_id] = key
+        request_id = (request_id + 1) % num_requests
+
+    for _ in range(num_requests):
+        if request_id in in_flight:
+            executable.requests[request_id].wait(-1)
+            yield in_flight.pop(request_id), request_output(executable.requests[request_id], output_layer)
+        request_id = (request_id + 1) % num_requests
+
+def main_async(args):
+    """Asynchronous pipeline over many images, prints detections as JSONL to stdout."""
+    from openvino.inference_engine import IENetwork, IECore
+
+    paths = list_images(args.input)
+    print(f'found {len(paths)} images', file=sys.stderr)
+
+    OpenVinoIE = IECore()
+    OpenVinoIE.set_config({"CPU_BIND_THREAD": "YES"}, "CPU")
+
+    net = IENetwork(model=args.xml, weights=args.bin)
+    input_blob = 'input_1'
+    net.batch_size = 1
+    config = {"CPU_THROUGHPUT_STREAMS": args.streams}
+    OutputLayer = next(iter(net.outputs))
+    OpenVinoExecutable = OpenVinoIE.load_network(network=net, config=config, device_name="CPU", num_requests=args.async_requests)
+
+    _, _, h, w = net.inputs[input_blob].shape
+    print(f'model input shape: {net.inputs[input_blob].shape}', file=sys.stderr)
+
+    labels_to_names = {0: 'Pedestrian'}
+    scales = {}
+
+    def blobs():
+        for path in paths:
+            blob, scales[path] = prepare_image(path, w, h)
+            yield path, blob
+
+    start_time = time.time()
+    for path, output in infer_async(OpenVinoExecutable, input_blob, OutputLayer, blobs(), args.async_requests):
+        boxes, scores, labels = decode_openvino_detections(output, input_shape=(h, w))
+        boxes /= scales.pop(path)
+        print(detections_to_json(path, boxes[0], scores[0], labels[0], labels_to_names, args.score_threshold), flush=True)
+
+    total_time = time.time() - start_time
+    print(f'processed {len(paths)} images in {total_time} s ({len(paths) / max(total_time, 1e-9)} images/s)', file=sys.stderr)
+
 def main(args=None):
+    # imported here, so the helpers above can be used (and tested) without OpenVINO
+    from openvino.inference_engine import IENetwork, IECore
+
     args=parse_args(args)
 
+    if args.input is not None:
+        main_async(args)
+        return
+
     model_xml = args.xml
     model_bin = args.bin
     img_fn = args.img
@@ -167,8 +317,7 @@ def main(args=None):
 
 
     # load images
-    image = cv2.imread(img_fn)
-    image, scale = resize_image(image, min_side=min(h, w), max_side=max(h, w))
+    image, scale = read_image_resized(img_fn, min_side=min(h, w), max_side=max(h, w))
     image = create_blank(image, w, h)
     image = preprocess_image(image)
 
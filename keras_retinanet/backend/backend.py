@@ -52,6 +52,37 @@ def bbox_transform_inv(boxes, deltas, mean=None, std=None):
     return pred_boxes
 
 
+def bbox_transform(anchors, gt_boxes, mean=None, std=None):
+    """ Compute bounding-box regression targets, the in-graph equivalent of utils.anchors.bbox_transform.
+
+    Args
+        anchors : Tensor of shape (..., 4) with anchors (x1, y1, x2, y2).
+        gt_boxes: Tensor of the same shape as anchors with the ground truth boxes assigned to the anchors.
+        mean    : The mean value used when computing deltas (defaults to [0, 0, 0, 0]).
+        std     : The standard deviation used when computing deltas (defaults to [0.2, 0.2, 0.2, 0.2]).
+
+    Returns
+        A tensor of the same shape as anchors with the deltas (d_x1, d_y1, d_x2, d_y2).
+    """
+    if mean is None:
+        mean = [0, 0, 0, 0]
+    if std is None:
+        std = [0.2, 0.2, 0.2, 0.2]
+
+    anchor_widths  = anchors[..., 2] - anchors[..., 0]
+    anchor_heights = anchors[..., 3] - anchors[..., 1]
+
+    targets_dx1 = (gt_boxes[..., 0] - anchors[..., 0]) / anchor_widths
+    targets_dy1 = (gt_boxes[..., 1] - anchors[..., 1]) / anchor_heights
+    targets_dx2 = (gt_boxes[..., 2] - anchors[..., 2]) / anchor_widths
+    targets_dy2 = (gt_boxes[..., 3] - anchors[..., 3]) / anchor_heights
+
+    targets = keras.backend.stack([targets_dx1, targets_dy1, targets_dx2, targets_dy2], axis=-1)
+    targets = (targets - keras.backend.constant(mean)) / keras.backend.constant(std)
+
+    return targets
+
+
 def shift(shape, stride, anchors):
     """ Produce shifted anchors based on shape of the map and stride size.
 
@@ -117,3 +148,74 @@ def resize_images(images, size, method='bilinear', align_corners=False):
         'area'    : tensorflow.image.ResizeMethod.AREA,
     }
     return tensorflow.compat.v1.image.resize_images(images, size, methods[method], align_corners)
+
+
+def _sparse_target_indices(anchor_indices):
+    """ Convert the anchor indices of sparse targets to (batch, anchor) indices, dropping the padding.
+
+    Args
+        anchor_indices: Tensor of shape (B, M) with anchor indices, padded with -1.
+
+    Returns
+        indices : Tensor of shape (K, 2) with the (batch, anchor) index of the K valid entries.
+        mask    : Boolean tensor of shape (B, M), True for the valid entries.
+    """
+    anchor_indices = keras.backend.cast(anchor_indices, 'int32')
+    batch_indices  = tensorflow.tile(keras.backend.expand_dims(tensorflow.range(keras.backend.shape(anchor_indices)[0]), 1), [1, keras.backend.shape(anchor_indices)[1]])
+    mask           = keras.backend.greater_equal(anchor_indices, 0)
+    indices        = keras.backend.stack([
+        tensorflow.boolean_mask(batch_indices, mask),
+        tensorflow.boolean_mask(anchor_indices, mask),
+    ], axis=1)
+    return indices, mask
+
+
+def densify_regression_targets(regression, num_anchors):
+    """ Expand sparse regression targets (see utils.anchors.anchor_targets_bbox_sparse) to dense targets.
+
+    Args
+        regression  : Tensor of shape (B, P, 5) with the anchor index and the 4 regression targets of positive anchors, padded with an anchor index of -1.
+        num_anchors : The number of anchors N of an image.
+
+    Returns
+        A tensor of shape (B, N, 5) as returned by utils.anchors.anchor_targets_bbox, the anchor state is 1 for positive anchors and 0 otherwise.
+    """
+    indices, mask = _sparse_target_indices(regression[:, :, 0])
+    targets       = tensorflow.boolean_mask(regression[:, :, 1:], mask)
+    targets       = keras.backend.concatenate([targets, keras.backend.ones_like(targets[:, :1])], axis=1)
+
+    shape = keras.backend.stack([keras.backend.shape(regression)[0], num_anchors, 5])
+    return tensorflow.scatter_nd(indices, targets, shape)
+
+
+def densify_classification_targets(labels, num_anchors, num_classes):
+    """ Expand sparse classification targets (see utils.anchors.anchor_targets_bbox_sparse) to dense targets.
+
+    Args
+        labels      : Tensor of shape (B, M, 2) with the anchor index and the label of positive anchors (-1 for ignored anchors), padded with an anchor index of -1.
+        num_anchors : The number of anchors N of an image.
+        num_classes : The number of classes.
+
+    Returns
+        A tensor of shape (B, N, num_classes + 1) as returned by utils.anchors.anchor_targets_bbox.
+    """
+    batch_size    = keras.backend.shape(labels)[0]
+    indices, mask = _sparse_target_indices(labels[:, :, 0])
+    values        = tensorflow.boolean_mask(labels[:, :, 1], mask)
+    positive      = keras.backend.greater_equal(values, 0)
+
+    # -1 for ignore, 0 for background, 1 for object
+    states = tensorflow.where(positive, keras.backend.ones_like(values), -keras.backend.ones_like(values))
+    states = tensorflow.scatter_nd(indices, states, keras.backend.stack([batch_size, num_anchors]))
+
+    class_indices = keras.backend.concatenate([
+        tensorflow.boolean_mask(indices, positive),
+        keras.backend.expand_dims(keras.backend.cast(tensorflow.boolean_mask(values, positive), 'int32'), 1),
+    ], axis=1)
+    classes = tensorflow.scatter_nd(
+        class_indices,
+        keras.backend.ones_like(tensorflow.boolean_mask(values, positive)),
+        keras.backend.stack([batch_size, num_anchors, num_classes])
+    )
+
+    return keras.backend.concatenate([classes, keras.backend.expand_dims(states)], axis=2)
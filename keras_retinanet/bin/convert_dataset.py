@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+
+# Allow relative imports when being executed as script.
+if __name__ == "__main__" and __package__ is None:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+    import keras_retinanet.bin  # noqa: F401
+    __package__ = "keras_retinanet.bin"
+
+# Change these to absolute imports if you copy this script outside the keras_retinanet package.
+from ..preprocessing.pascal_voc import PascalVocGenerator
+from ..utils.shards import write_shards
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description='Script for packing a Pascal VOC (or LADD) dataset into shard files.')
+
+    parser.add_argument('pascal_path', help='Path to dataset directory (ie. /tmp/VOCdevkit).')
+    parser.add_argument('output_dir', help='Directory to write the shards to.')
+    parser.add_argument('--set-names', help='The splits to convert, written as <set name>-00000.shard, ...', nargs='+', default=['train', 'val', 'test'])
+    parser.add_argument('--images-per-shard', help='Number of images per shard.', type=int, default=1000)
+    parser.add_argument('--image-extension', help='Declares the dataset images\' extension.', default='.jpg')
+    parser.add_argument('--skip-truncated', help='Leave out truncated objects.', action='store_true')
+    parser.add_argument('--skip-difficult', help='Leave out difficult objects.', action='store_true')
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    # parse arguments
+    if args is None:
+        args = sys.argv[1:]
+    args = parse_args(args)
+
+    for set_name in args.set_names:
+        generator = PascalVocGenerator(
+            args.pascal_path,
+            set_name,
+            image_extension=args.image_extension,
+            skip_truncated=args.skip_truncated,
+            skip_difficult=args.skip_difficult,
+            shuffle_groups=False,
+            group_method='none'
+        )
+
+        paths = write_shards(generator, args.output_dir, prefix=set_name, images_per_shard=args.images_per_shard)
+        print('Wrote {} images of {} to {} shards.'.format(generator.size(), set_name, len(paths)))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,8 +15,10 @@ limitations under the License.
 """
 
 import argparse
+import glob
 import os
 import sys
+import warnings
 
 # Allow relative imports when being executed as script.
 if __name__ == "__main__" and __package__ is None:
@@ -25,13 +27,17 @@ if __name__ == "__main__" and __package__ is None:
     __package__ = "keras_retinanet.bin"
 
 # Change these to absolute imports if you copy this script outside the keras_retinanet package.
+from .. import layers
 from .. import models
 from ..preprocessing.csv_generator import CSVGenerator
 from ..preprocessing.pascal_voc import PascalVocGenerator
 from ..preprocessing.pascal_voc_grid_crops import PascalVocGridCropsGenerator
 from ..preprocessing.pascal_voc_balanced_crops import PascalVocBalancedCropsGenerator
+from ..preprocessing.shards import ShardGenerator
 from ..utils.anchors import make_shapes_callback
+from ..utils.benchmark import benchmark, print_benchmark, save_benchmark
 from ..utils.config import read_config_file, parse_anchor_parameters, parse_pyramid_levels
+from ..utils.detection_cache import DetectionCache, file_hash
 from ..utils.eval import evaluate
 from ..utils.gpu import setup_gpu
 from ..utils.tf_version import check_tf_version
@@ -41,12 +47,13 @@ def create_generator(args, preprocess_image):
     """ Create generators for evaluation.
     """
     common_args = {
-        'config'           : args.config,
-        'image_min_side'   : args.image_min_side,
-        'image_max_side'   : args.image_max_side,
-        'no_resize'        : args.no_resize,
-        'preprocess_image' : preprocess_image,
-        'group_method'     : args.group_method
+        'config'              : args.config,
+        'image_min_side'      : args.image_min_side,
+        'image_max_side'      : args.image_max_side,
+        'no_resize'           : args.no_resize,
+        'preprocess_image'    : preprocess_image,
+        'preprocess_in_graph' : args.preprocess_in_graph,
+        'group_method'        : args.group_method
     }
 
     if args.dataset_type == 'coco':
@@ -96,12 +103,58 @@ def create_generator(args, preprocess_image):
             shuffle_groups=False,
             **common_args
         )
+    elif args.dataset_type == 'shards':
+        validation_generator = ShardGenerator(
+            args.shards,
+            shuffle_groups=False,
+            **common_args
+        )
     else:
         raise ValueError('Invalid data type received: {}'.format(args.dataset_type))
 
     return validation_generator
 
 
+def create_detection_cache(args):
+    """ Create the detection cache for the model, network input and dataset settings in args.
+    """
+    if args.dataset_type == 'csv':
+        dataset = {'annotations': os.path.abspath(args.annotations), 'classes': os.path.abspath(args.classes)}
+    elif args.dataset_type == 'shards':
+        dataset = {'shards': [os.path.abspath(path) for path in sorted(glob.glob(args.shards))]}
+    else:
+        dataset = {'path': os.path.abspath(args.pascal_path), 'image_extension': args.image_extension}
+
+    return DetectionCache(
+        args.detection_cache,
+        model=file_hash(args.model),
+        config=file_hash(args.config) if args.config and args.convert_model else None,
+        backbone=args.backbone,
+        preprocess_in_graph=args.preprocess_in_graph,
+        dataset_type=args.dataset_type,
+        dataset=dataset,
+        split='test',
+        image_min_side=args.image_min_side,
+        image_max_side=args.image_max_side,
+        no_resize=args.no_resize
+    )
+
+
+def check_detection_filter(model, args):
+    """ Warn if the thresholds in args are looser than the filtering inside the model.
+
+    The model only outputs detections above its own score threshold and up to its own maximum number of detections,
+    so these can not be lowered or raised by evaluating again, with or without the detection cache.
+    """
+    # submodules includes the layers of nested models, such as the model wrapped by models.add_preprocessing
+    for layer in model.submodules:
+        if isinstance(layer, layers.FilterDetections):
+            if args.score_threshold < layer.score_threshold or args.max_detections > layer.max_detections:
+                warnings.warn('The model only outputs {} detections per image with a score of at least {}, '
+                              '--score-threshold {} and --max-detections {} are limited to that.'.format(
+                                  layer.max_detections, layer.score_threshold, args.score_threshold, args.max_detections))
+
+
 def parse_args(args):
     """ Parse the arguments.
     """
@@ -131,6 +184,9 @@ def parse_args(args):
     csv_parser.add_argument('annotations', help='Path to CSV file containing annotations for evaluation.')
     csv_parser.add_argument('classes', help='Path to a CSV file containing class label mapping.')
 
+    shards_parser = subparsers.add_parser('shards')
+    shards_parser.add_argument('shards', help='Glob pattern of the shards (ie. /tmp/ladd-shards/test-*.shard).')
+
     parser.add_argument('model',              help='Path to RetinaNet model.')
     parser.add_argument('--convert-model',    help='Convert the model to an inference model (ie. the input is a training model).', action='store_true')
     parser.add_argument('--backbone',         help='The backbone of the model.', default='resnet50')
@@ -139,9 +195,20 @@ def parse_args(args):
     parser.add_argument('--iou-threshold',    help='IoU Threshold to count for a positive detection (defaults to 0.5).', default=0.5, type=float)
     parser.add_argument('--max-detections',   help='Max Detections per image (defaults to 100).', default=100, type=int)
     parser.add_argument('--save-path',        help='Path for saving images with detections (doesn\'t work for COCO).')
+    parser.add_argument('--batch-size',       help='Maximum number of images (or grid crops of an image) of the same shape per batch (defaults to single images, or all grid crops of an image). With more than one image per batch the images are ordered by aspect ratio and the reported inference time is per image of a batch.', type=int)
+    parser.add_argument('--workers',          help='Number of threads loading images while the network runs.', type=int, default=0)
+    parser.add_argument('--detection-cache',  help='Directory to cache the detections of the model in, evaluating again with other thresholds does not run the network (doesn\'t work for COCO and grid crops). '
+                                                   'The cached detections are filtered by the model (by default a score of at least 0.05 and at most 300 detections), '
+                                                   'so lower score thresholds or more detections can not be evaluated from the cache.')
+    parser.add_argument('--metrics-json',     help='Path to write AP for IoU thresholds 0.5:0.95, per object size, recall at fixed precisions and PR curves to, as JSON (doesn\'t work for COCO).')
+    parser.add_argument('--benchmark',        help='Measure the latency of every stage of the pipeline instead of evaluating, and write the results to this JSON file (doesn\'t work for grid crops).')
+    parser.add_argument('--benchmark-warmup', help='Number of images run before measuring in --benchmark mode.', type=int, default=5)
+    parser.add_argument('--benchmark-images', help='Number of images measured in --benchmark mode (defaults to the whole dataset).', type=int)
+    parser.add_argument('--benchmark-full-decode', help='Time decoding the full image and resizing it separately in --benchmark mode, instead of the reduced decode used by the evaluation.', action='store_true')
     parser.add_argument('--image-min-side',   help='Rescale the image so the smallest side is min_side.', type=int, default=800)
     parser.add_argument('--image-max-side',   help='Rescale the image if the largest side is larger than max_side.', type=int, default=1333)
     parser.add_argument('--no-resize',        help='Don''t rescale the image.', action='store_true')
+    parser.add_argument('--preprocess-in-graph', help='Feed uint8 images and normalize them inside the network.', action='store_true')
     parser.add_argument('--config',           help='Path to a configuration parameters .ini file (only used with --convert-model).')
     parser.add_argument('--group-method',     help='Determines how images are grouped together', type=str, default='ratio', choices=['none', 'random', 'ratio'])
 
@@ -181,18 +248,55 @@ def main(args=None):
     if args.config and 'pyramid_levels' in args.config:
         pyramid_levels = parse_pyramid_levels(args.config)
 
-    # load the model
-    print('Loading model, this may take a second...')
-    model = models.load_model(args.model, backbone_name=args.backbone)
-    generator.compute_shapes = make_shapes_callback(model)
+    # optionally reuse the detections of a previous run
+    detection_cache = None
+    if args.detection_cache:
+        if args.dataset_type in ['coco', 'pascal-grid-crops', 'pascal-crops-balanced']:
+            raise ValueError('--detection-cache is not supported for {} datasets.'.format(args.dataset_type))
+        detection_cache = create_detection_cache(args)
+        print('Found cached detections for {} of {} images.'.format(len(detection_cache), generator.size()))
+
+    if args.benchmark and args.dataset_type in ['pascal-grid-crops', 'pascal-crops-balanced']:
+        raise ValueError('--benchmark is not supported for {} datasets.'.format(args.dataset_type))
+
+    # load the model, unless all detections are cached
+    model = None
+    if args.benchmark or detection_cache is None or len(detection_cache) < generator.size():
+        print('Loading model, this may take a second...')
+        model = models.load_model(args.model, backbone_name=args.backbone)
+        generator.compute_shapes = make_shapes_callback(model)
+
+        # optionally convert the model
+        if args.convert_model:
+            model = models.convert_model(model, anchor_params=anchor_params, pyramid_levels=pyramid_levels)
 
-    # optionally convert the model
-    if args.convert_model:
-        model = models.convert_model(model, anchor_params=anchor_params, pyramid_levels=pyramid_levels)
+        # optionally normalize images inside the network
+        if args.preprocess_in_graph:
+            model = models.add_preprocessing(model, backbone.preprocess_layer())
+
+        check_detection_filter(model, args)
 
     # print model summary
     # print(model.summary())
 
+    # optionally measure latency and throughput instead of accuracy
+    if args.benchmark:
+        results = benchmark(
+            generator,
+            model,
+            num_images=args.benchmark_images,
+            warmup=args.benchmark_warmup,
+            iou_threshold=args.iou_threshold,
+            score_threshold=args.score_threshold,
+            max_detections=args.max_detections,
+            full_decode=args.benchmark_full_decode
+        )
+        results.update(model=args.model, backbone=args.backbone, image_min_side=args.image_min_side,
+                       image_max_side=args.image_max_side, no_resize=args.no_resize)
+        print_benchmark(results)
+        save_benchmark(results, args.benchmark)
+        return
+
     # start evaluation
     if args.dataset_type == 'coco':
         from ..utils.coco_eval import evaluate_coco
@@ -206,7 +310,10 @@ def main(args=None):
                 iou_threshold=args.iou_threshold,
                 score_threshold=args.score_threshold,
                 max_detections=args.max_detections,
-                save_path=args.save_path
+                save_path=args.save_path,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                metrics_path=args.metrics_json
             )
         else:
             average_precisions, inference_time = evaluate(
@@ -215,7 +322,11 @@ def main(args=None):
                 iou_threshold=args.iou_threshold,
                 score_threshold=args.score_threshold,
                 max_detections=args.max_detections,
-                save_path=args.save_path
+                save_path=args.save_path,
+                detection_cache=detection_cache,
+                batch_size=args.batch_size or 1,
+                workers=args.workers,
+                metrics_path=args.metrics_json
             )
 
         # print evaluation
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+
+# Allow relative imports when being executed as script.
+if __name__ == "__main__" and __package__ is None:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+    import keras_retinanet.bin  # noqa: F401
+    __package__ = "keras_retinanet.bin"
+
+# Change these to absolute imports if you copy this script outside the keras_retinanet package.
+from .. import models
+from ..utils.config import read_config_file, parse_anchor_parameters, parse_pyramid_levels
+from ..utils.gpu import setup_gpu
+from ..utils.serving import InferenceService, make_server
+from ..utils.tf_version import check_tf_version
+
+
+def parse_args(args):
+    """ Parse the arguments.
+    """
+    parser = argparse.ArgumentParser(description='Local inference server for a RetinaNet network, batching concurrent requests.')
+
+    parser.add_argument('model',              help='Path to RetinaNet model.')
+    parser.add_argument('--convert-model',    help='Convert the model to an inference model (ie. the input is a training model).', action='store_true')
+    parser.add_argument('--backbone',         help='The backbone of the model.', default='resnet50')
+    parser.add_argument('--gpu',              help='Id of the GPU to use (as reported by nvidia-smi).')
+    parser.add_argument('--config',           help='Path to a configuration parameters .ini file (only used with --convert-model).')
+    parser.add_argument('--host',             help='Address to listen on (defaults to localhost only).', default='127.0.0.1')
+    parser.add_argument('--port',             help='Port to listen on.', type=int, default=8080)
+    parser.add_argument('--score-threshold',  help='Threshold on score to filter detections with (defaults to 0.5).', default=0.5, type=float)
+    parser.add_argument('--image-min-side',   help='Rescale the image so the smallest side is min_side.', type=int, default=800)
+    parser.add_argument('--image-max-side',   help='Rescale the image if the largest side is larger than max_side.', type=int, default=1333)
+    parser.add_argument('--max-batch-size',   help='Maximum number of images in a batch.', type=int, default=8)
+    parser.add_argument('--max-wait-ms',      help='Maximum time in milliseconds to wait for a batch to fill up.', type=float, default=10)
+    parser.add_argument('--preprocess-in-graph', help='Batch uint8 images and normalize them inside the network.', action='store_true')
+
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    # parse arguments
+    if args is None:
+        args = sys.argv[1:]
+    args = parse_args(args)
+
+    # make sure tensorflow is the minimum required version
+    check_tf_version()
+
+    # optionally choose specific GPU
+    if args.gpu:
+        setup_gpu(args.gpu)
+
+    # optionally load config parameters
+    anchor_params = None
+    pyramid_levels = None
+    if args.config:
+        args.config = read_config_file(args.config)
+        if 'anchor_parameters' in args.config:
+            anchor_params = parse_anchor_parameters(args.config)
+        if 'pyramid_levels' in args.config:
+            pyramid_levels = parse_pyramid_levels(args.config)
+
+    # load the model once, it stays resident for all requests
+    print('Loading model, this may take a second...')
+    backbone = models.backbone(args.backbone)
+    model = models.load_model(args.model, backbone_name=args.backbone)
+    if args.convert_model:
+        model = models.convert_model(model, anchor_params=anchor_params, pyramid_levels=pyramid_levels)
+
+    # optionally normalize images inside the network, batches are then passed as uint8
+    preprocess_image = backbone.preprocess_image
+    if args.preprocess_in_graph:
+        model            = models.add_preprocessing(model, backbone.preprocess_layer())
+        preprocess_image = lambda image: image  # noqa: E731
+
+    service = InferenceService(
+        model,
+        preprocess_image=preprocess_image,
+        min_side=args.image_min_side,
+        max_side=args.image_max_side,
+        score_threshold=args.score_threshold,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms
+    )
+    server = make_server(service, host=args.host, port=args.port)
+
+    print('Serving on http://{}:{} (POST /detect, GET /health)'.format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
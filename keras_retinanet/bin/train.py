@@ -17,6 +17,7 @@ limitations under the License.
 """
 
 import argparse
+import math
 import os
 import sys
 import warnings
@@ -24,8 +25,8 @@ import warnings
 from tensorflow import keras
 import tensorflow as tf
 
-# Allow relative imports when being executed as script.
-if __name__ == "__main__" and __package__ is None:
+# Allow relative imports when being executed as script (or imported as main module by an evaluation process).
+if __name__ in ("__main__", "__mp_main__") and __package__ is None:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
     import keras_retinanet.bin  # noqa: F401
     __package__ = "keras_retinanet.bin"
@@ -34,20 +35,24 @@ if __name__ == "__main__" and __package__ is None:
 from .. import layers  # noqa: F401
 from .. import losses
 from .. import models
-from ..callbacks import RedirectModel
+from ..callbacks import EvaluationEarlyStopping, RedirectModel
 from ..callbacks.eval import Evaluate
-from ..models.retinanet import retinanet_bbox
+from ..models.retinanet import retinanet_bbox, retinanet_train
 from ..preprocessing.csv_generator import CSVGenerator
 from ..preprocessing.kitti import KittiGenerator
 from ..preprocessing.open_images import OpenImagesGenerator
 from ..preprocessing.pascal_voc import PascalVocGenerator
 from ..preprocessing.pascal_voc_grid_crops import PascalVocGridCropsGenerator
 from ..preprocessing.pascal_voc_balanced_crops import PascalVocBalancedCropsGenerator
-from ..utils.anchors import make_shapes_callback
+from ..preprocessing.shards import ShardGenerator
+from ..preprocessing.tf_dataset import create_dataset
+from ..utils.anchors import anchor_targets_bbox, anchor_targets_bbox_sparse, make_shapes_callback
 from ..utils.config import read_config_file, parse_anchor_parameters,\
     parse_random_transform_parameters, parse_visual_effect_parameters, parse_pyramid_levels
+from ..utils.eval import evaluate
 from ..utils.gpu import setup_gpu
 from ..utils.image import random_visual_effect_generator
+from ..utils.image_cache import ImageCache
 from ..utils.model import freeze as freeze_model
 from ..utils.tf_version import check_tf_version
 from ..utils.transform import random_transform_generator
@@ -89,7 +94,10 @@ def create_models(backbone_retinanet,
                   focal_gamma=2.0,
                   regression_weight=1.0,
                   classification_weight=1.0,
-                  config=None):
+                  config=None,
+                  preprocess_layer=None,
+                  sparse_targets=False,
+                  targets_in_graph=False):
     """ Creates three models (model, training_model, prediction_model).
 
     Args
@@ -99,6 +107,9 @@ def create_models(backbone_retinanet,
         multi_gpu          : The number of GPUs to use for training.
         freeze_backbone    : If True, disables learning for the backbone.
         config             : Config parameters, None indicates the default configuration.
+        preprocess_layer   : If set, the training and prediction models take uint8 images and normalize them with this layer.
+        sparse_targets     : If True, the losses expect sparse targets (see utils.anchors.anchor_targets_bbox_sparse).
+        targets_in_graph   : If True, the training model takes the annotations as inputs and computes the anchor targets and losses itself.
 
     Returns
         model            : The base model. This is also the model that is saved in snapshots.
@@ -132,18 +143,38 @@ def create_models(backbone_retinanet,
     # make prediction model
     prediction_model = retinanet_bbox(model=model, anchor_params=anchor_params, pyramid_levels=pyramid_levels)
 
-    # compile model
-    training_model.compile(
-        loss={
-            'regression'    : losses.smooth_l1(),
-            'classification': losses.focal(focal_alpha, focal_gamma)
-        },
-        loss_weights={
-            'regression': regression_weight,
-            'classification': classification_weight
-        },
-        optimizer=keras.optimizers.Adam(lr=lr, clipnorm=optimizer_clipnorm)
-    )
+    # optionally compute the anchor targets and the losses inside the graph
+    if targets_in_graph:
+        training_model = retinanet_train(
+            model,
+            anchor_params=anchor_params,
+            pyramid_levels=pyramid_levels,
+            focal_alpha=focal_alpha,
+            focal_gamma=focal_gamma,
+            regression_weight=regression_weight,
+            classification_weight=classification_weight
+        )
+
+    # optionally normalize images inside the graph, the base model stays unchanged for snapshots
+    if preprocess_layer is not None:
+        training_model   = models.add_preprocessing(training_model, preprocess_layer)
+        prediction_model = models.add_preprocessing(prediction_model, preprocess_layer)
+
+    # compile model, a model computing its targets in the graph has already added its losses
+    if targets_in_graph:
+        training_model.compile(optimizer=keras.optimizers.Adam(lr=lr, clipnorm=optimizer_clipnorm))
+    else:
+        training_model.compile(
+            loss={
+                'regression'    : losses.smooth_l1(sparse_targets=sparse_targets),
+                'classification': losses.focal(focal_alpha, focal_gamma, sparse_targets=sparse_targets)
+            },
+            loss_weights={
+                'regression': regression_weight,
+                'classification': classification_weight
+            },
+            optimizer=keras.optimizers.Adam(lr=lr, clipnorm=optimizer_clipnorm)
+        )
 
     return model, training_model, prediction_model
 
@@ -189,16 +220,21 @@ def create_callbacks(model, training_model, prediction_model, validation_generat
 
             # use prediction model for evaluation
             evaluation = CocoEval(validation_generator, tensorboard=tensorboard_callback)
-        elif args.dataset_type in ['pascal-grid-crops', 'pascal-crops-balanced']:
-            from ..utils.crops_eval import evaluate as crops_evaluate
-            evaluation = Evaluate(validation_generator,
-                                  evaluate_func=crops_evaluate,
-                                  tensorboard=tensorboard_callback,
-                                  weighted_average=args.weighted_average)
         else:
+            evaluate_func = evaluate
+            if args.dataset_type in ['pascal-grid-crops', 'pascal-crops-balanced']:
+                from ..utils.crops_eval import evaluate as evaluate_func
             evaluation = Evaluate(validation_generator,
                                   tensorboard=tensorboard_callback,
-                                  weighted_average=args.weighted_average)
+                                  weighted_average=args.weighted_average,
+                                  batch_size=args.batch_size,
+                                  workers=args.workers,
+                                  evaluate_func=evaluate_func,
+                                  subset_size=args.evaluation_subset,
+                                  full_evaluation_every=args.full_evaluation_every,
+                                  async_evaluation=args.async_evaluation,
+                                  backbone_name=args.backbone,
+                                  gpu=args.evaluation_gpu)
         evaluation = RedirectModel(evaluation, prediction_model)
         callbacks.append(evaluation)
 
@@ -231,9 +267,11 @@ def create_callbacks(model, training_model, prediction_model, validation_generat
     ))
 
     if args.evaluation and validation_generator:
-        callbacks.append(keras.callbacks.EarlyStopping(
+        # the full mAP is only logged every full_evaluation_every epochs (or later, with asynchronous evaluation),
+        # the subset mAP is noisier and is not used, patience counts full evaluations and covers about 5 epochs
+        callbacks.append(EvaluationEarlyStopping(
             monitor    = 'mAP',
-            patience   = 5,
+            patience   = max(1, int(math.ceil(5 / args.full_evaluation_every))),
             mode       = 'max',
             min_delta  = 0.01
         ))
@@ -252,13 +290,19 @@ def create_generators(args, preprocess_image):
         preprocess_image : Function that preprocesses an image for the network.
     """
     common_args = {
-        'batch_size'       : args.batch_size,
-        'config'           : args.config,
-        'image_min_side'   : args.image_min_side,
-        'image_max_side'   : args.image_max_side,
-        'no_resize'        : args.no_resize,
-        'preprocess_image' : preprocess_image,
-        'group_method'     : args.group_method
+        'batch_size'             : args.batch_size,
+        'config'                 : args.config,
+        'image_min_side'         : args.image_min_side,
+        'image_max_side'         : args.image_max_side,
+        'no_resize'              : args.no_resize,
+        'preprocess_image'       : preprocess_image,
+        'preprocess_in_graph'    : args.preprocess_in_graph,
+        'fused_transform'        : args.fused_transform,
+        'sparse_overlaps'        : args.sparse_overlaps,
+        'compute_anchor_targets' : anchor_targets_bbox_sparse if args.sparse_targets else anchor_targets_bbox,
+        'targets_in_graph'       : args.targets_in_graph,
+        'disk_image_cache'       : ImageCache(args.image_cache, int(args.image_cache_size * 1024 ** 3)) if args.image_cache else None,
+        'group_method'           : args.group_method
     }
 
     # create random transform generator for augmenting training data
@@ -401,6 +445,22 @@ def create_generators(args, preprocess_image):
             )
         else:
             validation_generator = None
+    elif args.dataset_type == 'shards':
+        train_generator = ShardGenerator(
+            args.shards,
+            transform_generator=transform_generator,
+            visual_effect_generator=visual_effect_generator,
+            **common_args
+        )
+
+        if args.val_shards:
+            validation_generator = ShardGenerator(
+                args.val_shards,
+                shuffle_groups=False,
+                **common_args
+            )
+        else:
+            validation_generator = None
     elif args.dataset_type == 'oid':
         train_generator = OpenImagesGenerator(
             args.main_dir,
@@ -470,6 +530,28 @@ def check_args(parsed_args):
     if parsed_args.multi_gpu > 1 and not parsed_args.multi_gpu_force:
         raise ValueError("Multi-GPU support is experimental, use at own risk! Run with --multi-gpu-force if you wish to continue.")
 
+    if parsed_args.targets_in_graph and parsed_args.sparse_targets:
+        raise ValueError("--targets-in-graph computes dense targets in the graph and can not be combined with --sparse-targets.")
+
+    if parsed_args.evaluation_subset and parsed_args.dataset_type in ['pascal-grid-crops', 'pascal-crops-balanced']:
+        raise ValueError("--evaluation-subset is not supported for grid crops evaluation.")
+
+    if parsed_args.async_evaluation and parsed_args.dataset_type == 'coco':
+        raise ValueError("--async-evaluation is not supported for COCO evaluation.")
+
+    if parsed_args.tf_data and parsed_args.multiprocessing:
+        raise ValueError("--multiprocessing can not be combined with --tf-data, which computes batches in parallel threads.")
+
+    if parsed_args.tf_data and parsed_args.dataset_type in ['pascal-grid-crops', 'pascal-crops-balanced']:
+        raise ValueError("--tf-data is not supported for crops datasets, their generators keep per-image state that is not thread safe.")
+
+    if parsed_args.tf_data_shard_index >= parsed_args.tf_data_shards:
+        raise ValueError("--tf-data-shard-index ({}) must be lower than --tf-data-shards ({}).".format(parsed_args.tf_data_shard_index,
+                                                                                                       parsed_args.tf_data_shards))
+
+    if parsed_args.image_cache and parsed_args.dataset_type in ['pascal-grid-crops', 'pascal-crops-balanced']:
+        raise ValueError("--image-cache is not supported for crops datasets.")
+
     if 'resnet' not in parsed_args.backbone:
         warnings.warn('Using experimental backbone {}. Only resnet50 has been properly tested.'.format(parsed_args.backbone))
 
@@ -530,6 +612,10 @@ def parse_args(args):
     csv_parser.add_argument('classes', help='Path to a CSV file containing class label mapping.')
     csv_parser.add_argument('--val-annotations', help='Path to CSV file containing annotations for validation (optional).')
 
+    shards_parser = subparsers.add_parser('shards')
+    shards_parser.add_argument('shards', help='Glob pattern of the training shards (ie. /tmp/ladd-shards/train-*.shard).')
+    shards_parser.add_argument('--val-shards', help='Glob pattern of the validation shards (optional).')
+
     group = parser.add_mutually_exclusive_group()
     group.add_argument('--snapshot',          help='Resume training from a snapshot.')
     group.add_argument('--imagenet-weights',  help='Initialize the model with pretrained imagenet weights. This is the default behaviour.', action='store_const', const=True, default=True)
@@ -556,11 +642,22 @@ def parse_args(args):
     parser.add_argument('--tensorboard-freq', help='Update frequency for Tensorboard output. Values \'epoch\', \'batch\' or int', default='epoch')
     parser.add_argument('--no-snapshots',     help='Disable saving snapshots.', dest='snapshots', action='store_false')
     parser.add_argument('--no-evaluation',    help='Disable per epoch evaluation.', dest='evaluation', action='store_false')
+    parser.add_argument('--async-evaluation', help='Evaluate the epoch snapshots in a separate process while training continues.', action='store_true')
+    parser.add_argument('--evaluation-gpu',   help='Id of the GPU used by the evaluation process (as reported by nvidia-smi).')
+    parser.add_argument('--evaluation-subset', help='Evaluate a fixed random subset of this many validation images on epochs without a full evaluation.', type=int)
+    parser.add_argument('--full-evaluation-every', help='Evaluate the full validation set every this many epochs.', type=int, default=1)
     parser.add_argument('--freeze-backbone',  help='Freeze training of backbone layers.', action='store_true')
     parser.add_argument('--no-random-transform', help='Do not randomly transform image and annotations.', action='store_true')
+    parser.add_argument('--sparse-overlaps',  help='Only compute overlaps of anchors near each annotation when assigning anchor targets.', action='store_true')
+    parser.add_argument('--sparse-targets',   help='Pass only positive and ignored anchors as targets and expand them to dense targets in the graph.', action='store_true')
+    parser.add_argument('--targets-in-graph', help='Pass the annotations to the network and compute the anchor targets in the graph.', action='store_true')
+    parser.add_argument('--fused-transform',  help='Apply the random transformation and the resize with a single warp at the target size.', action='store_true')
     parser.add_argument('--image-min-side',   help='Rescale the image so the smallest side is min_side.', type=int, default=800)
     parser.add_argument('--image-max-side',   help='Rescale the image if the largest side is larger than max_side.', type=int, default=1333)
     parser.add_argument('--no-resize',        help='Don''t rescale the image.', action='store_true')
+    parser.add_argument('--image-cache',      help='Directory to cache decoded and resized images in, augmentation is then applied to the resized images.')
+    parser.add_argument('--image-cache-size', help='Size budget of the image cache in GB, the least recently used images are removed beyond it.', type=float, default=10)
+    parser.add_argument('--preprocess-in-graph', help='Feed uint8 images and normalize them inside the network instead of in the generator.', action='store_true')
     parser.add_argument('--config',           help='Path to a configuration parameters .ini file.')
     parser.add_argument('--weighted-average', help='Compute the mAP using the weighted average of precisions among classes.', action='store_true')
     parser.add_argument('--compute-val-loss', help='Compute validation loss during training', dest='compute_val_loss', action='store_true')
@@ -572,6 +669,10 @@ def parse_args(args):
     parser.add_argument('--multiprocessing',  help='Use multiprocessing in fit_generator.', action='store_true')
     parser.add_argument('--workers',          help='Number of generator workers.', type=int, default=1)
     parser.add_argument('--max-queue-size',   help='Queue length for multiprocessing workers in fit_generator.', type=int, default=10)
+    parser.add_argument('--tf-data',          help='Feed the training batches through a tf.data pipeline with autotuned parallelism instead of --workers.', action='store_true')
+    parser.add_argument('--tf-data-interleave', help='Read the training batches as this many interleaved sequences of consecutive batches.', type=int)
+    parser.add_argument('--tf-data-shards',   help='Split the training batches in this many shards (ie. one per training process).', type=int, default=1)
+    parser.add_argument('--tf-data-shard-index', help='The shard of the training batches used by this process.', type=int, default=0)
     parser.add_argument('--silent', help='Do not print training progress.', action='store_false')
     
     return check_args(parser.parse_args(args))
@@ -613,6 +714,41 @@ def main(args=None):
             pyramid_levels = parse_pyramid_levels(args.config)
 
         prediction_model = retinanet_bbox(model=model, anchor_params=anchor_params, pyramid_levels=pyramid_levels)
+
+        if args.targets_in_graph:
+            training_model = retinanet_train(
+                model,
+                anchor_params=anchor_params,
+                pyramid_levels=pyramid_levels,
+                focal_alpha=args.focal_alpha,
+                focal_gamma=args.focal_gamma,
+                regression_weight=args.regression_weight,
+                classification_weight=args.classification_weight
+            )
+
+        if args.preprocess_in_graph:
+            training_model   = models.add_preprocessing(training_model, backbone.preprocess_layer())
+            prediction_model = models.add_preprocessing(prediction_model, backbone.preprocess_layer())
+
+        # the losses of the snapshot expect dense targets
+        loss = model.loss
+        if args.sparse_targets:
+            loss = {
+                'regression'    : losses.smooth_l1(sparse_targets=True),
+                'classification': losses.focal(args.focal_alpha, args.focal_gamma, sparse_targets=True)
+            }
+
+        if args.targets_in_graph:
+            training_model.compile(optimizer=model.optimizer)
+        elif args.preprocess_in_graph or args.sparse_targets:
+            training_model.compile(
+                loss=loss,
+                loss_weights={
+                    'regression': args.regression_weight,
+                    'classification': args.classification_weight
+                },
+                optimizer=model.optimizer
+            )
     else:
         weights = args.weights
         # default to imagenet if nothing else is specified
@@ -632,7 +768,10 @@ def main(args=None):
             focal_gamma=args.focal_gamma,
             regression_weight=args.regression_weight,
             classification_weight=args.classification_weight,
-            config=args.config
+            config=args.config,
+            preprocess_layer=backbone.preprocess_layer() if args.preprocess_in_graph else None,
+            sparse_targets=args.sparse_targets,
+            targets_in_graph=args.targets_in_graph
         )
 
     # print model summary
@@ -656,6 +795,14 @@ def main(args=None):
     if not args.compute_val_loss:
         validation_generator = None
 
+    if args.tf_data:
+        train_generator = create_dataset(
+            train_generator,
+            num_shards=args.tf_data_shards,
+            shard_index=args.tf_data_shard_index,
+            interleave=args.tf_data_interleave
+        )
+
     # start training
     return training_model.fit_generator(
         generator=train_generator,
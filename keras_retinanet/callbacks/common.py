@@ -44,3 +44,13 @@ class RedirectModel(keras.callbacks.Callback):
 
     def on_train_end(self, logs=None):
         self.callback.on_train_end(logs=logs)
+
+
+class EvaluationEarlyStopping(keras.callbacks.EarlyStopping):
+    """ EarlyStopping on a metric that is only logged on some epochs, such as the mAP of callbacks.eval.Evaluate.
+
+    Epochs without the metric are skipped without a warning, so patience counts evaluations instead of epochs.
+    """
+
+    def get_monitor_value(self, logs):
+        return (logs or {}).get(self.monitor)
@@ -17,6 +17,64 @@ limitations under the License.
 from tensorflow import keras
 from ..utils.eval import evaluate
 
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+
+import numpy as np
+
+
+class _GeneratorSubset(object):
+    """ Exposes a subset of the images of a generator as a generator, for evaluation.
+    """
+    def __init__(self, generator, image_indices):
+        self.generator     = generator
+        self.image_indices = image_indices
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+    def size(self):
+        return len(self.image_indices)
+
+    def image_aspect_ratio(self, image_index):
+        return self.generator.image_aspect_ratio(self.image_indices[image_index])
+
+    def load_image(self, image_index):
+        return self.generator.load_image(self.image_indices[image_index])
+
+    def load_resized_image(self, image_index):
+        return self.generator.load_resized_image(self.image_indices[image_index])
+
+    def load_annotations(self, image_index):
+        return self.generator.load_annotations(self.image_indices[image_index])
+
+
+def _evaluation_worker(tasks, results, generator, subset, backbone_name, evaluate_func, evaluate_kwargs, gpu):
+    """ Evaluates the snapshots received on tasks until None is received, the average precisions are put on results.
+    """
+    # imported here, so tensorflow is configured in the worker process only
+    from .. import models
+    from ..utils.gpu import setup_gpu
+
+    if gpu is not None:
+        setup_gpu(gpu)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        epoch, path, full = task
+        model = models.load_model(path, backbone_name=backbone_name)
+        average_precisions, _ = evaluate_func(generator if full else _GeneratorSubset(generator, subset), model, **evaluate_kwargs)
+        results.put((epoch, full, average_precisions))
+
+        os.remove(path)
+        keras.backend.clear_session()
+
 
 class Evaluate(keras.callbacks.Callback):
     """ Evaluation callback for arbitrary datasets.
@@ -31,43 +89,155 @@ class Evaluate(keras.callbacks.Callback):
         save_path=None,
         tensorboard=None,
         weighted_average=False,
+        batch_size=1,
+        workers=0,
+        evaluate_func=evaluate,
+        subset_size=None,
+        full_evaluation_every=1,
+        async_evaluation=False,
+        backbone_name='resnet50',
+        max_pending=1,
+        gpu=None,
+        seed=0,
         verbose=1
     ):
         """ Evaluate a given dataset using a given model at the end of every epoch during training.
 
+        The full dataset is evaluated every full_evaluation_every epochs, on other epochs a fixed random subset of
+        subset_size images is evaluated (if given). Its mAP is logged as mAP_subset.
+
+        With async_evaluation, the model is saved at the end of the epoch and evaluated by a separate process while
+        training continues. The mAP is reported in the logs of the first epoch ending after the evaluation finished,
+        and in TensorBoard at the evaluated epoch. Training waits if more than max_pending snapshots are queued.
+
         # Arguments
-            generator        : The generator that represents the dataset to evaluate.
-            iou_threshold    : The threshold used to consider when a detection is positive or negative.
-            score_threshold  : The score confidence threshold to use for detections.
-            max_detections   : The maximum number of detections to use per image.
-            save_path        : The path to save images with visualized detections to.
-            tensorboard      : Instance of keras.callbacks.TensorBoard used to log the mAP value.
-            weighted_average : Compute the mAP using the weighted average of precisions among classes.
-            verbose          : Set the verbosity level, by default this is set to 1.
+            generator             : The generator that represents the dataset to evaluate.
+            iou_threshold         : The threshold used to consider when a detection is positive or negative.
+            score_threshold       : The score confidence threshold to use for detections.
+            max_detections        : The maximum number of detections to use per image.
+            save_path             : The path to save images with visualized detections to.
+            tensorboard           : Instance of keras.callbacks.TensorBoard used to log the mAP value.
+            weighted_average      : Compute the mAP using the weighted average of precisions among classes.
+            batch_size            : The maximum number of images of the same shape run through the model at once.
+            workers               : The number of threads loading and preprocessing images.
+            evaluate_func         : The evaluation function, utils.eval.evaluate or utils.crops_eval.evaluate.
+            subset_size           : The number of images evaluated on epochs without a full evaluation (not for grid crops).
+            full_evaluation_every : Evaluate the full dataset every this many epochs.
+            async_evaluation      : Evaluate the model in a separate process.
+            backbone_name         : The backbone of the model, to load the snapshots in the evaluation process.
+            max_pending           : The maximum number of snapshots waiting for the evaluation process.
+            gpu                   : Id of the GPU used by the evaluation process (as reported by nvidia-smi).
+            seed                  : Seed used to select the subset.
+            verbose               : Set the verbosity level, by default this is set to 1.
         """
-        self.generator       = generator
-        self.iou_threshold   = iou_threshold
-        self.score_threshold = score_threshold
-        self.max_detections  = max_detections
-        self.save_path       = save_path
-        self.tensorboard     = tensorboard
-        self.weighted_average = weighted_average
-        self.verbose         = verbose
+        self.generator             = generator
+        self.iou_threshold         = iou_threshold
+        self.score_threshold       = score_threshold
+        self.max_detections        = max_detections
+        self.save_path             = save_path
+        self.tensorboard           = tensorboard
+        self.weighted_average      = weighted_average
+        self.batch_size            = batch_size
+        self.workers               = workers
+        self.evaluate_func         = evaluate_func
+        self.full_evaluation_every = full_evaluation_every
+        self.async_evaluation      = async_evaluation
+        self.backbone_name         = backbone_name
+        self.max_pending           = max_pending
+        self.gpu                   = gpu
+        self.verbose               = verbose
 
-        super(Evaluate, self).__init__()
+        self.subset = None
+        if subset_size is not None:
+            subset_size = min(subset_size, generator.size())
+            self.subset = np.sort(np.random.RandomState(seed).choice(generator.size(), subset_size, replace=False))
 
-    def on_epoch_end(self, epoch, logs=None):
-        logs = logs or {}
+        self.worker = None
 
-        # run evaluation
-        average_precisions, _ = evaluate(
-            self.generator,
-            self.model,
+        super(Evaluate, self).__init__()
+
+    def _evaluate_kwargs(self):
+        return dict(
             iou_threshold=self.iou_threshold,
             score_threshold=self.score_threshold,
             max_detections=self.max_detections,
-            save_path=self.save_path
+            save_path=self.save_path,
+            batch_size=self.batch_size,
+            workers=self.workers
+        )
+
+    def on_train_begin(self, logs=None):
+        if not self.async_evaluation:
+            return
+
+        # spawn a clean process, forking a process running tensorflow is not safe
+        context            = multiprocessing.get_context('spawn')
+        self.snapshot_dir  = tempfile.mkdtemp(prefix='retinanet-eval-')
+        self.tasks         = context.Queue(maxsize=self.max_pending)
+        self.results       = context.Queue()
+        self.pending       = 0
+        self.worker        = context.Process(
+            target=_evaluation_worker,
+            args=(self.tasks, self.results, self.generator, self.subset, self.backbone_name, self.evaluate_func,
+                  self._evaluate_kwargs(), self.gpu),
+            daemon=True
         )
+        self.worker.start()
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+
+        # finished evaluations are reported on the first epoch that ends after them, evaluated or not
+        if self.async_evaluation:
+            self._collect_results(logs)
+
+        full = (epoch + 1) % self.full_evaluation_every == 0
+        if not full and self.subset is None:
+            return
+
+        if self.async_evaluation:
+
+            # blocks while max_pending snapshots are waiting
+            path = os.path.join(self.snapshot_dir, 'epoch_{:03d}.h5'.format(epoch))
+            self.model.save(path, include_optimizer=False)
+            self.tasks.put((epoch, path, full))
+            self.pending += 1
+            return
+
+        # run evaluation
+        generator = self.generator if full else _GeneratorSubset(self.generator, self.subset)
+        average_precisions, _ = self.evaluate_func(generator, self.model, **self._evaluate_kwargs())
+        self._report(epoch, full, average_precisions, logs)
+
+    def on_train_end(self, logs=None):
+        if self.worker is None:
+            return
+
+        logs = logs or {}
+        self._collect_results(logs, wait=True)
+        self.tasks.put(None)
+        self.worker.join()
+        self.worker = None
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+
+    def _collect_results(self, logs, wait=False):
+        """ Report the evaluations finished by the evaluation process, optionally wait for all pending evaluations.
+        """
+        while self.pending > 0:
+            try:
+                epoch, full, average_precisions = self.results.get(timeout=1 if wait else 0)
+            except queue.Empty:
+                if not self.worker.is_alive():
+                    raise RuntimeError('The evaluation process exited with code {}.'.format(self.worker.exitcode))
+                if wait:
+                    continue
+                break
+
+            self.pending -= 1
+            self._report(epoch, full, average_precisions, logs)
+
+    def _report(self, epoch, full, average_precisions, logs):
+        suffix = '' if full else '_subset'
 
         # compute per class average precision
         total_instances = []
@@ -79,21 +249,23 @@ class Evaluate(keras.callbacks.Callback):
             total_instances.append(num_annotations)
             precisions.append(average_precision)
         if self.weighted_average:
-            self.mean_ap = sum([a * b for a, b in zip(total_instances, precisions)]) / sum(total_instances)
+            mean_ap = sum([a * b for a, b in zip(total_instances, precisions)]) / sum(total_instances)
         else:
-            self.mean_ap = sum(precisions) / sum(x > 0 for x in total_instances)
+            mean_ap = sum(precisions) / sum(x > 0 for x in total_instances)
 
         if self.tensorboard:
             import tensorflow as tf
             writer = tf.summary.create_file_writer(self.tensorboard.log_dir)
             with writer.as_default():
-                tf.summary.scalar("mAP", self.mean_ap, step=epoch)
+                tf.summary.scalar("mAP" + suffix, mean_ap, step=epoch)
                 if self.verbose == 1:
                     for label, (average_precision, num_annotations) in average_precisions.items():
-                        tf.summary.scalar("AP_" + self.generator.label_to_name(label), average_precision, step=epoch)
+                        tf.summary.scalar("AP_" + self.generator.label_to_name(label) + suffix, average_precision, step=epoch)
                 writer.flush()
 
-        logs['mAP'] = self.mean_ap
+        logs['mAP' + suffix] = mean_ap
+        if full:
+            self.mean_ap = mean_ap
 
         if self.verbose == 1:
-            print('mAP: {:.4f}'.format(self.mean_ap))
+            print('mAP{} (epoch {}): {:.4f}'.format(suffix, epoch + 1, mean_ap))
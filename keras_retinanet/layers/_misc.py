@@ -184,3 +184,147 @@ class ClipBoxes(keras.layers.Layer):
 
     def compute_output_shape(self, input_shape):
         return input_shape[1]
+
+
+class PreprocessImage(keras.layers.Layer):
+    """ Keras layer normalizing (uint8) images inside the network, the in-graph equivalent of utils.image.preprocess_image.
+    """
+
+    modes = {
+        # mode: (scale, mean, std), output = (input * scale - mean) / std
+        'caffe' : (1.0, [103.939, 116.779, 123.68], [1.0, 1.0, 1.0]),
+        'tf'    : (1.0 / 127.5, [1.0, 1.0, 1.0], [1.0, 1.0, 1.0]),
+        'torch' : (1.0 / 255.0, [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]),
+    }
+
+    def __init__(self, mode='caffe', *args, **kwargs):
+        """ Initializer for the PreprocessImage layer.
+
+        Args
+            mode: One of "caffe", "tf", "torch" or None.
+                - caffe: will zero-center each color channel with respect to the ImageNet dataset, without scaling.
+                - tf: will scale pixels between -1 and 1.
+                - torch: will scale pixels between 0 and 1 and then normalize each channel with respect to the ImageNet dataset.
+                - None: will only cast the input to floatx.
+        """
+        if mode is not None and mode not in self.modes:
+            raise ValueError('Unknown preprocessing mode {}, expected one of {}.'.format(mode, list(self.modes)))
+
+        self.mode = mode
+        super(PreprocessImage, self).__init__(*args, **kwargs)
+
+    def call(self, inputs, **kwargs):
+        inputs = keras.backend.cast(inputs, keras.backend.floatx())
+        if self.mode is None:
+            return inputs
+
+        scale, mean, std = self.modes[self.mode]
+        mean = np.array(mean, dtype=keras.backend.floatx())
+        std  = np.array(std, dtype=keras.backend.floatx())
+        if keras.backend.image_data_format() == 'channels_first':
+            mean = mean.reshape((3, 1, 1))
+            std  = std.reshape((3, 1, 1))
+
+        return (inputs * scale - mean) / std
+
+    def compute_output_shape(self, input_shape):
+        return input_shape
+
+    def get_config(self):
+        config = super(PreprocessImage, self).get_config()
+        config.update({
+            'mode': self.mode,
+        })
+
+        return config
+
+
+class AnchorTargets(keras.layers.Layer):
+    """ Keras layer assigning ground truth boxes to anchors, the in-graph equivalent of utils.anchors.anchor_targets_bbox.
+
+    The overlap of all anchors and all boxes of a batch is computed at once, so the memory use is batch_size * num_anchors * max_boxes.
+    """
+
+    def __init__(self, num_classes, negative_overlap=0.4, positive_overlap=0.5, *args, **kwargs):
+        """ Initializer for the AnchorTargets layer.
+
+        Args
+            num_classes      : Number of classes to predict.
+            negative_overlap : IoU overlap for negative anchors (all anchors with overlap < negative_overlap are negative).
+            positive_overlap : IoU overlap or positive anchors (all anchors with overlap > positive_overlap are positive).
+        """
+        self.num_classes      = num_classes
+        self.negative_overlap = negative_overlap
+        self.positive_overlap = positive_overlap
+        super(AnchorTargets, self).__init__(*args, **kwargs)
+
+    def call(self, inputs, **kwargs):
+        """ Compute the targets of the anchors.
+
+        Args
+            inputs : List of [anchors, boxes, labels, image_shapes] tensors. anchors has shape (B, N, 4), boxes has shape (B, M, 4),
+                     labels has shape (B, M) and is padded with -1, image_shapes has shape (B, 2) with the (height, width) of every image.
+
+        Returns
+            regression (B, N, 4 + 1) and labels (B, N, num_classes + 1) targets as returned by utils.anchors.anchor_targets_bbox.
+        """
+        anchors, boxes, labels, image_shapes = inputs
+        boxes = keras.backend.cast(boxes, keras.backend.floatx())
+        valid = keras.backend.greater_equal(labels, 0)
+
+        # overlap of every anchor with every box (B, N, M)
+        expanded_anchors = keras.backend.expand_dims(anchors, axis=2)
+        expanded_boxes   = keras.backend.expand_dims(boxes, axis=1)
+        iw = keras.backend.minimum(expanded_anchors[..., 2], expanded_boxes[..., 2]) - keras.backend.maximum(expanded_anchors[..., 0], expanded_boxes[..., 0])
+        ih = keras.backend.minimum(expanded_anchors[..., 3], expanded_boxes[..., 3]) - keras.backend.maximum(expanded_anchors[..., 1], expanded_boxes[..., 1])
+        intersection = keras.backend.maximum(iw, 0) * keras.backend.maximum(ih, 0)
+        anchor_areas = (expanded_anchors[..., 2] - expanded_anchors[..., 0]) * (expanded_anchors[..., 3] - expanded_anchors[..., 1])
+        box_areas    = (expanded_boxes[..., 2] - expanded_boxes[..., 0]) * (expanded_boxes[..., 3] - expanded_boxes[..., 1])
+        overlaps     = intersection / (anchor_areas + box_areas - intersection)
+
+        # padded boxes never match an anchor
+        overlaps = tensorflow.where(keras.backend.expand_dims(valid, axis=1), overlaps, -keras.backend.ones_like(overlaps))
+
+        # obtain indices of gt annotations with the greatest overlap
+        argmax_overlaps_inds = keras.backend.argmax(overlaps, axis=2)
+        max_overlaps         = keras.backend.max(overlaps, axis=2)
+        positive_indices     = keras.backend.greater_equal(max_overlaps, self.positive_overlap)
+        ignore_indices       = keras.backend.greater(max_overlaps, self.negative_overlap) & ~positive_indices
+
+        # ignore anchors with their center outside of the image
+        image_shapes    = keras.backend.cast(keras.backend.expand_dims(image_shapes, axis=1), keras.backend.floatx())
+        anchors_centers = (anchors[..., :2] + anchors[..., 2:]) / 2
+        outside_indices = keras.backend.greater_equal(anchors_centers[..., 0], image_shapes[..., 1]) | keras.backend.greater_equal(anchors_centers[..., 1], image_shapes[..., 0])
+
+        # -1 for ignore, 0 for background, 1 for object
+        anchor_state = keras.backend.cast(positive_indices, keras.backend.floatx()) - keras.backend.cast(ignore_indices, keras.backend.floatx())
+        anchor_state = tensorflow.where(outside_indices, -keras.backend.ones_like(anchor_state), anchor_state)
+        anchor_state = keras.backend.expand_dims(anchor_state)
+
+        # compute target class labels and regression targets
+        assigned_labels = tensorflow.gather(keras.backend.cast(labels, 'int32'), argmax_overlaps_inds, batch_dims=1)
+        labels_target   = keras.backend.one_hot(assigned_labels, self.num_classes) * keras.backend.expand_dims(keras.backend.cast(positive_indices, keras.backend.floatx()))
+        assigned_boxes  = tensorflow.gather(boxes, argmax_overlaps_inds, batch_dims=1)
+
+        regression_target = backend.bbox_transform(anchors, assigned_boxes)
+
+        return [
+            keras.backend.concatenate([regression_target, anchor_state], axis=2),
+            keras.backend.concatenate([labels_target, anchor_state], axis=2),
+        ]
+
+    def compute_output_shape(self, input_shape):
+        return [
+            (input_shape[0][0], input_shape[0][1], 4 + 1),
+            (input_shape[0][0], input_shape[0][1], self.num_classes + 1),
+        ]
+
+    def get_config(self):
+        config = super(AnchorTargets, self).get_config()
+        config.update({
+            'num_classes'      : self.num_classes,
+            'negative_overlap' : self.negative_overlap,
+            'positive_overlap' : self.positive_overlap,
+        })
+
+        return config
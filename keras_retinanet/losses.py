@@ -17,14 +17,17 @@ limitations under the License.
 import tensorflow
 from tensorflow import keras
 
+from . import backend
 
-def focal(alpha=0.25, gamma=2.0, cutoff=0.5):
+
+def focal(alpha=0.25, gamma=2.0, cutoff=0.5, sparse_targets=False):
     """ Create a functor for computing the focal loss.
 
     Args
         alpha: Scale the focal weight with alpha.
         gamma: Take the power of the focal weight with gamma.
         cutoff: Positive prediction cutoff for soft targets
+        sparse_targets: If True, y_true holds sparse targets (see utils.anchors.anchor_targets_bbox_sparse) which are expanded first.
 
     Returns
         A functor that computes the focal loss using the alpha and gamma.
@@ -41,6 +44,9 @@ def focal(alpha=0.25, gamma=2.0, cutoff=0.5):
         Returns
             The focal loss of y_pred w.r.t. y_true.
         """
+        if sparse_targets:
+            y_true = backend.densify_classification_targets(y_true, keras.backend.shape(y_pred)[1], keras.backend.shape(y_pred)[2])
+
         labels         = y_true[:, :, :-1]
         anchor_state   = y_true[:, :, -1]  # -1 for ignore, 0 for background, 1 for object
         classification = y_pred
@@ -68,11 +74,12 @@ def focal(alpha=0.25, gamma=2.0, cutoff=0.5):
     return _focal
 
 
-def smooth_l1(sigma=3.0):
+def smooth_l1(sigma=3.0, sparse_targets=False):
     """ Create a smooth L1 loss functor.
 
     Args
         sigma: This argument defines the point where the loss changes from L2 to L1.
+        sparse_targets: If True, y_true holds sparse targets (see utils.anchors.anchor_targets_bbox_sparse) which are expanded first.
 
     Returns
         A functor for computing the smooth L1 loss given target data and predicted data.
@@ -89,6 +96,9 @@ def smooth_l1(sigma=3.0):
         Returns
             The smooth L1 loss of y_pred w.r.t. y_true.
         """
+        if sparse_targets:
+            y_true = backend.densify_regression_targets(y_true, keras.backend.shape(y_pred)[1])
+
         # separate target and state
         regression        = y_pred
         regression_target = y_true[:, :, :-1]
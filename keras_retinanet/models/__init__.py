@@ -17,6 +17,8 @@ class Backbone(object):
             'FilterDetections' : layers.FilterDetections,
             'Anchors'          : layers.Anchors,
             'ClipBoxes'        : layers.ClipBoxes,
+            'PreprocessImage'  : layers.PreprocessImage,
+            'AnchorTargets'    : layers.AnchorTargets,
             '_smooth_l1'       : losses.smooth_l1(),
             '_focal'           : losses.focal(),
         }
@@ -24,6 +26,10 @@ class Backbone(object):
         self.backbone = backbone
         self.validate()
 
+    def __reduce__(self):
+        # custom_objects holds local functions, a backbone is pickled by name (eg. with generators sent to other processes)
+        return backbone, (self.backbone,)
+
     def retinanet(self, *args, **kwargs):
         """ Returns a retinanet model using the correct backbone.
         """
@@ -45,6 +51,11 @@ class Backbone(object):
         """
         raise NotImplementedError('preprocess_image method not implemented.')
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing the preprocess_image step inside the network, so that it can take uint8 images.
+        """
+        raise NotImplementedError('preprocess_layer method not implemented.')
+
 
 def backbone(backbone_name):
     """ Returns a backbone object for the given backbone.
@@ -110,6 +121,35 @@ def convert_model(model, nms=True, class_specific_filter=True, anchor_params=Non
     return retinanet_bbox(model=model, nms=nms, class_specific_filter=class_specific_filter, anchor_params=anchor_params, **kwargs)
 
 
+def add_preprocessing(model, preprocess_layer, dtype='uint8'):
+    """ Wraps a model such that it takes raw (uint8) images and normalizes them inside the graph.
+
+    Only the first input (the image) is preprocessed, other inputs (see retinanet.retinanet_train) are passed through.
+
+    Args
+        model            : A retinanet training or inference model.
+        preprocess_layer : The preprocessing layer of the backbone (see Backbone.preprocess_layer).
+        dtype            : The dtype of the new input.
+
+    Returns
+        A keras.models.Model object sharing its weights with model.
+    """
+    from tensorflow import keras
+    inputs  = [keras.layers.Input(shape=model.inputs[0].shape[1:], dtype=dtype)]
+    inputs += [keras.layers.Input(shape=i.shape[1:], dtype=i.dtype, name=i.name.split(':')[0]) for i in model.inputs[1:]]
+    if len(inputs) == 1:
+        outputs = model(preprocess_layer(inputs[0]))
+    else:
+        outputs = model([preprocess_layer(inputs[0])] + inputs[1:])
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+
+    # keep the output names of the wrapped model, losses are assigned by name
+    outputs = [keras.layers.Activation('linear', name=name)(output) for name, output in zip(model.output_names, outputs)]
+
+    return keras.models.Model(inputs=inputs if len(inputs) > 1 else inputs[0], outputs=outputs, name=model.name)
+
+
 def assert_training_model(model):
     """ Assert that the model is a training model.
     """
@@ -18,6 +18,7 @@ from tensorflow import keras
 
 from . import retinanet
 from . import Backbone
+from .. import layers
 from ..utils.image import preprocess_image
 
 
@@ -67,6 +68,11 @@ class DenseNetBackbone(Backbone):
         """
         return preprocess_image(inputs, mode='tf')
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing preprocess_image inside the network.
+        """
+        return layers.PreprocessImage(mode='tf', **kwargs)
+
 
 def densenet_retinanet(num_classes, backbone='densenet121', inputs=None, modifier=None, **kwargs):
     """ Constructs a retinanet model using a densenet backbone.
@@ -18,6 +18,7 @@ from tensorflow import keras
 
 from . import retinanet
 from . import Backbone
+from .. import layers
 import efficientnet.keras as efn
 
 
@@ -61,6 +62,11 @@ class EfficientNetBackbone(Backbone):
         """
         return efn.preprocess_input(inputs)
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing preprocess_image inside the network.
+        """
+        return layers.PreprocessImage(mode='torch', **kwargs)
+
 
 def effnet_retinanet(num_classes, backbone='EfficientNetB0', inputs=None, modifier=None, **kwargs):
     """ Constructs a retinanet model using a resnet backbone.
@@ -19,6 +19,7 @@ from ..utils.image import preprocess_image
 
 from . import retinanet
 from . import Backbone
+from .. import layers
 
 
 class MobileNetBackbone(Backbone):
@@ -74,6 +75,11 @@ class MobileNetBackbone(Backbone):
         """
         return preprocess_image(inputs, mode='tf')
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing preprocess_image inside the network.
+        """
+        return layers.PreprocessImage(mode='tf', **kwargs)
+
 
 def mobilenet_retinanet(num_classes, backbone='mobilenet224_1.0', inputs=None, modifier=None, **kwargs):
     """ Constructs a retinanet model using a mobilenet backbone.
@@ -17,6 +17,7 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 '''
 
 from . import Backbone
+from .. import layers
 from . import retinanet
 
 from ..utils.image import preprocess_image
@@ -65,6 +66,11 @@ class MobileNetV3Backbone(Backbone):
         """
         return preprocess_image(inputs, mode='tf')
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing preprocess_image inside the network.
+        """
+        return layers.PreprocessImage(mode='tf', **kwargs)
+
 
 def mobilenetv3_retinanet(num_classes, backbone_name='mobilenet_v3_small', inputs=None, modifier=None, **kwargs):
     """ Constructs a retinanet model using a mobilenet backbone.
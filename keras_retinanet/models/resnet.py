@@ -20,6 +20,7 @@ import keras_resnet.models
 
 from . import retinanet
 from . import Backbone
+from .. import layers
 from ..utils.image import preprocess_image
 
 
@@ -73,6 +74,11 @@ class ResNetBackbone(Backbone):
         """
         return preprocess_image(inputs, mode='caffe')
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing preprocess_image inside the network.
+        """
+        return layers.PreprocessImage(mode='caffe', **kwargs)
+
 
 def resnet_retinanet(num_classes, backbone='resnet50', inputs=None, modifier=None, **kwargs):
     """ Constructs a retinanet model using a resnet backbone.
@@ -17,6 +17,7 @@ limitations under the License.
 from tensorflow import keras
 from .. import initializers
 from .. import layers
+from .. import losses
 from ..utils.anchors import AnchorParameters
 from . import assert_training_model
 
@@ -401,3 +402,76 @@ def retinanet_bbox(
 
     # construct the model
     return keras.models.Model(inputs=model.inputs, outputs=detections, name=name)
+
+
+def retinanet_train(
+    model,
+    anchor_params         = None,
+    pyramid_levels        = None,
+    negative_overlap      = 0.4,
+    positive_overlap      = 0.5,
+    focal_alpha           = 0.25,
+    focal_gamma           = 2.0,
+    regression_weight     = 1.0,
+    classification_weight = 1.0,
+    name                  = 'retinanet-train'
+):
+    """ Construct a training model which computes the anchor targets and the losses inside the graph.
+
+    Next to the image, the model takes the ground truth of the batch as inputs: boxes (B, M, 4), labels (B, M) padded with -1 and
+    the (height, width) of every image (B, 2). The anchors are computed with layers.Anchors on the pyramid features and assigned
+    to the boxes with layers.AnchorTargets, which gives the same targets as utils.anchors.anchor_targets_bbox.
+    The losses are added to the model, so it is compiled without a loss.
+
+    Args
+        model                 : RetinaNet model to compute the targets for.
+        anchor_params         : Struct containing anchor parameters. If None, default values are used.
+        pyramid_levels        : pyramid levels to use.
+        negative_overlap      : IoU overlap for negative anchors (all anchors with overlap < negative_overlap are negative).
+        positive_overlap      : IoU overlap or positive anchors (all anchors with overlap > positive_overlap are positive).
+        focal_alpha           : Value of alpha parameter for the focal loss.
+        focal_gamma           : Value of gamma parameter for the focal loss.
+        regression_weight     : Weight of the regression loss.
+        classification_weight : Weight of the classification loss.
+        name                  : Name of the model.
+
+    Returns
+        A keras.models.Model which takes [image, boxes, labels, image_shapes] as input and outputs regression and classification.
+    """
+    assert_training_model(model)
+
+    # if no anchor parameters are passed, use default values
+    if anchor_params is None:
+        anchor_params = AnchorParameters.default
+
+    if pyramid_levels is None:
+        pyramid_levels = [3, 4, 5, 6, 7]
+
+    # compute the anchors
+    features = [model.get_layer('P{}'.format(p)).output for p in pyramid_levels]
+    anchors  = __build_anchors(anchor_params, features)
+
+    regression     = model.outputs[0]
+    classification = model.outputs[1]
+    num_classes    = classification.shape[-1]
+
+    boxes        = keras.layers.Input(shape=(None, 4), name='gt_boxes')
+    labels       = keras.layers.Input(shape=(None,), name='gt_labels')
+    image_shapes = keras.layers.Input(shape=(2,), name='image_shapes')
+
+    regression_target, labels_target = layers.AnchorTargets(
+        num_classes      = num_classes,
+        negative_overlap = negative_overlap,
+        positive_overlap = positive_overlap,
+        name             = 'anchor_targets'
+    )([anchors, boxes, labels, image_shapes])
+
+    training_model = keras.models.Model(inputs=model.inputs + [boxes, labels, image_shapes], outputs=model.outputs, name=name)
+
+    regression_loss     = losses.smooth_l1()(regression_target, regression)
+    classification_loss = losses.focal(focal_alpha, focal_gamma)(labels_target, classification)
+    training_model.add_loss(regression_weight * regression_loss + classification_weight * classification_loss)
+    training_model.add_metric(regression_loss, name='regression_loss')
+    training_model.add_metric(classification_loss, name='classification_loss')
+
+    return training_model
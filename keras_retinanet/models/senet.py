@@ -18,6 +18,7 @@ from tensorflow import keras
 
 from . import retinanet
 from . import Backbone
+from .. import layers
 from classification_models.keras import Classifiers
 
 
@@ -64,6 +65,13 @@ class SeBackbone(Backbone):
         """
         return self.preprocess_image_func(inputs)
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing preprocess_image inside the network.
+        """
+        # classification_models does not normalize the input of the seresnet models
+        mode = None if self.backbone.startswith('seresnet') else 'torch'
+        return layers.PreprocessImage(mode=mode, **kwargs)
+
 
 def senet_retinanet(num_classes, backbone='seresnext50', inputs=None, modifier=None, **kwargs):
     """ Constructs a retinanet model using a resnet backbone.
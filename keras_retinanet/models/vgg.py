@@ -19,6 +19,7 @@ from tensorflow import keras
 
 from . import retinanet
 from . import Backbone
+from .. import layers
 from ..utils.image import preprocess_image
 
 
@@ -64,6 +65,11 @@ class VGGBackbone(Backbone):
         """
         return preprocess_image(inputs, mode='caffe')
 
+    def preprocess_layer(self, **kwargs):
+        """ Returns a layer performing preprocess_image inside the network.
+        """
+        return layers.PreprocessImage(mode='caffe', **kwargs)
+
 
 def vgg_retinanet(num_classes, backbone='vgg16', inputs=None, modifier=None, **kwargs):
     """ Constructs a retinanet model using a vgg backbone.
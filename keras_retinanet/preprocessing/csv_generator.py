@@ -16,7 +16,7 @@ limitations under the License.
 """
 
 from .generator import Generator
-from ..utils.image import read_image_bgr
+from ..utils.image import read_image_bgr, read_image_bgr_resized
 
 import numpy as np
 from PIL import Image
@@ -207,6 +207,13 @@ class CSVGenerator(Generator):
         """
         return read_image_bgr(self.image_path(image_index))
 
+    def load_resized_image(self, image_index):
+        """ Load an image at the image_index, decoded at a reduced size when the resize scale allows it.
+        """
+        if self.no_resize:
+            return super(CSVGenerator, self).load_resized_image(image_index)
+        return read_image_bgr_resized(self.image_path(image_index), min_side=self.image_min_side, max_side=self.image_max_side)
+
     def load_annotations(self, image_index):
         """ Load annotations for an image_index.
         """
@@ -15,14 +15,16 @@ limitations under the License.
 """
 
 import numpy as np
+import os
 import random
 import warnings
 
 from tensorflow import keras
 
 from ..utils.anchors import (
+    AnchorCache,
+    anchor_grid_for_shape,
     anchor_targets_bbox,
-    anchors_for_shape,
     guess_shapes
 )
 from ..utils.config import parse_anchor_parameters, parse_pyramid_levels
@@ -30,10 +32,11 @@ from ..utils.image import (
     TransformParameters,
     adjust_transform_for_image,
     apply_transform,
+    compute_resize_scale,
     preprocess_image,
     resize_image,
 )
-from ..utils.transform import transform_aabb
+from ..utils.transform import scaling, transform_aabbs
 
 
 class Generator(keras.utils.Sequence):
@@ -54,6 +57,11 @@ class Generator(keras.utils.Sequence):
         compute_anchor_targets=anchor_targets_bbox,
         compute_shapes=guess_shapes,
         preprocess_image=preprocess_image,
+        preprocess_in_graph=False,
+        fused_transform=False,
+        sparse_overlaps=False,
+        targets_in_graph=False,
+        disk_image_cache=None,
         config=None
     ):
         """ Initialize Generator object.
@@ -70,6 +78,11 @@ class Generator(keras.utils.Sequence):
             compute_anchor_targets : Function handler for computing the targets of anchors for an image and its annotations.
             compute_shapes         : Function handler for computing the shapes of the pyramid for a given input.
             preprocess_image       : Function handler for preprocessing an image (scaling / normalizing) for passing through a network.
+            preprocess_in_graph    : If True, images are passed as uint8 and normalized by the network (see models.add_preprocessing), preprocess_image is not used.
+            fused_transform        : If True, the random transformation and the resize are applied with a single warp directly to the target size.
+            sparse_overlaps        : If True, compute_anchor_targets only computes overlaps of anchors near each box (see anchors.compute_overlap_sparse).
+            targets_in_graph       : If True, the annotations are passed as inputs and the anchor targets are computed by the network (see models.retinanet.retinanet_train).
+            disk_image_cache       : An utils.image_cache.ImageCache, if given images are resized when loaded and kept in the cache, augmentation is applied to the resized images.
         """
         self.transform_generator            = transform_generator
         self.visual_effect_generator        = visual_effect_generator
@@ -83,8 +96,22 @@ class Generator(keras.utils.Sequence):
         self.compute_anchor_targets         = compute_anchor_targets
         self.compute_shapes                 = compute_shapes
         self.preprocess_image               = preprocess_image
+        self.preprocess_in_graph            = preprocess_in_graph
+        self.fused_transform                = fused_transform
+        self.sparse_overlaps                = sparse_overlaps
+        self.targets_in_graph               = targets_in_graph
+        self.disk_image_cache               = disk_image_cache
         self.config                         = config
 
+        # parse the anchor configuration once, anchors are cached per image shape
+        self.anchor_params                  = None
+        self.pyramid_levels                 = None
+        if self.config and 'anchor_parameters' in self.config:
+            self.anchor_params = parse_anchor_parameters(self.config)
+        if self.config and 'pyramid_levels' in self.config:
+            self.pyramid_levels = parse_pyramid_levels(self.config)
+        self.anchor_cache                   = AnchorCache()
+
         # Define groups
         self.group_images()
 
@@ -141,6 +168,21 @@ class Generator(keras.utils.Sequence):
         """
         raise NotImplementedError('load_image method not implemented')
 
+    def load_resized_image(self, image_index):
+        """ Load an image at the image_index, resized using image_min_side and image_max_side.
+
+        Returns the image and the scale relative to the original image. Generators which can decode images
+        directly at a reduced size should override this method.
+        """
+        return self.resize_image(self.load_image(image_index))
+
+    def image_cache_key(self, image_index):
+        """ Identify the file of an image in the image cache, so the cached image is replaced when the file changes.
+        """
+        path = self.image_path(image_index)
+        stat = os.stat(path)
+        return {'image': os.path.abspath(path), 'mtime': stat.st_mtime_ns, 'file_size': stat.st_size}
+
     def load_annotations(self, image_index):
         """ Load annotations for an image_index.
         """
@@ -189,6 +231,25 @@ class Generator(keras.utils.Sequence):
         """
         return [self.load_image(image_index) for image_index in group]
 
+    def load_resized_image_group(self, group):
+        """ Load resized images for all images in a group, from the image cache if they were loaded before.
+
+        Returns the images and their scales relative to the original images.
+        """
+        image_group = []
+        scales      = []
+        for image_index in group:
+            key   = dict(self.image_cache_key(image_index), image_min_side=self.image_min_side, image_max_side=self.image_max_side, no_resize=self.no_resize)
+            entry = self.disk_image_cache.get(key)
+            if entry is None:
+                entry = self.load_resized_image(image_index)
+                self.disk_image_cache.put(key, *entry)
+
+            image_group.append(entry[0])
+            scales.append(entry[1])
+
+        return image_group, scales
+
     def random_visual_effect_group_entry(self, image, annotations):
         """ Randomly transforms image and annotation.
         """
@@ -227,12 +288,47 @@ class Generator(keras.utils.Sequence):
             image = apply_transform(transform, image, self.transform_parameters)
 
             # Transform the bounding boxes in the annotations.
-            annotations['bboxes'] = annotations['bboxes'].copy()
-            for index in range(annotations['bboxes'].shape[0]):
-                annotations['bboxes'][index, :] = transform_aabb(transform, annotations['bboxes'][index, :])
+            annotations['bboxes'] = transform_aabbs(transform, annotations['bboxes']).astype(annotations['bboxes'].dtype)
+
+        return image, annotations
+
+    def random_transform_resize_group_entry(self, image, annotations, transform=None):
+        """ Randomly transforms and resizes image and annotation with a single warp.
+
+        The resize scale is folded into the transformation, so the image is resampled once, directly at the target size.
+        """
+        if transform is None and not self.transform_generator:
+            image, image_scale = self.resize_image(image)
+            annotations['bboxes'] = annotations['bboxes'] * image_scale
+            return image, annotations
+
+        if transform is None:
+            transform = adjust_transform_for_image(next(self.transform_generator), image, self.transform_parameters.relative_translation)
+
+        # scale after transforming, the transformed image keeps the shape of the original image
+        image_scale  = self.compute_resize_scale(image.shape)
+        transform    = scaling((image_scale, image_scale)).dot(transform)
+        output_shape = (int(round(image.shape[0] * image_scale)), int(round(image.shape[1] * image_scale)))
+
+        # apply transformation to image
+        image = apply_transform(transform, image, self.transform_parameters, output_shape=output_shape)
+
+        # Transform the bounding boxes in the annotations.
+        annotations['bboxes'] = transform_aabbs(transform, annotations['bboxes']).astype(annotations['bboxes'].dtype)
 
         return image, annotations
 
+    def random_transform_resize_group(self, image_group, annotations_group):
+        """ Randomly transforms and resizes each image and its annotations.
+        """
+        assert(len(image_group) == len(annotations_group))
+
+        for index in range(len(image_group)):
+            # transform and resize a single group entry
+            image_group[index], annotations_group[index] = self.random_transform_resize_group_entry(image_group[index], annotations_group[index])
+
+        return image_group, annotations_group
+
     def random_transform_group(self, image_group, annotations_group):
         """ Randomly transforms each image and its annotations.
         """
@@ -245,6 +341,14 @@ class Generator(keras.utils.Sequence):
 
         return image_group, annotations_group
 
+    def compute_resize_scale(self, image_shape):
+        """ Compute the scale resize_image applies to an image with image_shape.
+        """
+        if self.no_resize:
+            return 1
+        else:
+            return compute_resize_scale(image_shape, min_side=self.image_min_side, max_side=self.image_max_side)
+
     def resize_image(self, image):
         """ Resize an image using image_min_side and image_max_side.
         """
@@ -256,15 +360,20 @@ class Generator(keras.utils.Sequence):
     def preprocess_group_entry(self, image, annotations):
         """ Preprocess image and its annotations.
         """
-        # resize image
-        image, image_scale = self.resize_image(image)
+        # resize image, the fused transformation or the image cache already resized it
+        if not self.fused_transform and self.disk_image_cache is None:
+            image, image_scale = self.resize_image(image)
+
+            # apply resizing to annotations too
+            annotations['bboxes'] *= image_scale
+
+        # the network normalizes uint8 images itself
+        if self.preprocess_in_graph:
+            return image, annotations
 
         # preprocess the image
         image = self.preprocess_image(image)
 
-        # apply resizing to annotations too
-        annotations['bboxes'] *= image_scale
-
         # convert to the wanted keras floatx
         image = keras.backend.cast_to_floatx(image)
 
@@ -281,15 +390,28 @@ class Generator(keras.utils.Sequence):
 
         return image_group, annotations_group
 
-    def group_images(self):
-        """ Order the images according to self.order and makes groups of self.batch_size.
+    def get_images_order(self, images_count, image_aspect_ratio):
+        """ Order images_count images according to self.group_method.
+
+        Args
+            images_count       : The number of images.
+            image_aspect_ratio : Function returning the aspect ratio of an image index, used for the 'ratio' method.
+
+        Returns
+            A list of image indices.
         """
-        # determine the order of the images
-        order = list(range(self.size()))
+        order = list(range(images_count))
         if self.group_method == 'random':
             random.shuffle(order)
         elif self.group_method == 'ratio':
-            order.sort(key=lambda x: self.image_aspect_ratio(x))
+            order.sort(key=image_aspect_ratio)
+        return order
+
+    def group_images(self):
+        """ Order the images according to self.order and makes groups of self.batch_size.
+        """
+        # determine the order of the images
+        order = self.get_images_order(self.size(), self.image_aspect_ratio)
 
         # divide into groups, one group = one batch
         self.groups = [[order[x % len(order)] for x in range(i, i + self.batch_size)] for i in range(0, len(order), self.batch_size)]
@@ -301,7 +423,7 @@ class Generator(keras.utils.Sequence):
         max_shape = tuple(max(image.shape[x] for image in image_group) for x in range(3))
 
         # construct an image batch object
-        image_batch = np.zeros((self.batch_size,) + max_shape, dtype=keras.backend.floatx())
+        image_batch = np.zeros((self.batch_size,) + max_shape, dtype=np.uint8 if self.preprocess_in_graph else keras.backend.floatx())
 
         # copy all images to the upper left part of the image batch object
         for image_index, image in enumerate(image_group):
@@ -312,15 +434,33 @@ class Generator(keras.utils.Sequence):
 
         return image_batch
 
-    def generate_anchors(self, image_shape):
-        anchor_params = None
-        pyramid_levels = None
-        if self.config and 'anchor_parameters' in self.config:
-            anchor_params = parse_anchor_parameters(self.config)
-        if self.config and 'pyramid_levels' in self.config:
-            pyramid_levels = parse_pyramid_levels(self.config)
+    def compute_annotation_inputs(self, image_group, annotations_group):
+        """ Compute the annotation inputs for a network computing its anchor targets in the graph (see models.retinanet.retinanet_train).
+
+        Returns
+            boxes (batch_size, M, 4), labels (batch_size, M) padded with -1 and the (height, width) of every image (batch_size, 2).
+        """
+        max_annotations = max(1, max(annotations['bboxes'].shape[0] for annotations in annotations_group))
 
-        return anchors_for_shape(image_shape, anchor_params=anchor_params, pyramid_levels=pyramid_levels, shapes_callback=self.compute_shapes)
+        boxes_batch  = np.zeros((self.batch_size, max_annotations, 4), dtype=keras.backend.floatx())
+        labels_batch = np.full((self.batch_size, max_annotations), -1, dtype=keras.backend.floatx())
+        shapes_batch = np.zeros((self.batch_size, 2), dtype=keras.backend.floatx())
+
+        for index, (image, annotations) in enumerate(zip(image_group, annotations_group)):
+            count = annotations['bboxes'].shape[0]
+            boxes_batch[index, :count]  = annotations['bboxes']
+            labels_batch[index, :count] = annotations['labels']
+            shapes_batch[index]         = image.shape[:2]
+
+        return [boxes_batch, labels_batch, shapes_batch]
+
+    def generate_anchors(self, image_shape):
+        return self.anchor_cache.anchors_for_shape(
+            image_shape,
+            anchor_params=self.anchor_params,
+            pyramid_levels=self.pyramid_levels,
+            shapes_callback=self.compute_shapes
+        )
 
     def compute_targets(self, image_group, annotations_group):
         """ Compute target outputs for the network using images and their annotations.
@@ -329,11 +469,21 @@ class Generator(keras.utils.Sequence):
         max_shape = tuple(max(image.shape[x] for image in image_group) for x in range(3))
         anchors   = self.generate_anchors(max_shape)
 
+        kwargs = {}
+        if self.sparse_overlaps:
+            kwargs['anchor_grid'] = anchor_grid_for_shape(
+                max_shape,
+                anchor_params=self.anchor_params,
+                pyramid_levels=self.pyramid_levels,
+                shapes_callback=self.compute_shapes
+            )
+
         batches = self.compute_anchor_targets(
             anchors,
             image_group,
             annotations_group,
-            self.num_classes()
+            self.num_classes(),
+            **kwargs
         )
 
         return list(batches)
@@ -342,8 +492,14 @@ class Generator(keras.utils.Sequence):
         """ Compute inputs and target outputs for the network.
         """
         # load images and annotations
-        image_group       = self.load_image_group(group)
-        annotations_group = self.load_annotations_group(group)
+        if self.disk_image_cache is None:
+            image_group       = self.load_image_group(group)
+            annotations_group = self.load_annotations_group(group)
+        else:
+            image_group, scales = self.load_resized_image_group(group)
+            annotations_group   = self.load_annotations_group(group)
+            for annotations, scale in zip(annotations_group, scales):
+                annotations['bboxes'] = annotations['bboxes'] * scale
 
         # check validity of annotations
         image_group, annotations_group = self.filter_annotations(image_group, annotations_group, group)
@@ -352,7 +508,10 @@ class Generator(keras.utils.Sequence):
         image_group, annotations_group = self.random_visual_effect_group(image_group, annotations_group)
 
         # randomly transform data
-        image_group, annotations_group = self.random_transform_group(image_group, annotations_group)
+        if self.fused_transform and self.disk_image_cache is None:
+            image_group, annotations_group = self.random_transform_resize_group(image_group, annotations_group)
+        else:
+            image_group, annotations_group = self.random_transform_group(image_group, annotations_group)
 
         # perform preprocessing steps
         image_group, annotations_group = self.preprocess_group(image_group, annotations_group)
@@ -360,6 +519,10 @@ class Generator(keras.utils.Sequence):
         # compute network inputs
         inputs = self.compute_inputs(image_group)
 
+        # the network computes its own targets from the annotations, keras only accepts multiple inputs without targets as a tuple
+        if self.targets_in_graph:
+            return tuple([inputs] + self.compute_annotation_inputs(image_group, annotations_group)), None
+
         # compute network targets
         targets = self.compute_targets(image_group, annotations_group)
 
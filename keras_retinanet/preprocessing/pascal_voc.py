@@ -15,12 +15,13 @@ limitations under the License.
 """
 
 from ..preprocessing.generator import Generator
-from ..utils.image import read_image_bgr
+from ..utils.image import read_image_bgr, read_image_bgr_resized, read_image_size
 
+from concurrent.futures import ThreadPoolExecutor
 import os
+import zipfile
 import numpy as np
 from six import raise_from
-from PIL import Image
 
 try:
     import xml.etree.cElementTree as ET
@@ -67,6 +68,104 @@ def _findNode(parent, name, debug_name=None, parse=None):
     return result
 
 
+def _parse_voc_annotations(path):
+    """ Parse a Pascal VOC annotations file.
+
+    Args
+        path : Path to the XML file.
+
+    Returns
+        The image size (width, height), (-1, -1) if it is not given, and the class names, boxes (N, 4), truncated and
+        difficult flags (N,) of all objects.
+    """
+    root = ET.parse(path).getroot()
+
+    # the size is optional and left empty by some tools (eg. data_utils/dataset.py)
+    width, height = -1, -1
+    size = root.find('size')
+    if size is not None and (size.findtext('width') or '').strip() and (size.findtext('height') or '').strip():
+        width  = _findNode(size, 'width', 'size.width', parse=lambda value: int(float(value)))
+        height = _findNode(size, 'height', 'size.height', parse=lambda value: int(float(value)))
+
+    elements  = root.findall('object')
+    names     = []
+    boxes     = np.empty((len(elements), 4))
+    truncated = np.empty((len(elements),), dtype=bool)
+    difficult = np.empty((len(elements),), dtype=bool)
+    for i, element in enumerate(elements):
+        try:
+            truncated[i] = _findNode(element, 'truncated', parse=int)
+            difficult[i] = _findNode(element, 'difficult', parse=int)
+            names.append(_findNode(element, 'name').text)
+
+            bndbox   = _findNode(element, 'bndbox')
+            boxes[i] = [
+                _findNode(bndbox, 'xmin', 'bndbox.xmin', parse=float) - 1,
+                _findNode(bndbox, 'ymin', 'bndbox.ymin', parse=float) - 1,
+                _findNode(bndbox, 'xmax', 'bndbox.xmax', parse=float) - 1,
+                _findNode(bndbox, 'ymax', 'bndbox.ymax', parse=float) - 1,
+            ]
+        except ValueError as e:
+            raise_from(ValueError('could not parse object #{}: {}'.format(i, e)), None)
+
+    return (width, height), names, boxes, truncated, difficult
+
+
+def _save_npz(path, **arrays):
+    """ Write arrays to an .npz file.
+
+    The arrays are written to a temporary file of this process first, so an interrupted write or several processes
+    building the same split never leave a broken file.
+    """
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def build_annotation_index(annotation_paths):
+    """ Parse Pascal VOC annotation files into contiguous arrays.
+
+    The objects of image i are the rows offsets[i]:offsets[i + 1] of bboxes, class_ids, truncated and difficult,
+    class_ids index class_names.
+
+    Args
+        annotation_paths : Paths to the XML files of all images.
+
+    Returns
+        A dict of numpy arrays: offsets, bboxes, class_ids, class_names, truncated, difficult, sizes (width, height) and mtimes of the files.
+    """
+    sizes, all_names, all_boxes, all_truncated, all_difficult = [], [], [], [], []
+    for path in annotation_paths:
+        try:
+            size, names, boxes, truncated, difficult = _parse_voc_annotations(path)
+        except (ET.ParseError, ValueError) as e:
+            raise_from(ValueError('invalid annotations file: {}: {}'.format(os.path.basename(path), e)), None)
+        sizes.append(size)
+        all_names.extend(names)
+        all_boxes.append(boxes)
+        all_truncated.append(truncated)
+        all_difficult.append(difficult)
+
+    class_names, class_ids = np.unique(np.array(all_names, dtype=str), return_inverse=True)
+    counts = [len(boxes) for boxes in all_boxes]
+
+    return {
+        'offsets'     : np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        'bboxes'      : np.concatenate(all_boxes) if all_boxes else np.empty((0, 4)),
+        'class_ids'   : class_ids.astype(np.int64).reshape(-1),
+        'class_names' : class_names,
+        'truncated'   : np.concatenate(all_truncated) if all_truncated else np.empty((0,), dtype=bool),
+        'difficult'   : np.concatenate(all_difficult) if all_difficult else np.empty((0,), dtype=bool),
+        'sizes'       : np.array(sizes, dtype=np.int64).reshape(-1, 2),
+        'mtimes'      : np.array([os.path.getmtime(path) for path in annotation_paths], dtype=np.float64),
+    }
+
+
 class PascalVocGenerator(Generator):
     """ Generate data for a Pascal VOC dataset.
 
@@ -81,6 +180,8 @@ class PascalVocGenerator(Generator):
         image_extension='.jpg',
         skip_truncated=False,
         skip_difficult=False,
+        annotation_index=True,
+        size_scan_workers=16,
         **kwargs
     ):
         """ Initialize a Pascal VOC data generator.
@@ -88,6 +189,9 @@ class PascalVocGenerator(Generator):
         Args
             base_dir: Directory w.r.t. where the files are to be searched (defaults to the directory containing the csv_data_file).
             csv_class_file: Path to the CSV classes file.
+            annotation_index: Parse the annotations of the split once into an index, stored next to the split file
+                              (ImageSets/Main/<set_name>.index.npz) and rebuilt when an annotation file changes.
+            size_scan_workers: Number of threads reading the modification times and headers of the images whose sizes are missing from the annotations.
         """
         self.data_dir             = data_dir
         self.set_name             = set_name
@@ -96,13 +200,52 @@ class PascalVocGenerator(Generator):
         self.image_extension      = image_extension
         self.skip_truncated       = skip_truncated
         self.skip_difficult       = skip_difficult
+        self.size_scan_workers    = size_scan_workers
+        self.image_sizes_cache    = None
 
         self.labels = {}
         for key, value in self.classes.items():
             self.labels[value] = key
 
+        self.annotation_index = None
+        if annotation_index:
+            self.annotation_index = self._load_annotation_index()
+            self.index_labels     = np.array([self.classes.get(name, -1) for name in self.annotation_index['class_names']], dtype=np.int64)
+
         super(PascalVocGenerator, self).__init__(**kwargs)
 
+    def annotation_path(self, image_index):
+        """ Get the path to the annotations file of an image.
+        """
+        return os.path.join(self.data_dir, 'Annotations', self.image_names[image_index] + '.xml')
+
+    def _load_annotation_index(self):
+        """ Load the annotation index of the split, (re)building it if an annotation file changed since it was built.
+        """
+        path             = os.path.join(self.data_dir, 'ImageSets', 'Main', self.set_name + '.index.npz')
+        annotation_paths = [self.annotation_path(i) for i in range(len(self.image_names))]
+        mtimes           = np.array([os.path.getmtime(p) for p in annotation_paths], dtype=np.float64)
+
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    index = {key: data[key] for key in data.files}
+                if index['image_names'].tolist() == self.image_names and np.array_equal(index['mtimes'], mtimes):
+                    return index
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                pass
+
+        index = build_annotation_index(annotation_paths)
+        index['image_names'] = np.array(self.image_names, dtype=str)
+
+        try:
+            _save_npz(path, **index)
+        except OSError:
+            # read-only dataset, the index is kept in memory only
+            pass
+
+        return index
+
     def size(self):
         """ Size of the dataset.
         """
@@ -133,12 +276,63 @@ class PascalVocGenerator(Generator):
         """
         return self.labels[label]
 
+    def _load_image_sizes(self):
+        """ Load the (width, height) of all images of the split.
+
+        Sizes are read from the annotations when they contain them. The other images are read from their headers by a
+        pool of threads, and stored in ImageSets/Main/<set_name>.sizes.npz until the image file changes.
+        """
+        sizes = np.full((len(self.image_names), 2), -1, dtype=np.int64)
+        if self.annotation_index is not None:
+            sizes[:] = self.annotation_index['sizes']
+
+        missing = np.flatnonzero((sizes <= 0).any(axis=1))
+        if missing.size == 0:
+            return sizes
+
+        path   = os.path.join(self.data_dir, 'ImageSets', 'Main', self.set_name + '.sizes.npz')
+        mtimes = np.full((len(self.image_names),), np.nan)
+
+        # stat and header reads are dominated by the latency of the file system, so many of them run at once
+        with ThreadPoolExecutor(max_workers=max(self.size_scan_workers, 1)) as executor:
+            mtimes[missing] = list(executor.map(os.path.getmtime, [self.image_path(i) for i in missing]))
+
+            if os.path.exists(path):
+                try:
+                    with np.load(path) as data:
+                        if data['image_names'].tolist() == self.image_names:
+                            cached        = missing[data['mtimes'][missing] == mtimes[missing]]
+                            sizes[cached] = data['sizes'][cached]
+                except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                    pass
+
+            scan = np.flatnonzero((sizes <= 0).any(axis=1))
+            if scan.size == 0:
+                return sizes
+
+            sizes[scan] = list(executor.map(read_image_size, [self.image_path(i) for i in scan]))
+
+        try:
+            _save_npz(path, image_names=np.array(self.image_names, dtype=str), sizes=sizes, mtimes=mtimes)
+        except OSError:
+            # read-only dataset, the sizes are kept in memory only
+            pass
+
+        return sizes
+
+    def image_size(self, image_index):
+        """ Get the (width, height) of an image without decoding it.
+        """
+        if self.image_sizes_cache is None:
+            self.image_sizes_cache = self._load_image_sizes()
+        width, height = self.image_sizes_cache[image_index]
+        return int(width), int(height)
+
     def image_aspect_ratio(self, image_index):
         """ Compute the aspect ratio for an image with image_index.
         """
-        path  = os.path.join(self.data_dir, 'JPEGImages', self.image_names[image_index] + self.image_extension)
-        image = Image.open(path)
-        return float(image.width) / float(image.height)
+        width, height = self.image_size(image_index)
+        return float(width) / float(height)
 
     def image_path(self, image_index):
         """ Get the path to an image.
@@ -150,55 +344,40 @@ class PascalVocGenerator(Generator):
         """
         return read_image_bgr(self.image_path(image_index))
 
-    def __parse_annotation(self, element):
-        """ Parse an annotation given an XML element.
-        """
-        truncated = _findNode(element, 'truncated', parse=int)
-        difficult = _findNode(element, 'difficult', parse=int)
-
-        class_name = _findNode(element, 'name').text
-        if class_name not in self.classes:
-            raise ValueError('class name \'{}\' not found in classes: {}'.format(class_name, list(self.classes.keys())))
-
-        box = np.zeros((4,))
-        label = self.name_to_label(class_name)
-
-        bndbox    = _findNode(element, 'bndbox')
-        box[0] = _findNode(bndbox, 'xmin', 'bndbox.xmin', parse=float) - 1
-        box[1] = _findNode(bndbox, 'ymin', 'bndbox.ymin', parse=float) - 1
-        box[2] = _findNode(bndbox, 'xmax', 'bndbox.xmax', parse=float) - 1
-        box[3] = _findNode(bndbox, 'ymax', 'bndbox.ymax', parse=float) - 1
-
-        return truncated, difficult, box, label
-
-    def __parse_annotations(self, xml_root):
-        """ Parse all annotations under the xml_root.
+    def load_resized_image(self, image_index):
+        """ Load an image at the image_index, decoded at a reduced size when the resize scale allows it.
         """
-        annotations = {'labels': np.empty((len(xml_root.findall('object')),)), 'bboxes': np.empty((len(xml_root.findall('object')), 4))}
-        for i, element in enumerate(xml_root.iter('object')):
-            try:
-                truncated, difficult, box, label = self.__parse_annotation(element)
-            except ValueError as e:
-                raise_from(ValueError('could not parse object #{}: {}'.format(i, e)), None)
-
-            if truncated and self.skip_truncated:
-                continue
-            if difficult and self.skip_difficult:
-                continue
-
-            annotations['bboxes'][i, :] = box
-            annotations['labels'][i] = label
-
-        return annotations
+        if self.no_resize:
+            return super(PascalVocGenerator, self).load_resized_image(image_index)
+        return read_image_bgr_resized(self.image_path(image_index), min_side=self.image_min_side, max_side=self.image_max_side)
 
     def load_annotations(self, image_index):
         """ Load annotations for an image_index.
         """
         filename = self.image_names[image_index] + '.xml'
-        try:
-            tree = ET.parse(os.path.join(self.data_dir, 'Annotations', filename))
-            return self.__parse_annotations(tree.getroot())
-        except ET.ParseError as e:
-            raise_from(ValueError('invalid annotations file: {}: {}'.format(filename, e)), None)
-        except ValueError as e:
-            raise_from(ValueError('invalid annotations file: {}: {}'.format(filename, e)), None)
+        if self.annotation_index is not None:
+            start, end = self.annotation_index['offsets'][image_index:image_index + 2]
+            names      = self.annotation_index['class_names'][self.annotation_index['class_ids'][start:end]]
+            labels     = self.index_labels[self.annotation_index['class_ids'][start:end]]
+            bboxes     = self.annotation_index['bboxes'][start:end]
+            truncated  = self.annotation_index['truncated'][start:end]
+            difficult  = self.annotation_index['difficult'][start:end]
+        else:
+            try:
+                _, names, bboxes, truncated, difficult = _parse_voc_annotations(self.annotation_path(image_index))
+            except (ET.ParseError, ValueError) as e:
+                raise_from(ValueError('invalid annotations file: {}: {}'.format(filename, e)), None)
+            labels = np.array([self.classes.get(name, -1) for name in names], dtype=np.int64)
+
+        unknown = np.flatnonzero(labels < 0)
+        if unknown.size:
+            raise ValueError('invalid annotations file: {}: could not parse object #{}: class name \'{}\' not found in classes: {}'.format(
+                filename, unknown[0], names[unknown[0]], list(self.classes.keys())))
+
+        keep = np.ones((len(labels),), dtype=bool)
+        if self.skip_truncated:
+            keep &= ~truncated
+        if self.skip_difficult:
+            keep &= ~difficult
+
+        return {'labels': labels[keep].astype(np.float64), 'bboxes': bboxes[keep]}
@@ -1,9 +1,6 @@
 import itertools
 import numpy as np
 import random
-import os
-
-from PIL import Image
 
 from ..utils.crops_sampling import PositiveSampling, NegativeSampling
 from ..preprocessing.pascal_voc import PascalVocGenerator
@@ -128,19 +125,13 @@ class PascalVocBalancedCropsGenerator(PascalVocGenerator):
         """
         return super().size() * (1 + self.negatives_per_positive)
 
-    def image_aspect_ratio_pil(self, image_index):
-        path = os.path.join(self.data_dir, 'JPEGImages', self.image_names[image_index] + self.image_extension)
-        image = Image.open(path)
-        return float(image.width) / float(image.height)
-
     def group_images(self):
         """
         Overload of Generator base method. Forms groups of crops instead of image groups
         """
         # determine the order of the images
         images_count = super().size()
-        order = self.get_images_order(
-            images_count, lambda image_index: self.image_aspect_ratio_pil(image_index))
+        order = self.get_images_order(images_count, self.image_aspect_ratio)
 
         samples_per_image = 1 + self.negatives_per_positive
         samples = itertools.chain.from_iterable((itertools.repeat(i, samples_per_image) for i in order))
@@ -158,6 +149,11 @@ class PascalVocBalancedCropsGenerator(PascalVocGenerator):
         """
         return image, 1
 
+    def compute_resize_scale(self, image_shape):
+        """ Overloads base generator method, crops are never resized
+        """
+        return 1
+
     def load_image(self, image_index):
         """ Overloads base method, sampling a crop instead of image with image_index.
         """
@@ -167,6 +163,11 @@ class PascalVocBalancedCropsGenerator(PascalVocGenerator):
         crop_description.last_y_min = crop_info[2]
         return crop_info[0]
 
+    def load_resized_image(self, image_index):
+        """ Overloads base method, crops are sampled from full resolution images and never resized.
+        """
+        return self.resize_image(self.load_image(image_index))
+
     def load_annotations(self, image_index):
         """
         Overloads base method, loading annotations for crop, with cropped bounding boxes
@@ -1,13 +1,9 @@
 from itertools import groupby
-import os
 from typing import NamedTuple
 
-from PIL import Image
-import random
-
 from ..preprocessing.pascal_voc import PascalVocGenerator
 from ..utils.grid_cropper import ImageGridCropper
-from ..utils.image import compute_resize_scale, resize_image
+from ..utils.image import compute_resize_scale, read_image_bgr_resized
 
 
 class CropReference(NamedTuple):
@@ -39,10 +35,8 @@ class PascalVocGridCropsGenerator(PascalVocGenerator):
 
     def _get_image_size(self, image_index):
         if image_index not in self.image_sizes:
-            path = os.path.join(self.data_dir, 'JPEGImages', self.image_names[image_index] + self.image_extension)
-            # turns out to be quicker way to get image size only than cv2.imread
-            im = Image.open(path)
-            width, height = im.size
+            # read from the annotations or the image header, see PascalVocGenerator.image_size
+            width, height = self.image_size(image_index)
 
             scale = 1
             if not self.no_resize:
@@ -72,11 +66,11 @@ class PascalVocGridCropsGenerator(PascalVocGenerator):
     def _get_image_cached(self, image_index):
         if image_index not in self.image_cache:
             self.image_cache.clear()
-            image = super().load_image(image_index)
-
-            scale = 1
-            if not self.no_resize:
-                image, scale = resize_image(image, self.image_min_side, self.image_max_side)
+            if self.no_resize:
+                image, scale = super().load_image(image_index), 1
+            else:
+                # decode large JPEG images at a reduced size directly
+                image, scale = read_image_bgr_resized(self.image_path(image_index), self.image_min_side, self.image_max_side)
             self.image_cache[image_index] = (scale, image)
         return self.image_cache[image_index]
 
@@ -127,6 +121,11 @@ class PascalVocGridCropsGenerator(PascalVocGenerator):
         """
         return image, 1
 
+    def compute_resize_scale(self, image_shape):
+        """ Overloads base generator method, crops are never resized
+        """
+        return 1
+
     def load_image_group(self, group):
         """ Overloads base method, loading an crops group instead of images group.
         """
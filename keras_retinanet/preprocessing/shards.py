@@ -0,0 +1,120 @@
+import glob
+import os
+
+import numpy as np
+
+from .generator import Generator
+from ..utils.image import decode_image_bgr, decode_image_bgr_resized
+from ..utils.shards import ShardReader
+
+
+class ShardGenerator(Generator):
+    """ Generate data from shard files written by utils.shards.write_shards.
+
+    Every shard is a single memory mapped file, images are decoded directly from the map.
+    """
+
+    def __init__(self, shards, **kwargs):
+        """ Initialize a shard data generator.
+
+        Args
+            shards: A list of shard paths, or a glob pattern matching them (eg. /data/ladd/train-*.shard).
+        """
+        if isinstance(shards, str):
+            shards = sorted(glob.glob(shards))
+        if not shards:
+            raise ValueError('no shard files given')
+
+        self.readers = [ShardReader(path) for path in shards]
+        for reader in self.readers[1:]:
+            if reader.class_names != self.readers[0].class_names:
+                raise ValueError('shard {} has classes {}, expected {}'.format(reader.path, reader.class_names, self.readers[0].class_names))
+
+        self.class_names = self.readers[0].class_names
+        self.classes     = {name: label for label, name in enumerate(self.class_names)}
+
+        # image index to (shard, index in shard)
+        self.image_shards  = np.concatenate([np.full((len(reader),), i, dtype=np.int64) for i, reader in enumerate(self.readers)])
+        self.shard_indices = np.concatenate([np.arange(len(reader), dtype=np.int64) for reader in self.readers])
+
+        super(ShardGenerator, self).__init__(**kwargs)
+
+    def _locate(self, image_index):
+        return self.readers[self.image_shards[image_index]], self.shard_indices[image_index]
+
+    def size(self):
+        """ Size of the dataset.
+        """
+        return len(self.image_shards)
+
+    def num_classes(self):
+        """ Number of classes in the dataset.
+        """
+        return len(self.class_names)
+
+    def has_label(self, label):
+        """ Return True if label is a known label.
+        """
+        return 0 <= label < len(self.class_names)
+
+    def has_name(self, name):
+        """ Returns True if name is a known class.
+        """
+        return name in self.classes
+
+    def name_to_label(self, name):
+        """ Map name to label.
+        """
+        return self.classes[name]
+
+    def label_to_name(self, label):
+        """ Map label to name.
+        """
+        return self.class_names[label]
+
+    def image_size(self, image_index):
+        """ Get the (width, height) of an image.
+        """
+        reader, index = self._locate(image_index)
+        return reader.image_size(index)
+
+    def image_aspect_ratio(self, image_index):
+        """ Compute the aspect ratio for an image with image_index.
+        """
+        width, height = self.image_size(image_index)
+        return float(width) / float(height)
+
+    def image_path(self, image_index):
+        """ Get a name for an image, images are not stored as files.
+        """
+        reader, index = self._locate(image_index)
+        return '{}:{}'.format(reader.path, reader.names[index])
+
+    def image_cache_key(self, image_index):
+        """ Identify an image in the image cache by its shard file and name.
+        """
+        reader, index = self._locate(image_index)
+        stat = os.stat(reader.path)
+        return {'image': '{}:{}'.format(os.path.abspath(reader.path), reader.names[index]), 'mtime': stat.st_mtime_ns, 'file_size': stat.st_size}
+
+    def load_image(self, image_index):
+        """ Load an image at the image_index.
+        """
+        reader, index = self._locate(image_index)
+        return decode_image_bgr(reader.image_bytes(index))
+
+    def load_resized_image(self, image_index):
+        """ Load an image at the image_index, decoded at a reduced size when the resize scale allows it.
+        """
+        if self.no_resize:
+            return super(ShardGenerator, self).load_resized_image(image_index)
+
+        reader, index = self._locate(image_index)
+        width, height = reader.image_size(index)
+        return decode_image_bgr_resized(reader.image_bytes(index), width, height, min_side=self.image_min_side, max_side=self.image_max_side)
+
+    def load_annotations(self, image_index):
+        """ Load annotations for an image_index.
+        """
+        reader, index = self._locate(image_index)
+        return reader.annotations(index)
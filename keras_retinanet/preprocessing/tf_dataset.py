@@ -0,0 +1,108 @@
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+
+class _LockedIterator(object):
+    """ Makes an iterator (eg. the transform generator) safe to use from several threads.
+    """
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.lock     = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.lock:
+            return next(self.iterator)
+
+
+def _element(inputs, targets):
+    """ The dataset element for the inputs and targets of a batch, a network computing its own targets only gets inputs.
+    """
+    if targets is None:
+        return (inputs,)
+    return inputs, tuple(targets)
+
+
+def create_dataset(
+    generator,
+    num_parallel_calls=tf.data.AUTOTUNE,
+    prefetch=tf.data.AUTOTUNE,
+    shuffle=None,
+    num_shards=1,
+    shard_index=0,
+    interleave=None,
+    seed=None,
+    deterministic=True,
+    repeat=True
+):
+    """ Create a tf.data.Dataset of the batches of a generator.
+
+    Batches are computed by generator[index], called from parallel map calls. The Python code runs with the GIL held, but
+    image decoding, warping and the anchor overlaps release it. The crops generators are not supported, they keep the
+    current image and sampling state in the generator, which is not thread safe.
+
+    Args
+        generator          : The generator providing the batches, its transform generator is made thread safe.
+        num_parallel_calls : The number of batches computed in parallel (defaults to tuning it automatically).
+        prefetch           : The number of batches computed ahead of the training step (defaults to tuning it automatically).
+        shuffle            : If True, the order of the batches is shuffled every epoch (defaults to generator.shuffle_groups).
+        num_shards         : Split the batches in this many shards, for example one per training process.
+        shard_index        : The shard of the batches used by this dataset, shard i has the batches with index % num_shards == i.
+        interleave         : If given, the batches are read as this many interleaved sequences of consecutive batches instead of
+                             in a shuffled order, only the order of the sequences is shuffled. With a ShardGenerator grouped
+                             with group_method='none', consecutive batches are consecutive records of a shard file.
+        seed               : The seed of the shuffling.
+        deterministic      : If True, batches are produced in order, otherwise a batch may be skipped ahead of a slow one.
+        repeat             : If True, repeat the batches forever, reshuffled every epoch.
+
+    Returns
+        A dataset of (inputs, targets) elements, or (inputs,) if the network computes its own targets.
+    """
+    if shuffle is None:
+        shuffle = generator.shuffle_groups
+    if generator.transform_generator is not None and not isinstance(generator.transform_generator, _LockedIterator):
+        generator.transform_generator = _LockedIterator(generator.transform_generator)
+
+    # the structure, dtypes and ranks of the elements are taken from the first batch
+    structure = _element(*generator[0])
+    specs     = [tf.TensorSpec([None] * np.ndim(array), tf.as_dtype(np.asarray(array).dtype)) for array in tf.nest.flatten(structure)]
+
+    def compute_batch(index):
+        return [np.asarray(array) for array in tf.nest.flatten(_element(*generator[int(index)]))]
+
+    def load_batch(index):
+        flat = tf.numpy_function(compute_batch, [index], [spec.dtype for spec in specs])
+        for tensor, spec in zip(flat, specs):
+            tensor.set_shape(spec.shape)
+        return tf.nest.pack_sequence_as(structure, flat)
+
+    indices = tf.data.Dataset.range(len(generator)).shard(num_shards, shard_index)
+
+    if interleave:
+        # split the batches in interleave sequences of consecutive batches
+        count     = len(range(shard_index, len(generator), num_shards))
+        bounds    = np.linspace(0, count, interleave + 1).astype(np.int64)
+        sequences = tf.data.Dataset.from_tensor_slices((bounds[:-1], bounds[1:]))
+        if shuffle:
+            sequences = sequences.shuffle(interleave, seed=seed)
+        if repeat:
+            sequences = sequences.repeat()
+
+        indices = sequences.interleave(
+            lambda start, end: indices.skip(start).take(end - start),
+            cycle_length=interleave,
+            block_length=1,
+            deterministic=deterministic
+        )
+    else:
+        if shuffle:
+            indices = indices.shuffle(len(generator), seed=seed)
+        if repeat:
+            indices = indices.repeat()
+
+    dataset = indices.map(load_batch, num_parallel_calls=num_parallel_calls, deterministic=deterministic)
+    return dataset.prefetch(prefetch)
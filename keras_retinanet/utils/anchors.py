@@ -14,6 +14,9 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
+import threading
+from collections import OrderedDict
+
 import numpy as np
 from tensorflow import keras
 
@@ -56,7 +59,8 @@ def anchor_targets_bbox(
     annotations_group,
     num_classes,
     negative_overlap=0.4,
-    positive_overlap=0.5
+    positive_overlap=0.5,
+    anchor_grid=None
 ):
     """ Generate anchor targets for bbox detection.
 
@@ -68,6 +72,7 @@ def anchor_targets_bbox(
         mask_shape: If the image is padded with zeros, mask_shape can be used to mark the relevant part of the image.
         negative_overlap: IoU overlap for negative anchors (all anchors with overlap < negative_overlap are negative).
         positive_overlap: IoU overlap or positive anchors (all anchors with overlap > positive_overlap are positive).
+        anchor_grid: If given (see anchor_grid_for_shape), overlaps are only computed for anchors near each box.
 
     Returns
         labels_batch: batch that contains labels & anchor states (np.array of shape (batch_size, N, num_classes + 1),
@@ -92,7 +97,12 @@ def anchor_targets_bbox(
     for index, (image, annotations) in enumerate(zip(image_group, annotations_group)):
         if annotations['bboxes'].shape[0]:
             # obtain indices of gt annotations with the greatest overlap
-            positive_indices, ignore_indices, argmax_overlaps_inds = compute_gt_annotations(anchors, annotations['bboxes'], negative_overlap, positive_overlap)
+            if anchor_grid is not None:
+                positive_indices, ignore_indices, argmax_overlaps_inds = compute_gt_annotations_sparse(
+                    anchors, anchor_grid, annotations['bboxes'], negative_overlap, positive_overlap
+                )
+            else:
+                positive_indices, ignore_indices, argmax_overlaps_inds = compute_gt_annotations(anchors, annotations['bboxes'], negative_overlap, positive_overlap)
 
             labels_batch[index, ignore_indices, -1]       = -1
             labels_batch[index, positive_indices, -1]     = 1
@@ -116,6 +126,96 @@ def anchor_targets_bbox(
     return regression_batch, labels_batch
 
 
+def anchor_targets_bbox_sparse(
+    anchors,
+    image_group,
+    annotations_group,
+    num_classes,
+    negative_overlap=0.4,
+    positive_overlap=0.5,
+    anchor_grid=None
+):
+    """ Generate sparse anchor targets for bbox detection.
+
+    Gives the same targets as anchor_targets_bbox, but only lists the positive and ignored anchors, all other anchors are background.
+    Regression targets are only computed for positive anchors. The targets are expanded to the dense format inside the graph
+    (see backend.densify_regression_targets and backend.densify_classification_targets, or losses.focal and losses.smooth_l1 with sparse_targets=True).
+
+    Anchor indices are stored as floats, which represents them exactly for up to 2 ** 24 anchors.
+
+    Args
+        anchors: np.array of annotations of shape (N, 4) for (x1, y1, x2, y2).
+        image_group: List of BGR images.
+        annotations_group: List of annotation dictionaries with each annotation containing 'labels' and 'bboxes' of an image.
+        num_classes: Number of classes to predict.
+        negative_overlap: IoU overlap for negative anchors (all anchors with overlap < negative_overlap are negative).
+        positive_overlap: IoU overlap or positive anchors (all anchors with overlap > positive_overlap are positive).
+        anchor_grid: If given (see anchor_grid_for_shape), overlaps are only computed for anchors near each box.
+
+    Returns
+        regression_batch: batch that contains the anchor index and regression targets of every positive anchor (np.array of shape (batch_size, P, 1 + 4),
+                      where P is the largest number of positive anchors of an image in the batch, unused rows have an anchor index of -1).
+        labels_batch: batch that contains the anchor index and label of every positive anchor, or -1 as label for ignored anchors
+                      (np.array of shape (batch_size, M, 2), where M is the largest number of positive and ignored anchors of an image in the batch,
+                      unused rows have an anchor index of -1).
+    """
+
+    assert(len(image_group) == len(annotations_group)), "The length of the images and annotations need to be equal."
+    assert(len(annotations_group) > 0), "No data received to compute anchor targets for."
+    for annotations in annotations_group:
+        assert('bboxes' in annotations), "Annotations should contain bboxes."
+        assert('labels' in annotations), "Annotations should contain labels."
+
+    regression_group = []
+    labels_group     = []
+    for image, annotations in zip(image_group, annotations_group):
+        positive_indices = np.zeros((anchors.shape[0],), dtype=bool)
+        ignore_indices   = np.zeros((anchors.shape[0],), dtype=bool)
+        if annotations['bboxes'].shape[0]:
+            # obtain indices of gt annotations with the greatest overlap
+            if anchor_grid is not None:
+                positive_indices, ignore_indices, argmax_overlaps_inds = compute_gt_annotations_sparse(
+                    anchors, anchor_grid, annotations['bboxes'], negative_overlap, positive_overlap
+                )
+            else:
+                positive_indices, ignore_indices, argmax_overlaps_inds = compute_gt_annotations(anchors, annotations['bboxes'], negative_overlap, positive_overlap)
+
+        # ignore annotations outside of image
+        if image.shape:
+            anchors_centers = np.vstack([(anchors[:, 0] + anchors[:, 2]) / 2, (anchors[:, 1] + anchors[:, 3]) / 2]).T
+            indices = np.logical_or(anchors_centers[:, 0] >= image.shape[1], anchors_centers[:, 1] >= image.shape[0])
+
+            ignore_indices   = ignore_indices | indices
+            positive_indices = positive_indices & ~indices
+
+        positive_indices = np.flatnonzero(positive_indices)
+        ignore_indices   = np.flatnonzero(ignore_indices)
+
+        regression = np.zeros((len(positive_indices), 4 + 1), dtype=keras.backend.floatx())
+        labels     = np.full((len(positive_indices) + len(ignore_indices), 2), -1, dtype=keras.backend.floatx())
+
+        regression[:, 0]                      = positive_indices
+        labels[:len(positive_indices), 0]     = positive_indices
+        labels[len(positive_indices):, 0]     = ignore_indices
+        if len(positive_indices):
+            argmax_overlaps_inds              = argmax_overlaps_inds[positive_indices]
+            regression[:, 1:]                 = bbox_transform(anchors[positive_indices], annotations['bboxes'][argmax_overlaps_inds, :])
+            labels[:len(positive_indices), 1] = annotations['labels'][argmax_overlaps_inds]
+
+        regression_group.append(regression)
+        labels_group.append(labels)
+
+    # pad to the largest number of rows in the batch, keep at least one row so the batch is never empty
+    batch_size       = len(image_group)
+    regression_batch = np.full((batch_size, max(1, max(len(r) for r in regression_group)), 4 + 1), -1, dtype=keras.backend.floatx())
+    labels_batch     = np.full((batch_size, max(1, max(len(l) for l in labels_group)), 2), -1, dtype=keras.backend.floatx())
+    for index, (regression, labels) in enumerate(zip(regression_group, labels_group)):
+        regression_batch[index, :len(regression)] = regression
+        labels_batch[index, :len(labels)]         = labels
+
+    return regression_batch, labels_batch
+
+
 def compute_gt_annotations(
     anchors,
     annotations,
@@ -136,7 +236,8 @@ def compute_gt_annotations(
         argmax_overlaps_inds: ordered overlaps indices
     """
 
-    overlaps = compute_overlap(anchors.astype(np.float64), annotations.astype(np.float64))
+    # compare in the precision of the anchors, the annotations are cast once instead of upcasting the anchors
+    overlaps = compute_overlap(anchors, annotations[:, :4].astype(anchors.dtype, copy=False))
     argmax_overlaps_inds = np.argmax(overlaps, axis=1)
     max_overlaps = overlaps[np.arange(overlaps.shape[0]), argmax_overlaps_inds]
 
@@ -147,6 +248,115 @@ def compute_gt_annotations(
     return positive_indices, ignore_indices, argmax_overlaps_inds
 
 
+def compute_overlap_sparse(anchors, anchor_grid, boxes):
+    """ Compute the overlap of anchors and boxes, only for pairs that overlap.
+
+    Anchors lie on a regular grid per pyramid level, so for every box only the anchors within a small window of grid
+    positions can overlap it. Only those candidates are evaluated, with the same IoU definition as compute_overlap.
+
+    Args
+        anchors     : np.array of shape (N, 4) as returned by anchors_for_shape.
+        anchor_grid : The grid of the anchors as returned by anchor_grid_for_shape.
+        boxes       : np.array of shape (K, 4) for (x1, y1, x2, y2).
+
+    Returns
+        anchor_indices : Indices of the anchors of all overlapping pairs.
+        box_indices    : Indices of the boxes of all overlapping pairs.
+        overlaps       : The IoU of all overlapping pairs (> 0).
+    """
+    boxes      = np.asarray(boxes, dtype=np.float64)
+    boxes_area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    all_anchor_indices, all_box_indices, all_overlaps = [], [], []
+    for offset, (height, width), stride, base_anchors in anchor_grid:
+        num_anchors = base_anchors.shape[0]
+
+        # an anchor centered at (x + 0.5) * stride can only overlap a box if one of the base anchors reaches it,
+        # the window is extended by one position to be safe with respect to rounding
+        x_min = np.floor((boxes[:, 0] - base_anchors[:, 2].max()) / stride - 0.5).astype(int) - 1
+        x_max = np.ceil((boxes[:, 2] - base_anchors[:, 0].min()) / stride - 0.5).astype(int) + 1
+        y_min = np.floor((boxes[:, 1] - base_anchors[:, 3].max()) / stride - 0.5).astype(int) - 1
+        y_max = np.ceil((boxes[:, 3] - base_anchors[:, 1].min()) / stride - 0.5).astype(int) + 1
+
+        x_min = np.maximum(x_min, 0)
+        y_min = np.maximum(y_min, 0)
+        x_max = np.minimum(x_max, width - 1)
+        y_max = np.minimum(y_max, height - 1)
+
+        for k in range(boxes.shape[0]):
+            if x_min[k] > x_max[k] or y_min[k] > y_max[k]:
+                continue
+
+            # anchor index = offset + (y * width + x) * num_anchors + a, see anchors_for_shape and shift
+            cells   = np.arange(y_min[k], y_max[k] + 1)[:, None] * width + np.arange(x_min[k], x_max[k] + 1)[None, :]
+            indices = offset + (cells.reshape(-1, 1) * num_anchors + np.arange(num_anchors)).ravel()
+            box     = boxes[k]
+
+            candidates = anchors[indices].astype(np.float64, copy=False)
+            iw = np.minimum(candidates[:, 2], box[2]) - np.maximum(candidates[:, 0], box[0])
+            ih = np.minimum(candidates[:, 3], box[3]) - np.maximum(candidates[:, 1], box[1])
+            keep = (iw > 0) & (ih > 0)
+            if not keep.any():
+                continue
+
+            candidates = candidates[keep]
+            iw, ih     = iw[keep], ih[keep]
+            ua = (candidates[:, 2] - candidates[:, 0]) * (candidates[:, 3] - candidates[:, 1]) + boxes_area[k] - iw * ih
+
+            all_anchor_indices.append(indices[keep])
+            all_box_indices.append(np.full(len(iw), k, dtype=np.int64))
+            all_overlaps.append(iw * ih / ua)
+
+    if not all_overlaps:
+        return np.zeros((0,), dtype=np.int64), np.zeros((0,), dtype=np.int64), np.zeros((0,), dtype=np.float64)
+
+    return np.concatenate(all_anchor_indices), np.concatenate(all_box_indices), np.concatenate(all_overlaps)
+
+
+def compute_gt_annotations_sparse(
+    anchors,
+    anchor_grid,
+    annotations,
+    negative_overlap=0.4,
+    positive_overlap=0.5
+):
+    """ Obtain indices of gt annotations with the greatest overlap, using compute_overlap_sparse.
+
+    Gives the same result as compute_gt_annotations: anchors without any overlap are assigned to the first annotation.
+
+    Args
+        anchors: np.array of annotations of shape (N, 4) for (x1, y1, x2, y2).
+        anchor_grid: The grid of the anchors as returned by anchor_grid_for_shape.
+        annotations: np.array of shape (N, 5) for (x1, y1, x2, y2, label).
+        negative_overlap: IoU overlap for negative anchors (all anchors with overlap < negative_overlap are negative).
+        positive_overlap: IoU overlap or positive anchors (all anchors with overlap > positive_overlap are positive).
+
+    Returns
+        positive_indices: indices of positive anchors
+        ignore_indices: indices of ignored anchors
+        argmax_overlaps_inds: ordered overlaps indices
+    """
+    anchor_indices, annotation_indices, overlaps = compute_overlap_sparse(anchors, anchor_grid, annotations[:, :4])
+
+    argmax_overlaps_inds = np.zeros((anchors.shape[0],), dtype=np.int64)
+    max_overlaps         = np.zeros((anchors.shape[0],), dtype=np.float64)
+
+    # per anchor the largest overlap, ties go to the lowest annotation index like np.argmax
+    order = np.lexsort((annotation_indices, -overlaps, anchor_indices))
+    first = np.ones(order.shape, dtype=bool)
+    first[1:] = anchor_indices[order[1:]] != anchor_indices[order[:-1]]
+    best = order[first]
+
+    argmax_overlaps_inds[anchor_indices[best]] = annotation_indices[best]
+    max_overlaps[anchor_indices[best]]         = overlaps[best]
+
+    # assign "dont care" labels
+    positive_indices = max_overlaps >= positive_overlap
+    ignore_indices = (max_overlaps > negative_overlap) & ~positive_indices
+
+    return positive_indices, ignore_indices, argmax_overlaps_inds
+
+
 def layer_shapes(image_shape, model):
     """Compute layer shapes given input image shape and the model.
 
@@ -206,6 +416,7 @@ def anchors_for_shape(
     pyramid_levels=None,
     anchor_params=None,
     shapes_callback=None,
+    dtype=np.float64,
 ):
     """ Generators anchors for a given shape.
 
@@ -214,6 +425,7 @@ def anchors_for_shape(
         pyramid_levels: List of ints representing which pyramids to use (defaults to [3, 4, 5, 6, 7]).
         anchor_params: Struct containing anchor parameters. If None, default values are used.
         shapes_callback: Function to call for getting the shape of the image at different pyramid levels.
+        dtype: The dtype of the anchors.
 
     Returns
         np.array of shape (N, 4) containing the (x1, y1, x2, y2) coordinates for the anchors.
@@ -229,20 +441,141 @@ def anchors_for_shape(
         shapes_callback = guess_shapes
     image_shapes = shapes_callback(image_shape, pyramid_levels)
 
+    # allocate the anchors of all pyramid levels at once
+    num_anchors = anchor_params.num_anchors()
+    counts      = [int(np.prod(image_shapes[idx][:2])) * num_anchors for idx in range(len(pyramid_levels))]
+    all_anchors = np.empty((sum(counts), 4), dtype=dtype)
+
     # compute anchors over all pyramid levels
-    all_anchors = np.zeros((0, 4))
+    offset = 0
     for idx, p in enumerate(pyramid_levels):
         anchors = generate_anchors(
             base_size=anchor_params.sizes[idx],
             ratios=anchor_params.ratios,
             scales=anchor_params.scales
         )
-        shifted_anchors = shift(image_shapes[idx], anchor_params.strides[idx], anchors)
-        all_anchors     = np.append(all_anchors, shifted_anchors, axis=0)
+        all_anchors[offset:offset + counts[idx]] = shift(image_shapes[idx], anchor_params.strides[idx], anchors)
+        offset += counts[idx]
 
     return all_anchors
 
 
+class AnchorCache:
+    """ Least recently used cache of anchors_for_shape results.
+
+    Batches grouped by aspect ratio share a small number of image shapes, so their anchors are computed once.
+    Cached anchors are read-only, since they are shared between batches. The cache can be used from several threads
+    (eg. the parallel map calls of preprocessing.tf_dataset.create_dataset).
+
+    Args
+        max_bytes : The maximum total size of the cached anchors, the least recently used anchors are dropped first.
+        dtype     : The dtype of the anchors, with float32 anchors compute_overlap computes the anchor targets in float32.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024, dtype=np.float32):
+        self.max_bytes = max_bytes
+        self.dtype     = dtype
+        self.nbytes    = 0
+        self.anchors   = OrderedDict()
+        self.lock      = threading.Lock()
+
+    def __getstate__(self):
+        # the anchors are computed again when unpickled (eg. in another process)
+        return {'max_bytes': self.max_bytes, 'dtype': self.dtype}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def _key(image_shape, pyramid_levels, anchor_params, shapes_callback):
+        if anchor_params is not None:
+            anchor_params = (
+                tuple(anchor_params.sizes),
+                tuple(anchor_params.strides),
+                tuple(np.asarray(anchor_params.ratios).tolist()),
+                tuple(np.asarray(anchor_params.scales).tolist()),
+            )
+        if pyramid_levels is not None:
+            pyramid_levels = tuple(pyramid_levels)
+        return tuple(image_shape), pyramid_levels, anchor_params, shapes_callback
+
+    def __len__(self):
+        return len(self.anchors)
+
+    def clear(self):
+        with self.lock:
+            self.anchors.clear()
+            self.nbytes = 0
+
+    def anchors_for_shape(self, image_shape, pyramid_levels=None, anchor_params=None, shapes_callback=None):
+        """ Cached version of anchors_for_shape, see anchors_for_shape for the arguments.
+        """
+        key = self._key(image_shape, pyramid_levels, anchor_params, shapes_callback)
+        with self.lock:
+            if key in self.anchors:
+                self.anchors.move_to_end(key)
+                return self.anchors[key]
+
+        # computed outside the lock, another thread may compute the same anchors meanwhile
+        anchors = anchors_for_shape(image_shape, pyramid_levels=pyramid_levels, anchor_params=anchor_params, shapes_callback=shapes_callback, dtype=self.dtype)
+        anchors.flags.writeable = False
+
+        # anchors larger than the whole cache are not cached at all
+        with self.lock:
+            if key in self.anchors or anchors.nbytes > self.max_bytes:
+                return anchors
+
+            while self.nbytes + anchors.nbytes > self.max_bytes:
+                _, evicted = self.anchors.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+            self.anchors[key] = anchors
+            self.nbytes += anchors.nbytes
+
+        return anchors
+
+
+def anchor_grid_for_shape(
+    image_shape,
+    pyramid_levels=None,
+    anchor_params=None,
+    shapes_callback=None,
+):
+    """ Describes the grid of the anchors generated by anchors_for_shape, per pyramid level.
+
+    Args
+        image_shape: The shape of the image.
+        pyramid_levels: List of ints representing which pyramids to use (defaults to [3, 4, 5, 6, 7]).
+        anchor_params: Struct containing anchor parameters. If None, default values are used.
+        shapes_callback: Function to call for getting the shape of the image at different pyramid levels.
+
+    Returns
+        A list with a tuple (offset, (height, width), stride, anchors) per pyramid level, where offset is the index of the
+        first anchor of the level and anchors are the (A, 4) anchors centered at the origin.
+    """
+    if pyramid_levels is None:
+        pyramid_levels = [3, 4, 5, 6, 7]
+
+    if anchor_params is None:
+        anchor_params = AnchorParameters.default
+
+    if shapes_callback is None:
+        shapes_callback = guess_shapes
+    image_shapes = shapes_callback(image_shape, pyramid_levels)
+
+    grid   = []
+    offset = 0
+    for idx, p in enumerate(pyramid_levels):
+        anchors = generate_anchors(
+            base_size=anchor_params.sizes[idx],
+            ratios=anchor_params.ratios,
+            scales=anchor_params.scales
+        )
+        height, width = int(image_shapes[idx][0]), int(image_shapes[idx][1])
+        grid.append((offset, (height, width), anchor_params.strides[idx], anchors))
+        offset += height * width * anchors.shape[0]
+
+    return grid
+
+
 def shift(shape, stride, anchors):
     """ Produce shifted anchors based on shape of the map and stride size.
 
@@ -0,0 +1,150 @@
+import json
+import os
+import platform
+import time
+
+import numpy as np
+from tensorflow import keras
+import tensorflow as tf
+
+from .eval import _match_detections, _select_detections
+
+STAGES = ('decode', 'resize', 'preprocess', 'network', 'postprocess', 'matching')
+
+
+def _summarize(times):
+    """ Summarize a list of durations in seconds as milliseconds.
+    """
+    times = np.asarray(times) * 1000
+    return {
+        'mean_ms' : float(np.mean(times)),
+        'p50_ms'  : float(np.percentile(times, 50)),
+        'p90_ms'  : float(np.percentile(times, 90)),
+        'p99_ms'  : float(np.percentile(times, 99)),
+        'max_ms'  : float(np.max(times)),
+    }
+
+
+def benchmark(
+    generator,
+    model,
+    num_images=None,
+    warmup=5,
+    iou_threshold=0.5,
+    score_threshold=0.05,
+    max_detections=100,
+    full_decode=False
+):
+    """ Measure the latency of every stage of the evaluation of single images.
+
+    Images are run one at a time through decode, resize, preprocess, network, box post-processing (rescaling, score
+    threshold and top-k) and matching with the annotations. The first warmup images are run but not measured, so graph
+    tracing and memory allocation do not count.
+
+    Like the evaluation, images are decoded with load_resized_image, which decodes large JPEG images directly at a reduced
+    size. The resize is then part of the decode stage and the resize stage is reported as 0.
+
+    Args
+        generator       : The generator providing the images and annotations.
+        model           : The inference model.
+        num_images      : The number of measured images (defaults to all images after the warm-up, cycling if needed).
+        warmup          : The number of images run before measuring.
+        iou_threshold   : The IoU threshold used for matching.
+        score_threshold : The score confidence threshold to use for detections.
+        max_detections  : The maximum number of detections to use per image.
+        full_decode     : If True, time load_image and resize_image separately instead, as used when drawing the detections.
+
+    Returns
+        A JSON serializable dict with the latency percentiles of every stage and of the whole pipeline, and the throughput.
+    """
+    if num_images is None:
+        num_images = max(generator.size() - warmup, 1)
+
+    labels = [label for label in range(generator.num_classes()) if generator.has_label(label)]
+    times  = {stage: [] for stage in STAGES}
+
+    start = None
+    for step in range(warmup + num_images):
+        if step == warmup:
+            start = time.perf_counter()
+
+        image_index = step % generator.size()
+        annotations = generator.load_annotations(image_index)
+        stage_times = {}
+
+        if full_decode:
+            t = time.perf_counter()
+            image = generator.load_image(image_index)
+            stage_times['decode'] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            image, scale = generator.resize_image(image)
+            stage_times['resize'] = time.perf_counter() - t
+        else:
+            t = time.perf_counter()
+            image, scale = generator.load_resized_image(image_index)
+            stage_times['decode'] = time.perf_counter() - t
+            stage_times['resize'] = 0
+
+        t = time.perf_counter()
+        if not generator.preprocess_in_graph:
+            image = generator.preprocess_image(image)
+        if keras.backend.image_data_format() == 'channels_first':
+            image = image.transpose((2, 0, 1))
+        stage_times['preprocess'] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        boxes, scores, detection_labels = model.predict_on_batch(np.expand_dims(image, axis=0))[:3]
+        stage_times['network'] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        boxes      = np.asarray(boxes) / scale
+        detections = _select_detections(boxes, np.asarray(scores), np.asarray(detection_labels),
+                                        score_threshold=score_threshold, max_detections=max_detections)[0]
+        stage_times['postprocess'] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        for label in labels:
+            _match_detections(detections[detections[:, 5] == label, :5],
+                              annotations['bboxes'][annotations['labels'] == label], iou_threshold=iou_threshold)
+        stage_times['matching'] = time.perf_counter() - t
+
+        if step >= warmup:
+            for stage in STAGES:
+                times[stage].append(stage_times[stage])
+
+    wall_time = time.perf_counter() - start
+    total     = np.sum([times[stage] for stage in STAGES], axis=0)
+
+    return {
+        'num_images'        : num_images,
+        'warmup'            : warmup,
+        'full_decode'       : full_decode,
+        'images_per_second' : num_images / wall_time,
+        'total'             : _summarize(total),
+        'stages'            : {stage: _summarize(times[stage]) for stage in STAGES},
+        'system'            : {
+            'platform'           : platform.platform(),
+            'processor'          : platform.processor(),
+            'cpu_count'          : os.cpu_count(),
+            'tensorflow_version' : tf.__version__,
+            'gpus'               : [gpu.name for gpu in tf.config.list_physical_devices('GPU')],
+        },
+    }
+
+
+def print_benchmark(results):
+    """ Print the results of benchmark as a table.
+    """
+    print('{:<12} {:>10} {:>10} {:>10} {:>10}'.format('stage', 'mean ms', 'p50 ms', 'p90 ms', 'p99 ms'))
+    for stage, summary in list(results['stages'].items()) + [('total', results['total'])]:
+        print('{:<12} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}'.format(
+            stage, summary['mean_ms'], summary['p50_ms'], summary['p90_ms'], summary['p99_ms']))
+    print('Throughput over {} images: {:.2f} images/s'.format(results['num_images'], results['images_per_second']))
+
+
+def save_benchmark(results, path):
+    """ Write the results of benchmark to a JSON file.
+    """
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
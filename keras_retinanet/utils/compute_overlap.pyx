@@ -6,15 +6,62 @@
 # --------------------------------------------------------
 
 cimport cython
+from cython.parallel cimport prange
 import numpy as np
 cimport numpy as np
 
 
-def compute_overlap(
-    np.ndarray[double, ndim=2] boxes,
-    np.ndarray[double, ndim=2] query_boxes
+ctypedef fused floating:
+    float
+    double
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def _compute_overlap(
+    const floating[:, ::1] boxes,
+    const floating[:, ::1] query_boxes,
+    floating[:, ::1] overlaps
 ):
+    """ Fill overlaps with the IoU of boxes and query_boxes, without holding the GIL.
+
+    The outer loop over boxes is split across threads (when built with OpenMP), every thread writes its own rows.
     """
+    cdef Py_ssize_t N = boxes.shape[0]
+    cdef Py_ssize_t K = query_boxes.shape[0]
+    cdef floating iw, ih, box_area, query_area
+    cdef Py_ssize_t k, n
+
+    with nogil:
+        for n in prange(N, schedule='static'):
+            box_area = (
+                (boxes[n, 2] - boxes[n, 0]) *
+                (boxes[n, 3] - boxes[n, 1])
+            )
+            for k in range(K):
+                iw = (
+                    min(boxes[n, 2], query_boxes[k, 2]) -
+                    max(boxes[n, 0], query_boxes[k, 0])
+                )
+                if iw > 0:
+                    ih = (
+                        min(boxes[n, 3], query_boxes[k, 3]) -
+                        max(boxes[n, 1], query_boxes[k, 1])
+                    )
+                    if ih > 0:
+                        query_area = (
+                            (query_boxes[k, 2] - query_boxes[k, 0]) *
+                            (query_boxes[k, 3] - query_boxes[k, 1])
+                        )
+                        overlaps[n, k] = iw * ih / (box_area + query_area - iw * ih)
+
+
+def compute_overlap(boxes, query_boxes):
+    """
+    The computation is done in float32 if both inputs are float32 and in float64 otherwise,
+    so callers don't have to upcast their boxes.
+
     Args
         a: (N, 4) ndarray of float
         b: (K, 4) ndarray of float
@@ -22,32 +69,13 @@ def compute_overlap(
     Returns
         overlaps: (N, K) ndarray of overlap between boxes and query_boxes
     """
-    cdef unsigned int N = boxes.shape[0]
-    cdef unsigned int K = query_boxes.shape[0]
-    cdef np.ndarray[double, ndim=2] overlaps = np.zeros((N, K), dtype=np.float64)
-    cdef double iw, ih, box_area
-    cdef double ua
-    cdef unsigned int k, n
-    for k in range(K):
-        box_area = (
-            (query_boxes[k, 2] - query_boxes[k, 0]) *
-            (query_boxes[k, 3] - query_boxes[k, 1])
-        )
-        for n in range(N):
-            iw = (
-                min(boxes[n, 2], query_boxes[k, 2]) -
-                max(boxes[n, 0], query_boxes[k, 0]) 
-            )
-            if iw > 0:
-                ih = (
-                    min(boxes[n, 3], query_boxes[k, 3]) -
-                    max(boxes[n, 1], query_boxes[k, 1]) 
-                )
-                if ih > 0:
-                    ua = np.float64(
-                        (boxes[n, 2] - boxes[n, 0]) *
-                        (boxes[n, 3] - boxes[n, 1]) +
-                        box_area - iw * ih
-                    )
-                    overlaps[n, k] = iw * ih / ua
+    if boxes.dtype == np.float32 and query_boxes.dtype == np.float32:
+        dtype = np.float32
+    else:
+        dtype = np.float64
+
+    boxes       = np.ascontiguousarray(boxes, dtype=dtype)
+    query_boxes = np.ascontiguousarray(query_boxes, dtype=dtype)
+    overlaps    = np.zeros((boxes.shape[0], query_boxes.shape[0]), dtype=dtype)
+    _compute_overlap(boxes, query_boxes, overlaps)
     return overlaps
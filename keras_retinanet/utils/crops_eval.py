@@ -1,5 +1,4 @@
-from .eval import _compute_ap
-from .anchors import compute_overlap
+from .eval import _compute_average_precisions, _prefetch, _save_metrics, _select_detections
 
 from tensorflow import keras
 import numpy as np
@@ -12,9 +11,13 @@ from .visualization import draw_detections, draw_annotations
 import os
 
 
-def _get_detections(generator, model, score_threshold=0.05, max_detections=100, save_path=None):
+def _get_detections(generator, model, score_threshold=0.05, max_detections=100, save_path=None, batch_size=None, workers=0):
     """ Get the detections using cropping generator, placing detections of the same image crops together.
 
+    The crops of an image are run through the model in batches of batch_size crops, consecutive crops of different shapes
+    (at the border of images smaller than the window) are run in separate batches. With workers, the crops of the next
+    image are loaded while the network runs.
+
     The result is a list of lists such that the size is:
         all_detections[num_images][num_classes] = detections[num_detections, 4 + num_classes]
 
@@ -24,6 +27,8 @@ def _get_detections(generator, model, score_threshold=0.05, max_detections=100,
         score_threshold : The score confidence threshold to use.
         max_detections  : The maximum number of detections to use per crop.
         save_path       : The path to save the full images with visualized detections to.
+        batch_size      : The maximum number of crops in a batch (defaults to all crops of an image).
+        workers         : If larger than 0, load the crops in a background thread.
     # Returns
         A list of lists containing the detections for each image in the generator.
     """
@@ -38,7 +43,7 @@ def _get_detections(generator, model, score_threshold=0.05, max_detections=100,
     all_detections = [[None for i in range(generator.num_classes()) if generator.has_label(i)] for j in image_indexes]
     all_inferences = [0.0 for i in range(images_count)]
 
-    for group in progressbar.progressbar(generator.groups, prefix='Running network: '):
+    def load(group):
         image_index = _get_image_index(group)
 
         full_image = None
@@ -49,68 +54,74 @@ def _get_detections(generator, model, score_threshold=0.05, max_detections=100,
             draw_annotations(full_image, generator.load_annotations(image_index),
                              label_to_name=generator.label_to_name)
 
+        crop_images = []
         for crop_reference in group:
             crop_image = generator.load_crop(crop_reference)
-            crop_image = generator.preprocess_image(crop_image)
+            if not generator.preprocess_in_graph:
+                crop_image = generator.preprocess_image(crop_image)
 
             if keras.backend.image_data_format() == 'channels_first':
                 crop_image = crop_image.transpose((2, 0, 1))
+            crop_images.append(crop_image)
+
+        # crop offsets (dx, dy, dx, dy) relative to the scaled image, all crops of an image share the same scale
+        transformations = [generator.get_crop_transformations(crop_reference) for crop_reference in group]
+        offsets = np.array([[dx, dy, dx, dy] for dx, dy, _ in transformations], dtype=np.float32)
+        scale   = transformations[0][2]
 
+        return image_index, full_image, crop_images, offsets, scale
+
+    # the generator caches the image being cropped, so crops are loaded by a single thread
+    loaded = _prefetch(load, generator.groups, workers=min(workers, 1))
+    for image_index, full_image, crop_images, offsets, scale in progressbar.progressbar(loaded, max_value=images_count, prefix='Running network: '):
+        image_detections = []
+        for batch in _split_batches(crop_images, batch_size):
             # run network
             start = time.time()
-            boxes, scores, labels = model.predict_on_batch(np.expand_dims(crop_image, axis=0))[:3]
-            inference_time = time.time() - start
-
-            # correct boxes for crop offset and scale
-            dx, dy, scale = generator.get_crop_transformations(crop_reference)
-            # shift by crop offset
-            boxes[:, :, 0] += dx
-            boxes[:, :, 2] += dx
-            boxes[:, :, 1] += dy
-            boxes[:, :, 3] += dy
-
-            # apply division in order to scale bboxes back to original size
-            boxes /= scale
-
-            # select indices which have a score above the threshold
-            indices = np.where(scores[0, :] > score_threshold)[0]
-
-            # select those scores
-            scores = scores[0][indices]
-            # find the order with which to sort the scores
-            scores_sort = np.argsort(-scores)[:max_detections]
-
-            # select detections
-            crop_boxes = boxes[0, indices[scores_sort], :]
-            crop_scores = scores[scores_sort]
-            crop_labels = labels[0, indices[scores_sort]]
-            crop_detections = np.concatenate(
-                    [crop_boxes, np.expand_dims(crop_scores, axis=1), np.expand_dims(crop_labels, axis=1)], axis=1)
-
-            if full_image is not None:
-                draw_detections(full_image, crop_boxes, crop_scores, crop_labels,
-                                    label_to_name=generator.label_to_name, score_threshold=score_threshold)
-
-            # copy detections to all_detections
-            for label in range(generator.num_classes()):
-                if not generator.has_label(label):
-                    continue
-
-                crop_label_detections = crop_detections[crop_detections[:, -1] == label, :-1]
-                if all_detections[image_index][label] is None:
-                    all_detections[image_index][label] = crop_label_detections
-                else:
-                    all_detections[image_index][label] = np.concatenate([
-                            all_detections[image_index][label], crop_label_detections])
-
-            all_inferences[image_index] += inference_time
-
-        if full_image is not None and save_path is not None:
+            boxes, scores, labels = model.predict_on_batch(np.stack([crop_images[c] for c in batch]))[:3]
+            all_inferences[image_index] += time.time() - start
+
+            # shift by crop offset and scale bboxes back to original size
+            boxes = (boxes + offsets[batch][:, None, :]) / scale
+
+            image_detections.extend(_select_detections(boxes, scores, labels, score_threshold=score_threshold,
+                                                        max_detections=max_detections))
+
+        image_detections = np.concatenate(image_detections, axis=0)
+
+        if full_image is not None:
+            draw_detections(full_image, image_detections[:, :4], image_detections[:, 4], image_detections[:, 5].astype(int),
+                            label_to_name=generator.label_to_name, score_threshold=score_threshold)
             cv2.imwrite(os.path.join(save_path, '{}.png'.format(image_index)), full_image)
 
+        # copy detections to all_detections
+        for label in range(generator.num_classes()):
+            if not generator.has_label(label):
+                continue
+
+            all_detections[image_index][label] = image_detections[image_detections[:, -1] == label, :-1]
+
     return all_detections, all_inferences
 
 
+def _split_batches(images, batch_size=None):
+    """ Split the indices of images into batches of consecutive images of the same shape.
+
+    # Arguments
+        images     : The list of images.
+        batch_size : The maximum number of images in a batch, None for no limit.
+    # Returns
+        A list of index arrays.
+    """
+    batches = []
+    for index, image in enumerate(images):
+        if batches and (batch_size is None or len(batches[-1]) < batch_size) and images[batches[-1][0]].shape == image.shape:
+            batches[-1].append(index)
+        else:
+            batches.append([index])
+    return [np.array(batch) for batch in batches]
+
+
 def _get_image_index(group):
     group_images = [c.image_index for c in group]
     if len(set(group_images)) != 1:
@@ -163,7 +174,10 @@ def evaluate(
     iou_threshold=0.5,
     score_threshold=0.05,
     max_detections=100,
-    save_path=None
+    save_path=None,
+    batch_size=None,
+    workers=0,
+    metrics_path=None
 ):
     """ Evaluate a given dataset using a given model and grid crops generator.
         Note: the code is slightly different to its eval.py counterpart
@@ -175,82 +189,30 @@ def evaluate(
         score_threshold : The score confidence threshold to use for detections.
         max_detections  : The maximum number of detections to use per image.
         save_path       : The path to save images with visualized detections to.
+        batch_size      : The maximum number of crops run through the model at once (defaults to all crops of an image).
+        workers         : If larger than 0, load the crops in a background thread.
+        metrics_path    : Path of a JSON file to write metrics for several IoU thresholds and object sizes to (see metrics.compute_metrics).
     # Returns
         A dict mapping class names to mAP scores and inference time.
     """
 
     # gather all detections and annotations
     all_detections, all_inferences = _get_detections(generator, model, score_threshold=score_threshold,
-                                                     max_detections=max_detections, save_path=save_path)
+                                                     max_detections=max_detections, save_path=save_path,
+                                                     batch_size=batch_size, workers=workers)
     all_annotations = _get_annotations(generator)
-    average_precisions = {}
-
-    # process detections and annotations
-    for label in range(generator.num_classes()):
-        if not generator.has_label(label):
-            continue
-
-        false_positives = np.zeros((0,))
-        true_positives = np.zeros((0,))
-        scores = np.zeros((0,))
-        num_annotations = 0.0
-
-        for group in progressbar.progressbar(generator.groups, prefix='Running network: '):
-            image_index = _get_image_index(group)
-
-            detections = all_detections[image_index][label]
-            annotations = all_annotations[image_index][label]
-            num_annotations += annotations.shape[0]
-            detected_annotations = []
-
-            for d in detections:
-                scores = np.append(scores, d[4])
-
-                if annotations.shape[0] == 0:
-                    false_positives = np.append(false_positives, 1)
-                    true_positives  = np.append(true_positives, 0)
-                    continue
-
-                overlaps = compute_overlap(np.expand_dims(d, axis=0), annotations)
-                assigned_annotation = np.argmax(overlaps, axis=1)
-                max_overlap = overlaps[0, assigned_annotation]
-
-                if max_overlap >= iou_threshold:
-                    if assigned_annotation not in detected_annotations:
-                        false_positives = np.append(false_positives, 0)
-                        true_positives  = np.append(true_positives, 1)
-                        detected_annotations.append(assigned_annotation)
-                    else:
-                        false_positives = np.append(false_positives, 0)
-                        true_positives = np.append(true_positives, 0)
-                else:
-                    false_positives = np.append(false_positives, 1)
-                    true_positives  = np.append(true_positives, 0)
-
-        # no annotations -> AP for this class is 0 (is this correct?)
-        if num_annotations == 0:
-            average_precisions[label] = 0, 0
-            continue
-
-        # sort by score
-        indices = np.argsort(-scores)
-        false_positives = false_positives[indices]
-        true_positives = true_positives[indices]
-
-        # compute false positives and true positives
-        false_positives = np.cumsum(false_positives)
-        true_positives = np.cumsum(true_positives)
-
-        # compute recall and precision
-        recall = true_positives / num_annotations
-        precision = true_positives / np.maximum(true_positives + false_positives, np.finfo(np.float64).eps)
-
-        # compute average precision
-        average_precision = _compute_ap(recall, precision)
-        average_precisions[label] = average_precision, num_annotations
-
-        # inference time
-        inference_time = np.sum(all_inferences) / generator.size()
+
+    # process detections and annotations, detections of an already matched annotation (from overlapping crops) are not counted
+    labels = [label for label in range(generator.num_classes()) if generator.has_label(label)]
+    average_precisions = _compute_average_precisions(all_detections, all_annotations, labels,
+                                                     iou_threshold=iou_threshold, ignore_duplicates=True)
+
+    # inference time
+    inference_time = np.sum(all_inferences) / generator.size()
+
+    if metrics_path is not None:
+        _save_metrics(metrics_path, generator, all_detections, all_annotations, labels, inference_time,
+                      ignore_duplicates=True)
 
     return average_precisions, inference_time
 
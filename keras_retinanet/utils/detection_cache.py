@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import pickle
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """ Compute the sha1 hash of the contents of a file.
+
+    Args
+        path       : Path to the file.
+        chunk_size : Number of bytes read at once.
+
+    Returns
+        The hex digest of the file contents.
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class DetectionCache:
+    """ Stores the raw detections of a model per image, so a dataset can be evaluated again without running the network.
+
+    The cache is a single file in directory, named after the hash of the key (for example the model file hash, the dataset
+    split and the resize settings). Detections are appended as they are computed, so an interrupted run is resumed where it stopped.
+    The stored detections are the output of the model before the score threshold and max detections are applied,
+    so those can be changed freely when evaluating from the cache.
+
+    Args
+        directory : The directory to store the cache in.
+        **key     : Values identifying the detections (must be JSON serializable).
+    """
+    def __init__(self, directory, **key):
+        self.key        = key
+        self.path       = os.path.join(directory, hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest() + '.pkl')
+        self.detections = {}
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            self._load()
+        else:
+            with open(self.path, 'wb') as f:
+                pickle.dump(self.key, f)
+
+    def _load(self):
+        with open(self.path, 'rb') as f:
+            key = pickle.load(f)
+            if key != self.key:
+                raise ValueError('Detection cache {} was created for {}, expected {}.'.format(self.path, key, self.key))
+
+            # the last record may be incomplete if a previous run was interrupted while writing it
+            end = f.tell()
+            while True:
+                try:
+                    image_index, detections = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                self.detections[image_index] = detections
+                end = f.tell()
+
+        # drop an incomplete record, new records are appended after the last complete one
+        if end != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+
+    def __len__(self):
+        return len(self.detections)
+
+    def __contains__(self, image_index):
+        return image_index in self.detections
+
+    def get(self, image_index):
+        """ Get the cached detections of an image.
+
+        Returns
+            boxes (N, 4) in image coordinates, scores (N,), labels (N,) and the inference time of the image.
+        """
+        return self.detections[image_index]
+
+    def add(self, image_index, boxes, scores, labels, inference_time):
+        """ Store the detections of an image, see get for the arguments.
+        """
+        detections = (boxes, scores, labels, inference_time)
+        with open(self.path, 'ab') as f:
+            pickle.dump((image_index, detections), f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.detections[image_index] = detections
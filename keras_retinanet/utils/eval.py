@@ -17,6 +17,9 @@ limitations under the License.
 from .anchors import compute_overlap
 from .visualization import draw_detections, draw_annotations
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 from tensorflow import keras
 import numpy as np
 import os
@@ -44,8 +47,7 @@ def _compute_ap(recall, precision):
     mpre = np.concatenate(([0.], precision, [0.]))
 
     # compute the precision envelope
-    for i in range(mpre.size - 1, 0, -1):
-        mpre[i - 1] = np.maximum(mpre[i - 1], mpre[i])
+    mpre = np.maximum.accumulate(mpre[::-1])[::-1]
 
     # to calculate area under PR curve, look for points
     # where X axis (recall) changes value
@@ -56,56 +58,221 @@ def _compute_ap(recall, precision):
     return ap
 
 
-def _get_detections(generator, model, score_threshold=0.05, max_detections=100, save_path=None):
+def _match_detections(detections, annotations, iou_threshold=0.5, ignore_duplicates=False, return_assigned=False):
+    """ Greedily match the detections of an image to its annotations, in order of decreasing score.
+
+    Every detection is assigned to the annotation it overlaps most. It is a true positive if the overlap is at least
+    iou_threshold and no detection with a higher score was matched to the same annotation before. With several
+    thresholds, the IoU matrix is computed once and the detections are matched for every threshold.
+
+    # Arguments
+        detections        : The detections (N, 5) of one class in an image, (x1, y1, x2, y2, score).
+        annotations       : The annotations (M, 4) of the same class in the image.
+        iou_threshold     : The threshold used to consider when a detection is positive or negative, or an array (T,) of thresholds.
+        ignore_duplicates : If True, detections matching an annotation which was matched before are neither true nor false positives.
+        return_assigned   : If True, also return the index of the annotation every detection is matched to, -1 if it is not matched.
+    # Returns
+        true_positives and false_positives, boolean arrays (N,) in the order of detections, or (T, N) for an array of thresholds.
+    """
+    iou_thresholds  = np.atleast_1d(np.asarray(iou_threshold, dtype=np.float64))
+    shape           = (iou_thresholds.shape[0], detections.shape[0])
+    true_positives  = np.zeros(shape, dtype=bool)
+    false_positives = np.ones(shape, dtype=bool)
+    assigned        = np.full(shape, -1, dtype=np.int64)
+
+    if detections.shape[0] > 0 and annotations.shape[0] > 0:
+        # a single IoU matrix for all detections, ordered by score
+        order               = np.argsort(-detections[:, 4], kind='stable')
+        overlaps            = compute_overlap(detections[order, :4], annotations[:, :4])
+        assigned_annotation = np.argmax(overlaps, axis=1)
+        max_overlap         = overlaps[np.arange(overlaps.shape[0]), assigned_annotation]
+
+        for t, threshold in enumerate(iou_thresholds):
+            # only the first (best scoring) match of every annotation is a true positive
+            matched  = np.flatnonzero(max_overlap >= threshold)
+            _, first = np.unique(assigned_annotation[matched], return_index=True)
+
+            true_positives[t, order[matched[first]]] = True
+            if ignore_duplicates:
+                false_positives[t, order[matched]] = False
+            else:
+                false_positives[t, order[matched[first]]] = False
+            assigned[t, order[matched]] = assigned_annotation[matched]
+
+    if np.ndim(iou_threshold) == 0:
+        true_positives, false_positives, assigned = true_positives[0], false_positives[0], assigned[0]
+
+    if return_assigned:
+        return true_positives, false_positives, assigned
+    return true_positives, false_positives
+
+
+def _compute_average_precisions(all_detections, all_annotations, labels, iou_threshold=0.5, ignore_duplicates=False):
+    """ Compute the average precision per class from the detections and annotations of all images.
+
+    # Arguments
+        all_detections    : The detections per image and class, as returned by _get_detections.
+        all_annotations   : The annotations per image and class, as returned by _get_annotations.
+        labels            : The labels to compute the average precision for.
+        iou_threshold     : The threshold used to consider when a detection is positive or negative.
+        ignore_duplicates : If True, detections matching an annotation which was matched before are neither true nor false positives.
+    # Returns
+        A dict mapping labels to (average precision, number of annotations).
+    """
+    average_precisions = {}
+    for label in labels:
+        num_detections  = sum(detections[label].shape[0] for detections in all_detections)
+        false_positives = np.empty((num_detections,))
+        true_positives  = np.empty((num_detections,))
+        scores          = np.empty((num_detections,))
+        num_annotations = 0.0
+
+        offset = 0
+        for detections, annotations in zip(all_detections, all_annotations):
+            detections       = detections[label]
+            annotations      = annotations[label]
+            num_annotations += annotations.shape[0]
+
+            end = offset + detections.shape[0]
+            scores[offset:end] = detections[:, 4]
+            true_positives[offset:end], false_positives[offset:end] = _match_detections(
+                detections, annotations, iou_threshold=iou_threshold, ignore_duplicates=ignore_duplicates
+            )
+            offset = end
+
+        # no annotations -> AP for this class is 0 (is this correct?)
+        if num_annotations == 0:
+            average_precisions[label] = 0, 0
+            continue
+
+        # sort by score
+        indices         = np.argsort(-scores)
+        false_positives = false_positives[indices]
+        true_positives  = true_positives[indices]
+
+        # compute false positives and true positives
+        false_positives = np.cumsum(false_positives)
+        true_positives  = np.cumsum(true_positives)
+
+        # compute recall and precision
+        recall    = true_positives / num_annotations
+        precision = true_positives / np.maximum(true_positives + false_positives, np.finfo(np.float64).eps)
+
+        # compute average precision
+        average_precision  = _compute_ap(recall, precision)
+        average_precisions[label] = average_precision, num_annotations
+
+    return average_precisions
+
+
+def _prefetch(function, items, workers=0, max_pending=None):
+    """ Apply function to items in a pool of threads, yielding the results in order while later items are being computed.
+
+    # Arguments
+        function    : The function to apply to every item.
+        items       : The items to apply the function to.
+        workers     : The number of threads, if 0 the items are processed in the calling thread when they are requested.
+        max_pending : The maximum number of results computed ahead (defaults to 2 * workers).
+    # Returns
+        A generator of the results.
+    """
+    if workers <= 0:
+        for item in items:
+            yield function(item)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * workers
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _select_detections(boxes, scores, labels, score_threshold=0.05, max_detections=100):
+    """ Select the best scoring detections of a batch of images.
+
+    # Arguments
+        boxes           : The boxes (B, N, 4) of every image.
+        scores          : The scores (B, N) of every image.
+        labels          : The labels (B, N) of every image.
+        score_threshold : The score confidence threshold to use.
+        max_detections  : The maximum number of detections to use per image.
+    # Returns
+        A list with the detections (D, 6) of every image, (x1, y1, x2, y2, score, label) sorted by decreasing score.
+    """
+    # sort every image by score, detections below the threshold are sorted last and dropped below
+    masked_scores = np.where(scores > score_threshold, scores, -np.inf)
+    order         = np.argsort(-masked_scores, axis=1, kind='stable')[:, :max_detections]
+    counts        = np.minimum(np.count_nonzero(scores > score_threshold, axis=1), max_detections)
+
+    boxes  = np.take_along_axis(boxes, order[:, :, None], axis=1)
+    scores = np.take_along_axis(scores, order, axis=1)
+    labels = np.take_along_axis(labels, order, axis=1)
+    detections = np.concatenate([boxes, scores[:, :, None], labels[:, :, None]], axis=2)
+
+    return [image_detections[:count] for image_detections, count in zip(detections, counts)]
+
+
+def _get_detections(
+    generator,
+    model,
+    score_threshold=0.05,
+    max_detections=100,
+    save_path=None,
+    detection_cache=None,
+    batch_size=1,
+    workers=0
+):
     """ Get the detections from the model using the generator.
 
+    Images are loaded by a pool of workers while the network runs. Consecutive images of the same (resized) shape are
+    run as a single batch, images are ordered by aspect ratio so most batches are full.
+
     The result is a list of lists such that the size is:
         all_detections[num_images][num_classes] = detections[num_detections, 4 + num_classes]
 
     # Arguments
         generator       : The generator used to run images through the model.
-        model           : The model to run on the images.
+        model           : The model to run on the images (may be None if all images are in detection_cache).
         score_threshold : The score confidence threshold to use.
         max_detections  : The maximum number of detections to use per image.
         save_path       : The path to save the images with visualized detections to.
+        detection_cache : A detection_cache.DetectionCache, images found in the cache are not run through the model, others are added to it.
+        batch_size      : The maximum number of images in a batch.
+        workers         : The number of threads loading and preprocessing images.
     # Returns
         A list of lists containing the detections for each image in the generator.
     """
     all_detections = [[None for i in range(generator.num_classes()) if generator.has_label(i)] for j in range(generator.size())]
     all_inferences = [None for i in range(generator.size())]
 
-    for i in progressbar.progressbar(range(generator.size()), prefix='Running network: '):
-        raw_image    = generator.load_image(i)
-        image, scale = generator.resize_image(raw_image.copy())
-        image = generator.preprocess_image(image)
+    def load(i):
+        raw_image = generator.load_image(i) if save_path is not None else None
+        if detection_cache is not None and i in detection_cache:
+            return i, raw_image, None, None
+
+        if raw_image is not None:
+            image, scale = generator.resize_image(raw_image.copy())
+        else:
+            # the full resolution image is only needed for drawing
+            image, scale = generator.load_resized_image(i)
+        if not generator.preprocess_in_graph:
+            image = generator.preprocess_image(image)
 
         if keras.backend.image_data_format() == 'channels_first':
             image = image.transpose((2, 0, 1))
 
-        # run network
-        start = time.time()
-        boxes, scores, labels = model.predict_on_batch(np.expand_dims(image, axis=0))[:3]
-        inference_time = time.time() - start
-
-        # correct boxes for image scale
-        boxes /= scale
-
-        # select indices which have a score above the threshold
-        indices = np.where(scores[0, :] > score_threshold)[0]
-
-        # select those scores
-        scores = scores[0][indices]
-
-        # find the order with which to sort the scores
-        scores_sort = np.argsort(-scores)[:max_detections]
-
-        # select detections
-        image_boxes      = boxes[0, indices[scores_sort], :]
-        image_scores     = scores[scores_sort]
-        image_labels     = labels[0, indices[scores_sort]]
-        image_detections = np.concatenate([image_boxes, np.expand_dims(image_scores, axis=1), np.expand_dims(image_labels, axis=1)], axis=1)
+        return i, raw_image, image, scale
 
+    def store(i, raw_image, image_detections, inference_time):
         if save_path is not None:
+            image_boxes, image_scores, image_labels = image_detections[:, :4], image_detections[:, 4], image_detections[:, 5].astype(int)
             draw_annotations(raw_image, generator.load_annotations(i), label_to_name=generator.label_to_name)
             draw_detections(raw_image, image_boxes, image_scores, image_labels, label_to_name=generator.label_to_name, score_threshold=score_threshold)
 
@@ -120,6 +287,46 @@ def _get_detections(generator, model, score_threshold=0.05, max_detections=100,
 
         all_inferences[i] = inference_time
 
+    def run(batch):
+        # run network
+        start = time.time()
+        boxes, scores, labels = model.predict_on_batch(np.stack([image for _, _, image, _ in batch]))[:3]
+        inference_time = (time.time() - start) / len(batch)
+
+        # correct boxes for image scale
+        boxes = boxes / np.array([scale for _, _, _, scale in batch])[:, None, None]
+
+        if detection_cache is not None:
+            for (i, _, _, _), image_boxes, image_scores, image_labels in zip(batch, boxes, scores, labels):
+                # padded detections have a label of -1
+                valid = image_labels >= 0
+                detection_cache.add(i, image_boxes[valid], image_scores[valid], image_labels[valid], inference_time)
+
+        all_image_detections = _select_detections(boxes, scores, labels, score_threshold=score_threshold, max_detections=max_detections)
+        for (i, raw_image, _, _), image_detections in zip(batch, all_image_detections):
+            store(i, raw_image, image_detections, inference_time)
+
+    # images of similar aspect ratios have the same shape after resizing
+    order = range(generator.size())
+    if batch_size > 1:
+        order = sorted(order, key=generator.image_aspect_ratio)
+
+    batch = []
+    for i, raw_image, image, scale in progressbar.progressbar(_prefetch(load, order, workers=workers), max_value=generator.size(), prefix='Running network: '):
+        if image is None:
+            boxes, scores, labels, inference_time = detection_cache.get(i)
+            image_detections = _select_detections(boxes[None], scores[None], labels[None], score_threshold=score_threshold, max_detections=max_detections)[0]
+            store(i, raw_image, image_detections, inference_time)
+            continue
+
+        if batch and (len(batch) >= batch_size or batch[0][2].shape != image.shape):
+            run(batch)
+            batch = []
+        batch.append((i, raw_image, image, scale))
+
+    if batch:
+        run(batch)
+
     return all_detections, all_inferences
 
 
@@ -150,95 +357,67 @@ def _get_annotations(generator):
     return all_annotations
 
 
+def _save_metrics(path, generator, all_detections, all_annotations, labels, inference_time, ignore_duplicates=False):
+    """ Compute the metrics of all IoU thresholds and object sizes from the detections and write them to a JSON file.
+    """
+    # metrics builds on this module, import it when needed only
+    from .metrics import compute_metrics, save_metrics
+
+    metrics = compute_metrics(all_detections, all_annotations, labels, label_to_name=generator.label_to_name,
+                              ignore_duplicates=ignore_duplicates)
+    metrics['inference_time'] = float(inference_time)
+    save_metrics(metrics, path)
+
+
 def evaluate(
     generator,
     model,
     iou_threshold=0.5,
     score_threshold=0.05,
     max_detections=100,
-    save_path=None
+    save_path=None,
+    detection_cache=None,
+    batch_size=1,
+    workers=0,
+    metrics_path=None
 ):
     """ Evaluate a given dataset using a given model.
 
     # Arguments
         generator       : The generator that represents the dataset to evaluate.
-        model           : The model to evaluate.
+        model           : The model to evaluate (may be None if all images are in detection_cache).
         iou_threshold   : The threshold used to consider when a detection is positive or negative.
         score_threshold : The score confidence threshold to use for detections.
         max_detections  : The maximum number of detections to use per image.
         save_path       : The path to save images with visualized detections to.
+        detection_cache : A detection_cache.DetectionCache to read detections from and store new detections in.
+        batch_size      : The maximum number of images of the same shape run through the model at once.
+        workers         : The number of threads loading and preprocessing images.
+        metrics_path    : Path of a JSON file to write metrics for several IoU thresholds and object sizes to (see metrics.compute_metrics).
     # Returns
         A dict mapping class names to mAP scores.
     """
     # gather all detections and annotations
-    all_detections, all_inferences = _get_detections(generator, model, score_threshold=score_threshold, max_detections=max_detections, save_path=save_path)
+    all_detections, all_inferences = _get_detections(
+        generator,
+        model,
+        score_threshold=score_threshold,
+        max_detections=max_detections,
+        save_path=save_path,
+        detection_cache=detection_cache,
+        batch_size=batch_size,
+        workers=workers
+    )
     all_annotations    = _get_annotations(generator)
-    average_precisions = {}
-
-    # all_detections = pickle.load(open('all_detections.pkl', 'rb'))
-    # all_annotations = pickle.load(open('all_annotations.pkl', 'rb'))
-    # pickle.dump(all_detections, open('all_detections.pkl', 'wb'))
-    # pickle.dump(all_annotations, open('all_annotations.pkl', 'wb'))
 
     # process detections and annotations
-    for label in range(generator.num_classes()):
-        if not generator.has_label(label):
-            continue
-
-        false_positives = np.zeros((0,))
-        true_positives  = np.zeros((0,))
-        scores          = np.zeros((0,))
-        num_annotations = 0.0
-
-        for i in range(generator.size()):
-            detections           = all_detections[i][label]
-            annotations          = all_annotations[i][label]
-            num_annotations     += annotations.shape[0]
-            detected_annotations = []
-
-            for d in detections:
-                scores = np.append(scores, d[4])
-
-                if annotations.shape[0] == 0:
-                    false_positives = np.append(false_positives, 1)
-                    true_positives  = np.append(true_positives, 0)
-                    continue
-
-                overlaps            = compute_overlap(np.expand_dims(d, axis=0), annotations)
-                assigned_annotation = np.argmax(overlaps, axis=1)
-                max_overlap         = overlaps[0, assigned_annotation]
-
-                if max_overlap >= iou_threshold and assigned_annotation not in detected_annotations:
-                    false_positives = np.append(false_positives, 0)
-                    true_positives  = np.append(true_positives, 1)
-                    detected_annotations.append(assigned_annotation)
-                else:
-                    false_positives = np.append(false_positives, 1)
-                    true_positives  = np.append(true_positives, 0)
-
-        # no annotations -> AP for this class is 0 (is this correct?)
-        if num_annotations == 0:
-            average_precisions[label] = 0, 0
-            continue
-
-        # sort by score
-        indices         = np.argsort(-scores)
-        false_positives = false_positives[indices]
-        true_positives  = true_positives[indices]
-
-        # compute false positives and true positives
-        false_positives = np.cumsum(false_positives)
-        true_positives  = np.cumsum(true_positives)
-
-        # compute recall and precision
-        recall    = true_positives / num_annotations
-        precision = true_positives / np.maximum(true_positives + false_positives, np.finfo(np.float64).eps)
-
-        # compute average precision
-        average_precision  = _compute_ap(recall, precision)
-        average_precisions[label] = average_precision, num_annotations
+    labels             = [label for label in range(generator.num_classes()) if generator.has_label(label)]
+    average_precisions = _compute_average_precisions(all_detections, all_annotations, labels, iou_threshold=iou_threshold)
 
     # inference time
     inference_time = np.sum(all_inferences) / generator.size()
 
+    if metrics_path is not None:
+        _save_metrics(metrics_path, generator, all_detections, all_annotations, labels, inference_time)
+
     return average_precisions, inference_time
@@ -17,22 +17,123 @@ limitations under the License.
 from __future__ import division
 import numpy as np
 import cv2
-from PIL import Image
+from PIL import Image, ImageOps
 
 from .transform import change_transform_origin
 
 
-def read_image_bgr(path):
+def _exif_rotated(image):
+    """ True if the EXIF orientation of an image rotates it by 90 degrees (orientations 5 to 8).
+    """
+    return image.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+
+
+def read_image_size(path, exif_transpose=False):
+    """ Read the size of an image from its header, without decoding the image.
+
+    Args
+        path: Path to the image.
+        exif_transpose: If True, return the size after applying the EXIF orientation.
+
+    Returns
+        A tuple (width, height).
+    """
+    with Image.open(path) as image:
+        if exif_transpose and _exif_rotated(image):
+            return image.height, image.width
+        return image.size
+
+
+def read_image_bgr(path, reduce_factor=1, exif_transpose=False):
     """ Read an image in BGR format.
 
     Args
         path: Path to the image.
+        reduce_factor: Decode JPEG images at 1/reduce_factor (2, 4 or 8) of their size. Other formats are read at full size.
+        exif_transpose: If True, apply the EXIF orientation like cv2.imread (annotations refer to the stored pixels, so training does not).
     """
     # We deliberately don't use cv2.imread here, since it gives no feedback on errors while reading the image.
-    image = np.ascontiguousarray(Image.open(path).convert('RGB'))
+    image = Image.open(path)
+    if reduce_factor > 1:
+        # the JPEG decoder scales while decoding, the result is at least the requested size
+        image.draft('RGB', (image.width // reduce_factor, image.height // reduce_factor))
+    if exif_transpose:
+        image = ImageOps.exif_transpose(image)
+    image = np.ascontiguousarray(image.convert('RGB'))
     return image[:, :, ::-1]
 
 
+def compute_reduce_factor(scale):
+    """ Compute the largest JPEG decoding reduction (1, 2, 4 or 8) which keeps an image at least as large as scale requires.
+    """
+    for reduce_factor in (8, 4, 2):
+        if reduce_factor * scale <= 1:
+            return reduce_factor
+    return 1
+
+
+def decode_image_bgr(buffer, reduce_factor=1):
+    """ Decode an encoded image (eg. the contents of a JPEG file) in BGR format.
+
+    Args
+        buffer: A bytes like object (bytes, memoryview or uint8 array), it is not copied.
+        reduce_factor: Decode the image at 1/reduce_factor (2, 4 or 8) of its size.
+    """
+    flags = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}[reduce_factor]
+
+    # like read_image_bgr, the EXIF orientation is not applied
+    image = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        raise ValueError('could not decode image')
+    return image
+
+
+def decode_image_bgr_resized(buffer, width, height, min_side=800, max_side=1333):
+    """ Decode an encoded image of the given size in BGR format, resized such that the size is constrained to min_side and max_side.
+
+    See read_image_bgr_resized, the image is decoded at a reduced size when the resize scale allows it.
+
+    Returns
+        The resized image and the scale relative to the original image.
+    """
+    scale = compute_resize_scale((height, width, 3), min_side=min_side, max_side=max_side)
+    image = decode_image_bgr(buffer, reduce_factor=compute_reduce_factor(scale))
+
+    size = (int(round(width * scale)), int(round(height * scale)))
+    if (image.shape[1], image.shape[0]) != size:
+        image = cv2.resize(image, size)
+
+    return image, scale
+
+
+def read_image_bgr_resized(path, min_side=800, max_side=1333, exif_transpose=False):
+    """ Read an image in BGR format, resized such that the size is constrained to min_side and max_side.
+
+    The result has the same size as resize_image(read_image_bgr(path)), but the resize scale is computed from the image header
+    so that large JPEG images are decoded at a reduced size instead of decoding all pixels and throwing most of them away.
+
+    Args
+        path: Path to the image.
+        min_side: The image's min side will be equal to min_side after resizing.
+        max_side: If after resizing the image's max side is above max_side, resize until the max side is equal to max_side.
+        exif_transpose: If True, apply the EXIF orientation (see read_image_bgr).
+
+    Returns
+        The resized image and the scale relative to the original image.
+    """
+    width, height = read_image_size(path, exif_transpose=exif_transpose)
+    scale = compute_resize_scale((height, width, 3), min_side=min_side, max_side=max_side)
+
+    image = read_image_bgr(path, reduce_factor=compute_reduce_factor(scale), exif_transpose=exif_transpose)
+
+    # same rounding as cv2.resize with fx and fy
+    size = (int(round(width * scale)), int(round(height * scale)))
+    if (image.shape[1], image.shape[0]) != size:
+        image = cv2.resize(image, size)
+
+    return image, scale
+
+
 def preprocess_image(x, mode='caffe'):
     """ Preprocess an image by subtracting the ImageNet mean.
 
@@ -126,7 +227,7 @@ class TransformParameters:
             return cv2.INTER_LANCZOS4
 
 
-def apply_transform(matrix, image, params):
+def apply_transform(matrix, image, params, output_shape=None):
     """
     Apply a transformation to an image.
 
@@ -136,14 +237,18 @@ def apply_transform(matrix, image, params):
     Mathematically speaking, that means that the matrix is a transformation from the transformed image space to the original image space.
 
     Args
-      matrix: A homogeneous 3 by 3 matrix holding representing the transformation to apply.
-      image:  The image to transform.
-      params: The transform parameters (see TransformParameters)
+      matrix:       A homogeneous 3 by 3 matrix holding representing the transformation to apply.
+      image:        The image to transform.
+      params:       The transform parameters (see TransformParameters)
+      output_shape: The (height, width) of the generated image, defaults to the shape of the original image.
     """
+    if output_shape is None:
+        output_shape = image.shape[:2]
+
     output = cv2.warpAffine(
         image,
         matrix[:2, :],
-        dsize       = (image.shape[1], image.shape[0]),
+        dsize       = (output_shape[1], output_shape[0]),
         flags       = params.cvInterpolation(),
         borderMode  = params.cvBorderMode(),
         borderValue = params.cval,
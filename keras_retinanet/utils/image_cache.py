@@ -0,0 +1,124 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+
+class ImageCache:
+    """ Stores decoded and resized images on disk, so they are not decoded again in the next epochs.
+
+    Every image is a single .npy file in directory, named after the hash of its key (for example the image path,
+    its modification time and the resize settings), holding the image and its resize scale. Images are returned as
+    read-only memory maps of these files. When the files take more than max_bytes, the least recently used images are removed.
+
+    The cache can be used from several threads and processes. With several processes writing to the same directory,
+    the size of the cache is only checked every scan_interval writes, so it can temporarily exceed max_bytes.
+
+    Args
+        directory     : The directory to store the cache in.
+        max_bytes     : The size budget of the cache.
+        scan_interval : The number of writes after which the size of the cache is checked again.
+    """
+    def __init__(self, directory, max_bytes, scan_interval=100):
+        self.directory     = directory
+        self.max_bytes     = max_bytes
+        self.scan_interval = scan_interval
+
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes   = sum(size for _, size, _ in self._entries())
+        self.writes        = 0
+        self.lock          = threading.Lock()
+
+    def __getstate__(self):
+        # the size of the cache is read again when unpickled (eg. in another process)
+        return {'directory': self.directory, 'max_bytes': self.max_bytes, 'scan_interval': self.scan_interval}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest() + '.npy')
+
+    def _entries(self):
+        """ The (modification time, size, path) of the cached images.
+        """
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.npy')):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get(self, key):
+        """ Get a cached image.
+
+        Returns
+            The image and its scale, or None if the image is not cached.
+        """
+        path = self._path(key)
+        try:
+            entry = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # mark the image as recently used, the access time is not updated on every file system
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return entry['image'], float(entry['scale'])
+
+    def put(self, key, image, scale):
+        """ Add an image to the cache, evicting the least recently used images if the cache is full.
+        """
+        entry          = np.zeros((), dtype=[('scale', np.float64), ('image', image.dtype, image.shape)])
+        entry['scale'] = scale
+        entry['image'] = image
+        if entry.nbytes > self.max_bytes:
+            return
+
+        # write to a unique temporary file first, so other threads and processes never read a partial image
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, entry)
+            nbytes = os.path.getsize(tmp)
+            os.replace(tmp, self._path(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        with self.lock:
+            self.total_bytes += nbytes
+            self.writes      += 1
+            if self.total_bytes > self.max_bytes or self.writes % self.scan_interval == 0:
+                self.evict()
+
+    def evict(self):
+        """ Remove the least recently used images if the cache does not fit in max_bytes.
+
+        Called by put with the lock held.
+        """
+        entries          = sorted(self._entries())
+        self.total_bytes = sum(size for _, size, _ in entries)
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        # leave some room, so the directory is not scanned again on the next write
+        for _, size, path in entries:
+            if self.total_bytes <= 0.9 * self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
@@ -0,0 +1,48 @@
+import glob
+import json
+import os
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def list_images(pattern):
+    """ List image files of a directory or matching a glob pattern, in sorted order.
+
+    Args
+        pattern : A directory or a glob pattern.
+
+    Returns
+        The paths of the files with an image extension (see IMAGE_EXTENSIONS).
+    """
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern)
+    return sorted(path for path in paths if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS)
+
+
+def detections_to_json(path, boxes, scores, labels, labels_to_names, score_threshold):
+    """ Serialize detections of a single image to a JSON line.
+
+    Args
+        path            : The path of the image.
+        boxes           : The boxes (x1, y1, x2, y2) of the detections, in image coordinates.
+        scores          : The scores of the detections, sorted in descending order.
+        labels          : The labels of the detections.
+        labels_to_names : A dict mapping labels to names, labels without a name are written as numbers.
+        score_threshold : Detections with a lower score are left out.
+
+    Returns
+        A JSON object with the image path and a list of detections (label, score and box).
+    """
+    detections = []
+    for box, score, label in zip(boxes, scores, labels):
+        # scores are sorted so we can break
+        if score < score_threshold:
+            break
+        detections.append({
+            'label': labels_to_names.get(int(label), str(label)),
+            'score': float(score),
+            'box'  : [int(b) for b in box],
+        })
+    return json.dumps({'image': path, 'detections': detections})
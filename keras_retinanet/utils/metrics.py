@@ -0,0 +1,169 @@
+import json
+
+import numpy as np
+
+from .eval import _compute_ap, _match_detections
+
+# COCO style IoU thresholds and object size buckets (areas in pixels of the original image)
+IOU_THRESHOLDS = tuple(np.round(np.linspace(0.5, 0.95, 10), 2))
+AREA_RANGES    = {
+    'small'  : (0, 32 ** 2),
+    'medium' : (32 ** 2, 96 ** 2),
+    'large'  : (96 ** 2, np.inf),
+}
+
+
+def _areas(boxes):
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def _precision_recall(true_positives, false_positives, num_annotations):
+    """ Compute the precision and recall curves (T, N) from true and false positives sorted by decreasing score.
+    """
+    true_positives  = np.cumsum(true_positives, axis=1)
+    false_positives = np.cumsum(false_positives, axis=1)
+
+    recall    = true_positives / max(num_annotations, np.finfo(np.float64).eps)
+    precision = true_positives / np.maximum(true_positives + false_positives, np.finfo(np.float64).eps)
+    return precision, recall
+
+
+def _recall_at_precision(precision, recall, scores, min_precision):
+    """ The highest recall reached with a precision of at least min_precision, and the score threshold reaching it.
+    """
+    reached = np.flatnonzero(precision >= min_precision)
+    if reached.size == 0:
+        return {'recall': 0.0, 'score': None}
+    best = reached[np.argmax(recall[reached])]
+    return {'recall': float(recall[best]), 'score': float(scores[best])}
+
+
+def _sample_pr_curve(precision, recall, scores, num_points):
+    """ Sample the interpolated precision and the score threshold at num_points recall levels between 0 and 1.
+    """
+    # the precision envelope, precision at a recall level is the best precision at any higher recall
+    envelope      = np.maximum.accumulate(precision[::-1])[::-1] if precision.size else precision
+    recall_levels = np.linspace(0, 1, num_points)
+    indices       = np.searchsorted(recall, recall_levels, side='left')
+    reachable     = indices < recall.size
+
+    return {
+        'recall'    : recall_levels.tolist(),
+        'precision' : [float(envelope[i]) if r else 0.0 for i, r in zip(indices, reachable)],
+        'score'     : [float(scores[i]) if r else None for i, r in zip(indices, reachable)],
+    }
+
+
+def compute_metrics(
+    all_detections,
+    all_annotations,
+    labels,
+    label_to_name=str,
+    iou_thresholds=IOU_THRESHOLDS,
+    area_ranges=AREA_RANGES,
+    min_precisions=(0.5, 0.8, 0.9),
+    pr_curve_points=101,
+    ignore_duplicates=False
+):
+    """ Compute the average precisions for several IoU thresholds and object sizes, recall at fixed precisions and
+    precision / recall curves from a single matching pass.
+
+    The IoU matrix between detections and annotations is computed once per image and class, all metrics are derived from it.
+    For a size bucket, annotations of another size are ignored, as are detections matched to them and
+    unmatched detections of another size.
+
+    Args
+        all_detections    : The detections per image and class, as returned by eval._get_detections.
+        all_annotations   : The annotations per image and class, as returned by eval._get_annotations.
+        labels            : The labels to compute the metrics for.
+        label_to_name     : Function mapping a label to the class name used in the result.
+        iou_thresholds    : The IoU thresholds to compute the average precision for.
+        area_ranges       : Dict mapping size bucket names to (min area, max area) of the objects.
+        min_precisions    : The precisions to report the highest recall and its score threshold for.
+        pr_curve_points   : The number of recall levels the precision / recall curves are sampled at.
+        ignore_duplicates : If True, detections matching an annotation which was matched before are neither true nor false positives.
+
+    Returns
+        A JSON serializable dict with the metrics per class and their means over the classes with annotations.
+    """
+    iou_thresholds = np.asarray(iou_thresholds, dtype=np.float64)
+    iou_keys       = ['{:.2f}'.format(t) for t in iou_thresholds]
+    buckets        = dict(all=(0, np.inf), **area_ranges)
+
+    classes = {}
+    for label in labels:
+        scores, true_positives, false_positives, detection_areas, matched_areas, annotation_areas = [], [], [], [], [], []
+        for detections, annotations in zip(all_detections, all_annotations):
+            detections  = detections[label]
+            annotations = annotations[label]
+
+            image_true_positives, image_false_positives, assigned = _match_detections(
+                detections, annotations, iou_thresholds, ignore_duplicates=ignore_duplicates, return_assigned=True
+            )
+            # the area of the annotation every detection is matched to, unmatched detections (-1) get NaN
+            image_matched_areas = np.append(_areas(annotations), np.nan)[assigned]
+            scores.append(detections[:, 4])
+            true_positives.append(image_true_positives)
+            false_positives.append(image_false_positives)
+            detection_areas.append(_areas(detections))
+            matched_areas.append(image_matched_areas)
+            annotation_areas.append(_areas(annotations))
+
+        # sort all detections of the class by score once
+        scores           = np.concatenate(scores)
+        indices          = np.argsort(-scores, kind='stable')
+        scores           = scores[indices]
+        true_positives   = np.concatenate(true_positives, axis=1)[:, indices]
+        false_positives  = np.concatenate(false_positives, axis=1)[:, indices]
+        matched_areas    = np.concatenate(matched_areas, axis=1)[:, indices]
+        detection_areas  = np.concatenate(detection_areas)[indices]
+        annotation_areas = np.concatenate(annotation_areas)
+
+        # matched detections belong to the size bucket of their annotation, unmatched ones to their own
+        areas = np.where(np.isnan(matched_areas), detection_areas, matched_areas)
+
+        result = {'num_annotations': {}, 'ap': {}, 'ap_50_95': {}}
+        for bucket, (min_area, max_area) in buckets.items():
+            num_annotations = int(np.count_nonzero((annotation_areas >= min_area) & (annotation_areas < max_area)))
+            valid           = (areas >= min_area) & (areas < max_area)
+            precision, recall = _precision_recall(true_positives & valid, false_positives & valid, num_annotations)
+
+            average_precisions = [float(_compute_ap(r, p)) if num_annotations else 0.0 for r, p in zip(recall, precision)]
+            result['num_annotations'][bucket] = num_annotations
+            result['ap'][bucket]              = dict(zip(iou_keys, average_precisions))
+            result['ap_50_95'][bucket]        = float(np.mean(average_precisions))
+
+            if bucket == 'all':
+                result['recall_at_precision'] = {
+                    key: {'{:.2f}'.format(p): _recall_at_precision(precision[t], recall[t], scores, p) for p in min_precisions}
+                    for t, key in enumerate(iou_keys)
+                }
+                result['pr_curve'] = {
+                    key: _sample_pr_curve(precision[t], recall[t], scores, pr_curve_points)
+                    for t, key in enumerate(iou_keys)
+                }
+
+        classes[label_to_name(label)] = result
+
+    # mean over the classes with annotations in the bucket
+    summary = {'mAP': {}, 'mAP_50_95': {}}
+    for bucket in buckets:
+        annotated = [c for c in classes.values() if c['num_annotations'][bucket] > 0]
+        summary['mAP'][bucket] = {
+            key: float(np.mean([c['ap'][bucket][key] for c in annotated])) if annotated else 0.0 for key in iou_keys
+        }
+        summary['mAP_50_95'][bucket] = float(np.mean([c['ap_50_95'][bucket] for c in annotated])) if annotated else 0.0
+
+    return {
+        'iou_thresholds' : iou_thresholds.tolist(),
+        'area_ranges'    : {bucket: [float(a) if np.isfinite(a) else None for a in area_range] for bucket, area_range in area_ranges.items()},
+        'classes'        : classes,
+        'summary'        : summary,
+    }
+
+
+def save_metrics(metrics, path):
+    """ Write metrics as returned by compute_metrics to a JSON file.
+    """
+    with open(path, 'w') as f:
+        json.dump(metrics, f, indent=2)
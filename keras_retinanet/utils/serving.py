@@ -0,0 +1,252 @@
+import json
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+from .image import preprocess_image, resize_image
+
+
+class MicroBatcher:
+    """ Collects concurrently submitted inputs into batches for a single worker thread.
+
+    A batch is dispatched once it holds max_batch_size inputs or max_wait_ms milliseconds after its first input arrived.
+
+    Args
+        predict_batch  : Function taking a list of inputs and returning a list with one result per input.
+        max_batch_size : The maximum number of inputs in a batch.
+        max_wait_ms    : The maximum time to wait for more inputs after the first input of a batch arrived.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=8, max_wait_ms=10):
+        self.predict_batch  = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait       = max_wait_ms / 1000.0
+        self.queue          = queue.Queue()
+        self.thread         = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, inputs):
+        """ Queue inputs for prediction, returns a concurrent.futures.Future with the result.
+        """
+        future = Future()
+        self.queue.put((inputs, future))
+        return future
+
+    def close(self):
+        """ Stop the worker thread after the queued inputs are processed.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def _next_batch(self):
+        """ Block for the first input, then collect more inputs until the batch is full or the wait expires.
+
+        Returns a list of (inputs, future) pairs and whether the batcher was closed.
+        """
+        first = self.queue.get()
+        if first is None:
+            return [], True
+
+        batch    = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self):
+        closed = False
+        while not closed:
+            batch, closed = self._next_batch()
+            if not batch:
+                continue
+
+            try:
+                results = self.predict_batch([inputs for inputs, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class InferenceService:
+    """ Runs a prediction model on encoded images, batching concurrent requests.
+
+    Images are decoded, resized and preprocessed in the calling (request) thread, only the network runs in the batching thread.
+
+    Args
+        model            : A prediction model (see models.convert_model) returning boxes, scores and labels.
+        preprocess_image : Function handler for preprocessing an image (scaling / normalizing) for passing through a network.
+        min_side         : The image's min side will be equal to min_side after resizing.
+        max_side         : If after resizing the image's max side is above max_side, resize until the max side is equal to max_side.
+        score_threshold  : The minimal score of reported detections.
+        max_batch_size   : The maximum number of images in a batch.
+        max_wait_ms      : The maximum time to wait for more images after the first image of a batch arrived.
+    """
+
+    def __init__(
+        self,
+        model,
+        preprocess_image=preprocess_image,
+        min_side=800,
+        max_side=1333,
+        score_threshold=0.5,
+        max_batch_size=8,
+        max_wait_ms=10
+    ):
+        self.model            = model
+        self.preprocess_image = preprocess_image
+        self.min_side         = min_side
+        self.max_side         = max_side
+        self.score_threshold  = score_threshold
+        self.batcher          = MicroBatcher(self._predict_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+
+    def detect(self, data):
+        """ Detect objects on an encoded (JPEG, PNG, ...) image.
+
+        Returns
+            A list of dictionaries with 'label', 'score' and 'box' (x1, y1, x2, y2) in original image coordinates.
+        """
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError('unable to decode image')
+
+        image, scale = resize_image(image, min_side=self.min_side, max_side=self.max_side)
+        image = self.preprocess_image(image)
+
+        return self.batcher.submit((image, scale)).result()
+
+    def close(self):
+        self.batcher.close()
+
+    def _predict_batch(self, inputs):
+        images = [image for image, _ in inputs]
+
+        # copy all images to the upper left part of the image batch object
+        max_shape = tuple(max(image.shape[x] for image in images) for x in range(3))
+        batch     = np.zeros((len(images),) + max_shape, dtype=images[0].dtype)
+        for index, image in enumerate(images):
+            batch[index, :image.shape[0], :image.shape[1], :image.shape[2]] = image
+
+        boxes, scores, labels = self.model.predict_on_batch(batch)[:3]
+
+        results = []
+        for index, (_, scale) in enumerate(inputs):
+            # scores are sorted, padded detections have a score of -1
+            keep = np.where(scores[index] >= self.score_threshold)[0]
+            results.append([
+                {
+                    'label' : int(labels[index, i]),
+                    'score' : float(scores[index, i]),
+                    'box'   : [float(b) for b in boxes[index, i] / scale],
+                } for i in keep
+            ])
+
+        return results
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """ Serves POST /detect with an encoded image as body and GET /health.
+    """
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_error(404)
+            return
+        self._send_json(200, {'status': 'ok'})
+
+    def do_POST(self):
+        if self.path != '/detect':
+            self.send_error(404)
+            return
+
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            detections = self.server.service.detect(data)
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            # answer instead of dropping the connection, the server keeps running
+            self._send_json(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+        self._send_json(200, {'detections': detections})
+
+    def _send_json(self, code, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep the console quiet, every image is a request
+        pass
+
+
+def make_server(service, host='127.0.0.1', port=8080):
+    """ Create a threading HTTP server exposing an InferenceService.
+
+    Every request is handled in its own thread, so concurrent requests end up in the same batches.
+    Use port 0 to bind to a free port, the chosen port is available as server.server_address[1].
+    """
+    server = ThreadingHTTPServer((host, port), _RequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+class InferenceClient:
+    """ Minimal client for an inference server, depends on the standard library only.
+
+    Args
+        url     : Base url of the server.
+        timeout : Timeout in seconds for a single request.
+    """
+
+    def __init__(self, url='http://127.0.0.1:8080', timeout=60):
+        self.url     = url.rstrip('/')
+        self.timeout = timeout
+
+    def health(self):
+        """ Returns True if the server is up.
+        """
+        with urllib.request.urlopen(self.url + '/health', timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))['status'] == 'ok'
+
+    def detect(self, data):
+        """ Send an encoded image and return the list of detections.
+        """
+        request = urllib.request.Request(
+            self.url + '/detect',
+            data=data,
+            headers={'Content-Type': 'application/octet-stream'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))['detections']
+
+    def detect_file(self, path):
+        """ Read an image file and return the list of detections.
+        """
+        with open(path, 'rb') as f:
+            return self.detect(f.read())
@@ -0,0 +1,181 @@
+import io
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .image import read_image_size
+
+# a shard file is the encoded images one after the other, followed by the index (an .npz archive),
+# its offset in the file and the magic
+MAGIC  = b'RNSHARD1'
+FOOTER = struct.Struct('<Q8s')
+
+
+class ShardWriter(object):
+    """ Writes a shard file, see ShardReader for the format.
+
+    Args
+        path        : Path of the shard file.
+        class_names : The class names, label i is class_names[i].
+    """
+    def __init__(self, path, class_names):
+        self.path        = path
+        self.class_names = list(class_names)
+        self.file        = open(path + '.tmp', 'wb')
+
+        self.names       = []
+        self.offsets     = [0]
+        self.sizes       = []
+        self.counts      = []
+        self.bboxes      = []
+        self.labels      = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.path + '.tmp')
+
+    def add(self, name, encoded_image, width, height, bboxes, labels):
+        """ Append an image.
+
+        Args
+            name          : Name of the image (eg. the file name without extension).
+            encoded_image : The contents of the image file.
+            width, height : The size of the image.
+            bboxes        : The boxes (N, 4) of the annotations.
+            labels        : The labels (N,) of the annotations.
+        """
+        self.file.write(encoded_image)
+        self.names.append(name)
+        self.offsets.append(self.offsets[-1] + len(encoded_image))
+        self.sizes.append((width, height))
+        self.counts.append(len(labels))
+        self.bboxes.append(np.asarray(bboxes, dtype=np.float64).reshape(-1, 4))
+        self.labels.append(np.asarray(labels, dtype=np.int64).reshape(-1))
+
+    def close(self):
+        """ Write the index and move the shard in place.
+        """
+        index = io.BytesIO()
+        np.savez(
+            index,
+            names              = np.array(self.names, dtype=str),
+            image_offsets      = np.array(self.offsets, dtype=np.int64),
+            sizes              = np.array(self.sizes, dtype=np.int64).reshape(-1, 2),
+            annotation_offsets = np.concatenate([[0], np.cumsum(self.counts)]).astype(np.int64),
+            bboxes             = np.concatenate(self.bboxes) if self.bboxes else np.empty((0, 4)),
+            labels             = np.concatenate(self.labels) if self.labels else np.empty((0,), dtype=np.int64),
+            class_names        = np.array(self.class_names, dtype=str),
+        )
+
+        index_offset = self.offsets[-1]
+        self.file.write(index.getvalue())
+        self.file.write(FOOTER.pack(index_offset, MAGIC))
+        self.file.close()
+        os.replace(self.path + '.tmp', self.path)
+
+
+class ShardReader(object):
+    """ Reads the images and annotations of a shard file through a memory map.
+
+    Images are returned as views of the memory map, so reading them does not copy and successive images are read
+    sequentially from a single file.
+
+    Args
+        path : Path of the shard file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.mmap = None
+        self._open()
+
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        index_offset, magic = FOOTER.unpack(self.mmap[-FOOTER.size:])
+        if magic != MAGIC:
+            raise ValueError('{} is not a shard file'.format(self.path))
+
+        with np.load(io.BytesIO(self.mmap[index_offset:-FOOTER.size])) as index:
+            self.names              = index['names']
+            self.image_offsets      = index['image_offsets']
+            self.sizes              = index['sizes']
+            self.annotation_offsets = index['annotation_offsets']
+            self.bboxes             = index['bboxes']
+            self.labels             = index['labels']
+            self.class_names        = index['class_names'].tolist()
+
+    def __getstate__(self):
+        # the memory map is opened again when unpickled (eg. in another process)
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self._open()
+
+    def __len__(self):
+        return len(self.names)
+
+    def image_bytes(self, index):
+        """ The encoded image as a memoryview of the shard.
+        """
+        return memoryview(self.mmap)[self.image_offsets[index]:self.image_offsets[index + 1]]
+
+    def image_size(self, index):
+        """ The (width, height) of an image.
+        """
+        width, height = self.sizes[index]
+        return int(width), int(height)
+
+    def annotations(self, index):
+        """ The annotations of an image, as returned by Generator.load_annotations.
+        """
+        start, end = self.annotation_offsets[index:index + 2]
+        return {'labels': self.labels[start:end].astype(np.float64), 'bboxes': self.bboxes[start:end].copy()}
+
+
+def write_shards(generator, output_dir, prefix='shard', images_per_shard=1000):
+    """ Pack the images and annotations of a generator into shard files.
+
+    The image files are copied without decoding them, annotations are taken from generator.load_annotations.
+
+    Args
+        generator        : A generator with image_path (eg. a PascalVocGenerator of a LADD dataset).
+        output_dir       : The directory to write the shards to.
+        prefix           : Shards are named <prefix>-00000.shard, <prefix>-00001.shard, ...
+        images_per_shard : The number of images per shard.
+
+    Returns
+        The paths of the written shards.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    class_names = [generator.label_to_name(label) for label in range(generator.num_classes())]
+    image_size  = getattr(generator, 'image_size', None)
+
+    paths = []
+    for start in range(0, generator.size(), images_per_shard):
+        path = os.path.join(output_dir, '{}-{:05d}.shard'.format(prefix, len(paths)))
+        with ShardWriter(path, class_names) as writer:
+            for image_index in range(start, min(start + images_per_shard, generator.size())):
+                image_path    = generator.image_path(image_index)
+                width, height = image_size(image_index) if image_size else read_image_size(image_path)
+                annotations   = generator.load_annotations(image_index)
+
+                with open(image_path, 'rb') as f:
+                    encoded_image = f.read()
+                name = os.path.splitext(os.path.basename(image_path))[0]
+                writer.add(name, encoded_image, width, height, annotations['bboxes'], annotations['labels'])
+        paths.append(path)
+
+    return paths
@@ -0,0 +1,120 @@
+import numpy as np
+
+from .image import preprocess_image
+
+
+def crop_tiles(image, grid):
+    """ Copy the tiles of an image into a single batch.
+
+    Tiles which extend past the image border (images smaller than the window) are zero padded.
+
+    Args
+        image : The image (height, width, channels).
+        grid  : List of grid_cropper.Rectangle, all of the same size.
+
+    Returns
+        An array (len(grid), window_h, window_w, channels) of the same dtype as image.
+    """
+    batch = np.zeros((len(grid), grid[0].h, grid[0].w, image.shape[2]), dtype=image.dtype)
+    for index, rect in enumerate(grid):
+        tile = image[rect.ymin:rect.ymax, rect.xmin:rect.xmax]
+        batch[index, :tile.shape[0], :tile.shape[1]] = tile
+    return batch
+
+
+def non_max_suppression(boxes, scores, labels, iou_threshold=0.5, max_detections=300):
+    """ Greedy per class non maximum suppression.
+
+    Boxes of different classes are shifted apart so all classes are suppressed in a single pass,
+    each step suppresses all remaining boxes overlapping the best one at once.
+
+    Args
+        boxes          : (N, 4) array of boxes (x1, y1, x2, y2).
+        scores         : (N,) array of scores.
+        labels         : (N,) array of labels.
+        iou_threshold  : Boxes overlapping a better box of the same class above this threshold are removed.
+        max_detections : The maximum number of boxes to keep.
+
+    Returns
+        Indices of the kept boxes, sorted by decreasing score.
+    """
+    if len(boxes) == 0:
+        return np.zeros((0,), dtype=np.int64)
+
+    boxes   = boxes.astype(np.float64)
+    offsets = labels.astype(np.float64)[:, None] * (boxes.max() + 1)
+    boxes   = boxes + offsets
+    areas   = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    order = np.argsort(-scores, kind='stable')
+    keep  = []
+    while order.size > 0 and len(keep) < max_detections:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+
+        iw  = np.minimum(boxes[best, 2], boxes[rest, 2]) - np.maximum(boxes[best, 0], boxes[rest, 0])
+        ih  = np.minimum(boxes[best, 3], boxes[rest, 3]) - np.maximum(boxes[best, 1], boxes[rest, 1])
+        intersection = np.maximum(iw, 0) * np.maximum(ih, 0)
+        iou = intersection / np.maximum(areas[best] + areas[rest] - intersection, np.finfo(np.float64).eps)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def predict_tiled(
+    model,
+    image,
+    cropper,
+    preprocess_image=preprocess_image,
+    batch_size=8,
+    score_threshold=0.05,
+    nms_threshold=0.5,
+    max_detections=300
+):
+    """ Detect objects on a full resolution image by running overlapping tiles through the model.
+
+    The tiles are computed with cropper.get_image_grid and run in batches of batch_size tiles, detections are
+    moved back to image coordinates with the tile offsets and merged across tiles with non maximum suppression.
+
+    Args
+        model            : A prediction model (see models.convert_model) returning boxes, scores and labels.
+        image            : The (BGR, not preprocessed) image.
+        cropper          : A grid_cropper.ImageGridCropper defining the tile size and overlap.
+        preprocess_image : Function handler for preprocessing an image (scaling / normalizing) for passing through a network.
+        batch_size       : The maximum number of tiles in a single batch.
+        score_threshold  : Detections with a lower score are discarded before merging.
+        nms_threshold    : The IoU threshold for merging detections of neighbouring tiles.
+        max_detections   : The maximum number of detections returned.
+
+    Returns
+        boxes (N, 4), scores (N,) and labels (N,) sorted by decreasing score, in image coordinates.
+    """
+    grid = cropper.get_image_grid(image.shape[1], image.shape[0])
+
+    all_boxes, all_scores, all_labels = [], [], []
+    for start in range(0, len(grid), batch_size):
+        # only the tiles of one batch are copied and preprocessed at a time
+        tiles = preprocess_image(crop_tiles(image, grid[start:start + batch_size]))
+        boxes, scores, labels = model.predict_on_batch(tiles)[:3]
+        all_boxes.append(np.asarray(boxes))
+        all_scores.append(np.asarray(scores))
+        all_labels.append(np.asarray(labels))
+
+    boxes  = np.concatenate(all_boxes)
+    scores = np.concatenate(all_scores)
+    labels = np.concatenate(all_labels)
+
+    # shift every tile's detections by its offset
+    offsets = np.array([[rect.xmin, rect.ymin, rect.xmin, rect.ymin] for rect in grid], dtype=boxes.dtype)
+    boxes   = boxes + offsets[:, None, :]
+
+    # padded detections have a score of -1
+    mask   = scores >= score_threshold
+    boxes  = boxes[mask]
+    scores = scores[mask]
+    labels = labels[mask]
+
+    keep = non_max_suppression(boxes, scores, labels, iou_threshold=nms_threshold, max_detections=max_detections)
+    return boxes[keep], scores[keep], labels[keep]
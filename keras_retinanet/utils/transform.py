@@ -54,6 +54,35 @@ def transform_aabb(transform, aabb):
     return [min_corner[0], min_corner[1], max_corner[0], max_corner[1]]
 
 
+def transform_aabbs(transform, boxes):
+    """ Apply a transformation to an array of axis aligned bounding boxes.
+
+    Same as transform_aabb for every box, all corner points are transformed with a single matrix multiplication.
+
+    Args
+        transform: The transformation to apply.
+        boxes:     An (N, 4) array of boxes (x1, y1, x2, y2).
+    Returns
+        The new AABBs as an (N, 4) array.
+    """
+    boxes = np.asarray(boxes)
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+
+    # Transform all 4 corners of all AABBs, points has shape (3, 4 * N).
+    points = transform.dot([
+        np.concatenate([x1, x2, x1, x2]),
+        np.concatenate([y1, y2, y2, y1]),
+        np.ones(4 * len(boxes)),
+    ])
+
+    # Extract the min and max corners again.
+    points     = points[:2].reshape(2, 4, -1)
+    min_corner = points.min(axis=1)
+    max_corner = points.max(axis=1)
+
+    return np.stack([min_corner[0], min_corner[1], max_corner[0], max_corner[1]], axis=1)
+
+
 def _random_vector(min, max, prng=DEFAULT_PRNG):
     """ Construct a random vector between min and max.
     Args
@@ -1,3 +1,5 @@
+import sys
+
 import setuptools
 from setuptools.extension import Extension
 from distutils.command.build_ext import build_ext as DistUtilsBuildExt
@@ -34,10 +36,20 @@ class BuildExtension(setuptools.Command):
         return self._command.run(*args, **kwargs)
 
 
+# compute_overlap runs its outer loop in parallel when compiled with OpenMP, otherwise it runs single threaded
+if sys.platform == 'win32':
+    openmp_args = ['/openmp']
+elif sys.platform.startswith('linux'):
+    openmp_args = ['-fopenmp']
+else:
+    openmp_args = []
+
 extensions = [
     Extension(
         'keras_retinanet.utils.compute_overlap',
-        ['keras_retinanet/utils/compute_overlap.pyx']
+        ['keras_retinanet/utils/compute_overlap.pyx'],
+        extra_compile_args=openmp_args,
+        extra_link_args=openmp_args if sys.platform != 'win32' else []
     ),
 ]
 
@@ -60,6 +72,8 @@ setuptools.setup(
             'retinanet-evaluate=keras_retinanet.bin.evaluate:main',
             'retinanet-debug=keras_retinanet.bin.debug:main',
             'retinanet-convert-model=keras_retinanet.bin.convert_model:main',
+            'retinanet-convert-dataset=keras_retinanet.bin.convert_dataset:main',
+            'retinanet-serve=keras_retinanet.bin.serve:main',
         ],
     },
     ext_modules    = extensions,
@@ -16,8 +16,10 @@ limitations under the License.
 
 import keras_retinanet.backend
 import keras_retinanet.bin.train
+from keras_retinanet import models
 from tensorflow import keras
 
+import numpy as np
 import warnings
 
 import pytest
@@ -92,3 +94,30 @@ def test_vgg():
         'coco',
         'tests/test-data/coco',
     ])
+
+
+def test_create_models_targets_in_graph():
+    # ignore warnings in this test
+    warnings.simplefilter('ignore')
+
+    backbone = models.backbone('mobilenet128_1.0')
+    _, training_model, _ = keras_retinanet.bin.train.create_models(
+        backbone_retinanet=backbone.retinanet,
+        num_classes=2,
+        weights=None,
+        preprocess_layer=backbone.preprocess_layer(),
+        targets_in_graph=True
+    )
+
+    # uint8 images and the annotations padded with -1, the targets and losses are computed by the model
+    images       = np.random.randint(0, 255, (2, 128, 128, 3), dtype=np.uint8)
+    boxes        = np.array([[[10, 10, 60, 60], [-1, -1, -1, -1]], [[20, 30, 100, 90], [50, 50, 80, 80]]], dtype=np.float32)
+    labels       = np.array([[0, -1], [1, 0]], dtype=np.float32)
+    image_shapes = np.array([[128, 128], [128, 128]], dtype=np.float32)
+    assert training_model.inputs[0].dtype == 'uint8'
+
+    history = training_model.fit([images, boxes, labels, image_shapes], batch_size=2, epochs=1, verbose=0).history
+    assert np.isfinite(history['loss'][0])
+
+    # the losses are added once, also after wrapping the model with the preprocessing
+    assert history['loss'][0] == pytest.approx(history['regression_loss'][0] + history['classification_loss'][0], rel=1e-4)
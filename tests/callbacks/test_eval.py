@@ -0,0 +1,98 @@
+import time
+
+from tensorflow import keras
+
+from keras_retinanet.callbacks import EvaluationEarlyStopping
+from keras_retinanet.callbacks.eval import Evaluate
+
+
+class StubGenerator(object):
+    """ Ten images of a single class.
+    """
+    def size(self):
+        return 10
+
+    def label_to_name(self, label):
+        return 'human'
+
+    def load_annotations(self, image_index):
+        return image_index
+
+
+def stub_evaluate(generator, model, **kwargs):
+    """ Reports an average precision of one tenth of the evaluated images, the annotations must be reachable.
+    """
+    assert [generator.load_annotations(i) for i in range(generator.size())]
+    return {0: (generator.size() / 10, generator.size())}, 0.0
+
+
+def run_epochs(callback, epochs):
+    callback.set_model(keras.Sequential([keras.layers.Dense(1, input_shape=(2,))]))
+    callback.on_train_begin()
+    all_logs = []
+    for epoch in range(epochs):
+        logs = {'loss': 0.0}
+        callback.on_epoch_end(epoch, logs)
+        all_logs.append(logs)
+    end_logs = {'loss': 0.0}
+    callback.on_train_end(end_logs)
+    return all_logs, end_logs
+
+
+def test_evaluate_subset():
+    callback = Evaluate(StubGenerator(), evaluate_func=stub_evaluate, subset_size=3, full_evaluation_every=2, verbose=0)
+    all_logs, _ = run_epochs(callback, 4)
+
+    assert all_logs == [
+        {'loss': 0.0, 'mAP_subset': 0.3},
+        {'loss': 0.0, 'mAP': 1.0},
+        {'loss': 0.0, 'mAP_subset': 0.3},
+        {'loss': 0.0, 'mAP': 1.0},
+    ]
+    assert len(set(callback.subset)) == 3
+
+
+def test_evaluate_async():
+    callback = Evaluate(StubGenerator(), evaluate_func=stub_evaluate, subset_size=5, full_evaluation_every=2,
+                        async_evaluation=True, verbose=0)
+    all_logs, end_logs = run_epochs(callback, 2)
+
+    # results are reported with a delay, all of them are reported by the end of training
+    reported = {}
+    for logs in all_logs + [end_logs]:
+        reported.update(logs)
+    assert reported == {'loss': 0.0, 'mAP_subset': 0.5, 'mAP': 1.0}
+    assert callback.mean_ap == 1.0
+    assert callback.worker is None
+
+
+def test_evaluate_async_reported_on_next_epoch():
+    callback = Evaluate(StubGenerator(), evaluate_func=stub_evaluate, full_evaluation_every=2, async_evaluation=True, verbose=0)
+    callback.set_model(keras.Sequential([keras.layers.Dense(1, input_shape=(2,))]))
+    callback.on_train_begin()
+    callback.on_epoch_end(1, {'loss': 0.0})
+
+    # epochs without an evaluation still report the evaluations that finished
+    deadline = time.time() + 120
+    logs     = {'loss': 0.0}
+    while 'mAP' not in logs and time.time() < deadline:
+        logs = {'loss': 0.0}
+        callback.on_epoch_end(2, logs)
+        time.sleep(0.1)
+    assert logs == {'loss': 0.0, 'mAP': 1.0}
+
+    callback.on_train_end({'loss': 0.0})
+
+
+def test_evaluation_early_stopping():
+    callback = EvaluationEarlyStopping(monitor='mAP', patience=2, mode='max')
+    callback.set_model(keras.Sequential([keras.layers.Dense(1, input_shape=(2,))]))
+    callback.on_train_begin()
+
+    # epochs without an evaluation do not count towards the patience
+    for epoch, logs in enumerate([{'mAP': 0.5}, {}, {}, {'mAP': 0.4}, {}, {}]):
+        callback.on_epoch_end(epoch, dict(logs, loss=0.0))
+    assert not callback.model.stop_training
+
+    callback.on_epoch_end(6, {'loss': 0.0, 'mAP': 0.4})
+    assert callback.model.stop_training
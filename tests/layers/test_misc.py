@@ -17,6 +17,8 @@ limitations under the License.
 from tensorflow import keras
 import keras_retinanet.backend
 import keras_retinanet.layers
+from keras_retinanet.utils.anchors import anchors_for_shape, anchor_targets_bbox
+from keras_retinanet.utils.image import preprocess_image
 
 import numpy as np
 
@@ -210,3 +212,56 @@ class TestRegressBoxes(object):
         ], dtype=keras.backend.floatx())
 
         np.testing.assert_array_almost_equal(actual, expected, decimal=2)
+
+
+class TestPreprocessImage(object):
+    def test_modes(self):
+        image = np.random.randint(0, 256, size=(2, 4, 5, 3)).astype(np.uint8)
+
+        for mode in ['caffe', 'tf']:
+            layer  = keras_retinanet.layers.PreprocessImage(mode=mode)
+            actual = keras.backend.eval(layer.call(keras.backend.constant(image, dtype='uint8')))
+            np.testing.assert_array_almost_equal(actual, preprocess_image(image, mode=mode), decimal=4)
+
+    def test_config(self):
+        layer = keras_retinanet.layers.PreprocessImage(mode='torch')
+        assert keras_retinanet.layers.PreprocessImage.from_config(layer.get_config()).mode == 'torch'
+
+
+class TestAnchorTargets(object):
+    def test_matches_anchor_targets_bbox(self):
+        # the second image is smaller than the batch and has less annotations
+        prng   = np.random.RandomState(0)
+        boxes  = prng.uniform(0, 100, size=(2, 5, 2))
+        boxes  = np.concatenate([boxes, boxes + prng.uniform(10, 60, size=(2, 5, 2))], axis=2)
+        labels = np.array([[0, 1, 2, 0, 1], [2, 1, -1, -1, -1]], dtype=float)
+        shapes = np.array([[128, 160], [100, 120]], dtype=float)
+
+        image_group       = [np.zeros((128, 160, 3)), np.zeros((100, 120, 3))]
+        annotations_group = [
+            {'bboxes': boxes[0], 'labels': labels[0]},
+            {'bboxes': boxes[1, :2], 'labels': labels[1, :2]},
+        ]
+        anchors = anchors_for_shape((128, 160, 3))
+        expected_regression, expected_labels = anchor_targets_bbox(anchors, image_group, annotations_group, num_classes=3)
+
+        layer = keras_retinanet.layers.AnchorTargets(num_classes=3)
+        regression, labels = layer.call([
+            keras.backend.constant(np.tile(anchors[None], (2, 1, 1))),
+            keras.backend.constant(boxes),
+            keras.backend.constant(labels),
+            keras.backend.constant(shapes),
+        ])
+        regression = keras.backend.eval(regression)
+        labels     = keras.backend.eval(labels)
+
+        # anchor states are equal, the classes and regression targets only matter where they are used by the losses
+        np.testing.assert_array_equal(regression[..., -1], expected_regression[..., -1])
+        np.testing.assert_array_equal(labels[..., -1], expected_labels[..., -1])
+
+        used = expected_labels[..., -1] != -1
+        np.testing.assert_array_equal(labels[used], expected_labels[used])
+
+        positive = expected_regression[..., -1] == 1
+        assert positive.any()
+        np.testing.assert_array_almost_equal(regression[positive], expected_regression[positive], decimal=5)
@@ -15,19 +15,21 @@ limitations under the License.
 """
 
 from keras_retinanet.preprocessing.generator import Generator
+from keras_retinanet.utils.image_cache import ImageCache
 
+import copy
 import numpy as np
 import pytest
 
 
 class SimpleGenerator(Generator):
-    def __init__(self, bboxes, labels, num_classes=0, image=None):
+    def __init__(self, bboxes, labels, num_classes=0, image=None, **kwargs):
         assert(len(bboxes) == len(labels))
         self.bboxes       = bboxes
         self.labels       = labels
         self.num_classes_ = num_classes
         self.image        = image
-        super(SimpleGenerator, self).__init__(group_method='none', shuffle_groups=False)
+        super(SimpleGenerator, self).__init__(group_method='none', shuffle_groups=False, **kwargs)
 
     def num_classes(self):
         return self.num_classes_
@@ -270,3 +272,87 @@ class TestFilterAnnotations(object):
         # test that only object with class 5 is present in labels_batch
         labels = np.unique(np.argmax(labels_batch == 5, axis=2))
         assert(len(labels) == 1 and labels[0] == 0), 'Expected only class 0 to be present, but got classes {}'.format(labels)
+
+
+class TestPreprocessInGraph(object):
+    def test_uint8_inputs(self):
+        input_bboxes_group = [np.array([[0, 0, 50, 50]], dtype=float)]
+        input_labels_group = [np.array([0], dtype=float)]
+        input_image        = np.full((100, 120, 3), 200, dtype=np.uint8)
+
+        simple_generator = SimpleGenerator(input_bboxes_group, input_labels_group, image=input_image, num_classes=1, no_resize=True, preprocess_in_graph=True)
+        inputs, _ = simple_generator[0]
+
+        assert inputs.dtype == np.uint8
+        np.testing.assert_equal(inputs[0], input_image)
+
+
+class TestTargetsInGraph(object):
+    def test_annotation_inputs(self):
+        input_bboxes_group = [np.array([[0, 0, 50, 50], [10, 10, 40, 60]], dtype=float), np.zeros((0, 4))]
+        input_labels_group = [np.array([1, 0], dtype=float), np.zeros((0,))]
+        input_image        = np.zeros((100, 120, 3), dtype=np.uint8)
+
+        simple_generator = SimpleGenerator(input_bboxes_group, input_labels_group, image=input_image, num_classes=2, no_resize=True, targets_in_graph=True, batch_size=2)
+        inputs, targets = simple_generator[0]
+
+        assert targets is None
+        assert isinstance(inputs, tuple) and len(inputs) == 4
+        image_batch, boxes, labels, shapes = inputs
+        assert image_batch.shape == (2, 100, 120, 3)
+        np.testing.assert_array_equal(boxes[0], input_bboxes_group[0])
+        np.testing.assert_array_equal(labels, [[1, 0], [-1, -1]])
+        np.testing.assert_array_equal(shapes, [[100, 120], [100, 120]])
+
+
+class TestFusedTransform(object):
+    def test_matches_transform_then_resize(self):
+        x, y        = np.meshgrid(np.linspace(0, 255, 400), np.linspace(0, 255, 300))
+        input_image = np.stack([x, y, 255 - x], axis=-1).astype(np.uint8)
+        transform   = np.array([
+            [1, 0, 20],
+            [0, 1, 10],
+            [0, 0, 1 ],
+        ], dtype=float)
+
+        simple_generator = SimpleGenerator([np.zeros((0, 4))], [np.zeros((0,))], image=input_image, image_min_side=150, image_max_side=300)
+
+        annotations = {'labels': np.array([0]), 'bboxes': np.array([[10, 20, 110, 220]], dtype=float)}
+        expected_image, expected_annotations = simple_generator.random_transform_group_entry(input_image, copy.deepcopy(annotations), transform)
+        expected_image, expected_scale = simple_generator.resize_image(expected_image)
+        expected_bboxes = expected_annotations['bboxes'] * expected_scale
+
+        image, annotations = simple_generator.random_transform_resize_group_entry(input_image, annotations, transform)
+
+        assert image.shape == expected_image.shape
+        np.testing.assert_array_almost_equal(annotations['bboxes'], expected_bboxes)
+        assert np.abs(image.astype(np.float32) - expected_image.astype(np.float32)).mean() < 2
+
+
+class TestImageCache(object):
+    def test_resized_images_are_cached(self, tmp_path):
+        class CountingGenerator(SimpleGenerator):
+            loads = 0
+
+            def load_image(self, image_index):
+                CountingGenerator.loads += 1
+                return super(CountingGenerator, self).load_image(image_index)
+
+            def image_cache_key(self, image_index):
+                return {'image': image_index}
+
+        input_bboxes_group = [np.array([[10, 20, 50, 40]], dtype=float)]
+        input_labels_group = [np.array([0], dtype=float)]
+        input_image        = np.full((100, 200, 3), 100, dtype=np.uint8)
+
+        simple_generator = CountingGenerator(input_bboxes_group, input_labels_group, image=input_image, num_classes=1,
+                                             image_min_side=50, image_max_side=100, targets_in_graph=True,
+                                             disk_image_cache=ImageCache(str(tmp_path), 1024 ** 2))
+        for _ in range(2):
+            (image_batch, boxes, _, _), _ = simple_generator[0]
+            assert image_batch.shape == (1, 50, 100, 3)
+            np.testing.assert_array_equal(boxes[0], [[5, 10, 25, 20]])
+
+        # the annotations of the generator are not changed and the image is decoded once
+        np.testing.assert_array_equal(input_bboxes_group[0], [[10, 20, 50, 40]])
+        assert CountingGenerator.loads == 1
@@ -1,4 +1,5 @@
 import os
+import cv2
 import pytest
 from PIL import Image
 from keras_retinanet.utils import image
@@ -24,3 +25,64 @@ def test_read_image_bgr(tmp_path):
 
     # Assert images are equal
     np.testing.assert_array_equal(original_img, loaded_image)
+
+
+@pytest.fixture
+def jpeg_path(tmp_path):
+    # smooth gradient, so decoding at a reduced size stays close to a full decode
+    x, y  = np.meshgrid(np.linspace(0, 255, 1600), np.linspace(0, 255, 1200))
+    img   = np.stack([x, y, 255 - x], axis=-1).astype(np.uint8)
+    path  = str(tmp_path / 'image.jpg')
+    cv2.imwrite(path, img)
+    return path
+
+
+@pytest.fixture
+def rotated_jpeg_path(jpeg_path, tmp_path):
+    # EXIF orientation 6, the image is displayed rotated by 90 degrees clockwise
+    exif         = Image.Exif()
+    exif[0x0112] = 6
+    path         = str(tmp_path / 'rotated.jpg')
+    Image.open(jpeg_path).save(path, exif=exif, quality=95)
+    return path
+
+
+def test_read_image_size(jpeg_path):
+    assert image.read_image_size(jpeg_path) == (1600, 1200)
+
+
+def test_compute_reduce_factor():
+    assert image.compute_reduce_factor(1.0) == 1
+    assert image.compute_reduce_factor(0.6) == 1
+    assert image.compute_reduce_factor(0.5) == 2
+    assert image.compute_reduce_factor(0.3) == 2
+    assert image.compute_reduce_factor(0.25) == 4
+    assert image.compute_reduce_factor(0.1) == 8
+
+
+def test_read_image_bgr_reduced(jpeg_path):
+    assert image.read_image_bgr(jpeg_path, reduce_factor=4).shape == (300, 400, 3)
+
+
+@pytest.mark.parametrize('min_side, max_side', [(300, 500), (800, 1333), (1200, 1600)])
+def test_read_image_bgr_resized(jpeg_path, min_side, max_side):
+    expected, expected_scale = image.resize_image(image.read_image_bgr(jpeg_path), min_side=min_side, max_side=max_side)
+    resized, scale = image.read_image_bgr_resized(jpeg_path, min_side=min_side, max_side=max_side)
+
+    assert scale == expected_scale
+    assert resized.shape == expected.shape
+    assert np.abs(resized.astype(np.float32) - expected.astype(np.float32)).mean() < 4
+
+
+def test_read_image_bgr_resized_exif_transpose(rotated_jpeg_path):
+    # the stored pixels by default, the orientation of cv2.imread with exif_transpose
+    assert image.read_image_size(rotated_jpeg_path) == (1600, 1200)
+    assert image.read_image_size(rotated_jpeg_path, exif_transpose=True) == (1200, 1600)
+    assert image.read_image_bgr_resized(rotated_jpeg_path, min_side=300, max_side=400)[0].shape == (300, 400, 3)
+
+    expected, expected_scale = image.resize_image(cv2.imread(rotated_jpeg_path), min_side=300, max_side=400)
+    resized, scale = image.read_image_bgr_resized(rotated_jpeg_path, min_side=300, max_side=400, exif_transpose=True)
+
+    assert scale == expected_scale
+    assert resized.shape == expected.shape == (400, 300, 3)
+    assert np.abs(resized.astype(np.float32) - expected.astype(np.float32)).mean() < 4
@@ -0,0 +1,175 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from keras_retinanet.preprocessing.pascal_voc import PascalVocGenerator
+from keras_retinanet.preprocessing.pascal_voc_grid_crops import PascalVocGridCropsGenerator
+
+OBJECT = '''
+    <object>
+        <name>{name}</name>
+        <truncated>{truncated}</truncated>
+        <difficult>{difficult}</difficult>
+        <bndbox><xmin>{xmin}</xmin><ymin>{ymin}</ymin><xmax>{xmax}</xmax><ymax>{ymax}</ymax></bndbox>
+    </object>'''
+
+
+def write_annotations(data_dir, image_name, objects, size=(200, 100)):
+    cv2.imwrite(os.path.join(data_dir, 'JPEGImages', image_name + '.jpg'), np.zeros((size[1], size[0], 3), dtype=np.uint8))
+    with open(os.path.join(data_dir, 'Annotations', image_name + '.xml'), 'w') as f:
+        f.write('<annotation><size><width>{}</width><height>{}</height><depth>3</depth></size>'.format(*size))
+        for name, truncated, difficult, box in objects:
+            f.write(OBJECT.format(name=name, truncated=truncated, difficult=difficult,
+                                  xmin=box[0], ymin=box[1], xmax=box[2], ymax=box[3]))
+        f.write('</annotation>')
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    os.makedirs(str(tmp_path / 'Annotations'))
+    os.makedirs(str(tmp_path / 'JPEGImages'))
+    os.makedirs(str(tmp_path / 'ImageSets' / 'Main'))
+    with open(str(tmp_path / 'ImageSets' / 'Main' / 'test.txt'), 'w') as f:
+        f.write('a\nb\nc\n')
+
+    write_annotations(str(tmp_path), 'a', [('Pedestrian', 0, 0, (11, 21, 31, 41)), ('Pedestrian', 1, 1, (1, 2, 3, 4))])
+    write_annotations(str(tmp_path), 'b', [])
+    write_annotations(str(tmp_path), 'c', [('Pedestrian', 0, 1, (5, 6, 7, 8))], size=(100, 200))
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('skip', [False, True])
+def test_annotation_index_matches_xml(data_dir, skip):
+    indexed = PascalVocGenerator(data_dir, 'test', skip_truncated=skip, skip_difficult=skip, shuffle_groups=False)
+    parsed  = PascalVocGenerator(data_dir, 'test', skip_truncated=skip, skip_difficult=skip, shuffle_groups=False,
+                                 annotation_index=False)
+
+    assert os.path.exists(os.path.join(data_dir, 'ImageSets', 'Main', 'test.index.npz'))
+    for i in range(3):
+        expected = parsed.load_annotations(i)
+        actual   = indexed.load_annotations(i)
+        np.testing.assert_array_equal(actual['bboxes'], expected['bboxes'])
+        np.testing.assert_array_equal(actual['labels'], expected['labels'])
+
+    assert indexed.load_annotations(0)['bboxes'].tolist() == ([[10, 20, 30, 40]] if skip else [[10, 20, 30, 40], [0, 1, 2, 3]])
+    assert indexed.load_annotations(1)['bboxes'].shape == (0, 4)
+    assert indexed.image_aspect_ratio(0) == 2.0
+    assert indexed.image_aspect_ratio(2) == 0.5
+
+
+def test_annotation_index_returns_copies(data_dir):
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    generator.load_annotations(0)['bboxes'] *= 2
+    assert generator.load_annotations(0)['bboxes'][0].tolist() == [10, 20, 30, 40]
+
+
+def test_annotation_index_rebuilt_on_change(data_dir):
+    PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+
+    path = os.path.join(data_dir, 'Annotations', 'b.xml')
+    write_annotations(data_dir, 'b', [('Pedestrian', 0, 0, (1, 1, 5, 5))])
+    os.utime(path, (0, 12345))
+
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    assert generator.load_annotations(1)['bboxes'].tolist() == [[0, 0, 4, 4]]
+
+
+def test_annotation_index_unknown_class(data_dir):
+    write_annotations(data_dir, 'b', [('Dog', 0, 0, (1, 1, 5, 5))])
+
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    generator.load_annotations(0)
+    with pytest.raises(ValueError, match='class name \'Dog\' not found'):
+        generator.load_annotations(1)
+
+
+def test_annotation_index_empty_size(data_dir):
+    # data_utils/dataset.py writes a size element with empty values
+    with open(os.path.join(data_dir, 'Annotations', 'b.xml'), 'w') as f:
+        f.write('<annotation><size><height></height><width></width><depth></depth></size></annotation>')
+
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    assert generator.load_annotations(1)['bboxes'].shape == (0, 4)
+    assert generator.annotation_index['sizes'][1].tolist() == [-1, -1]
+
+
+def test_image_size_from_annotations(data_dir):
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    assert generator.image_size(2) == (100, 200)
+    assert not os.path.exists(os.path.join(data_dir, 'ImageSets', 'Main', 'test.sizes.npz'))
+
+
+def test_image_size_header_scan(data_dir):
+    # annotations without a size element
+    with open(os.path.join(data_dir, 'Annotations', 'a.xml'), 'w') as f:
+        f.write('<annotation><size><height></height><width></width><depth></depth></size></annotation>')
+    with open(os.path.join(data_dir, 'Annotations', 'b.xml'), 'w') as f:
+        f.write('<annotation></annotation>')
+    cv2.imwrite(os.path.join(data_dir, 'JPEGImages', 'b.jpg'), np.zeros((30, 90, 3), dtype=np.uint8))
+
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    assert [generator.image_size(i) for i in range(3)] == [(200, 100), (90, 30), (100, 200)]
+    assert os.path.exists(os.path.join(data_dir, 'ImageSets', 'Main', 'test.sizes.npz'))
+
+    # the cached size is used until the image changes
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False, size_scan_workers=0)
+    assert generator.image_size(1) == (90, 30)
+
+    image_path = os.path.join(data_dir, 'JPEGImages', 'b.jpg')
+    cv2.imwrite(image_path, np.zeros((40, 20, 3), dtype=np.uint8))
+    os.utime(image_path, (0, 12345))
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    assert generator.image_size(1) == (20, 40)
+
+
+def test_image_size_stats_in_threads(data_dir, monkeypatch):
+    for name in 'abc':
+        with open(os.path.join(data_dir, 'Annotations', name + '.xml'), 'w') as f:
+            f.write('<annotation></annotation>')
+
+    # the modification times of the images are read by the scan threads, not one after the other
+    threads  = set()
+    getmtime = os.path.getmtime
+
+    def recording_getmtime(path):
+        if path.endswith('.jpg'):
+            threads.add(threading.current_thread())
+        return getmtime(path)
+
+    monkeypatch.setattr(os.path, 'getmtime', recording_getmtime)
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    assert [generator.image_size(i) for i in range(3)] == [(200, 100), (200, 100), (100, 200)]
+    assert threads and threading.main_thread() not in threads
+
+
+def test_grid_crops_use_image_sizes(data_dir):
+    generator = PascalVocGridCropsGenerator(100, 100, 0, 0, 0.75, data_dir=data_dir, set_name='test', shuffle_groups=False,
+                                            no_resize=True)
+
+    # one group per image, ordered by aspect ratio, with a crop per grid cell
+    assert [group[0].image_index for group in generator.groups] == [2, 0, 1]
+    assert [len(group) for group in generator.groups] == [2, 2, 2]
+
+
+def test_grid_crops_load_batch(data_dir):
+    generator = PascalVocGridCropsGenerator(100, 100, 0, 0, 0.75, data_dir=data_dir, set_name='test', shuffle_groups=False,
+                                            group_by_image=False, batch_size=2, image_min_side=100, image_max_side=200)
+
+    inputs, targets = generator[0]
+    assert inputs.shape == (2, 100, 100, 3)
+    assert len(targets) == 2
+
+
+def test_annotation_index_corrupt(data_dir):
+    # a truncated file, as left by an interrupted write
+    path = os.path.join(data_dir, 'ImageSets', 'Main', 'test.index.npz')
+    PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    with open(path, 'r+b') as f:
+        f.truncate(100)
+
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    assert generator.load_annotations(0)['bboxes'].tolist() == [[10, 20, 30, 40], [0, 1, 2, 3]]
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')]
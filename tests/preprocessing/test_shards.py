@@ -0,0 +1,54 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from keras_retinanet.preprocessing.pascal_voc import PascalVocGenerator
+from keras_retinanet.preprocessing.shards import ShardGenerator
+from keras_retinanet.utils.shards import write_shards
+from .test_pascal_voc import data_dir  # noqa: F401
+
+
+@pytest.fixture
+def shards(data_dir, tmp_path):  # noqa: F811
+    generator = PascalVocGenerator(data_dir, 'test', shuffle_groups=False)
+    return generator, write_shards(generator, str(tmp_path / 'shards'), prefix='test', images_per_shard=2)
+
+
+def test_shard_generator_matches_pascal_voc(shards):
+    pascal, paths = shards
+    assert [os.path.basename(path) for path in paths] == ['test-00000.shard', 'test-00001.shard']
+
+    generator = ShardGenerator(os.path.join(os.path.dirname(paths[0]), 'test-*.shard'), shuffle_groups=False)
+    assert generator.size() == pascal.size()
+    assert generator.num_classes() == pascal.num_classes()
+    assert generator.name_to_label('Pedestrian') == pascal.name_to_label('Pedestrian')
+
+    for i in range(generator.size()):
+        assert generator.image_size(i) == pascal.image_size(i)
+        assert generator.image_aspect_ratio(i) == pascal.image_aspect_ratio(i)
+        np.testing.assert_array_equal(generator.load_image(i), pascal.load_image(i))
+        np.testing.assert_array_equal(generator.load_annotations(i)['bboxes'], pascal.load_annotations(i)['bboxes'])
+        np.testing.assert_array_equal(generator.load_annotations(i)['labels'], pascal.load_annotations(i)['labels'])
+
+        image, scale = generator.load_resized_image(i)
+        expected, expected_scale = pascal.load_resized_image(i)
+        assert image.shape == expected.shape
+        assert scale == expected_scale
+
+
+def test_shard_generator_pickle(shards):
+    generator = pickle.loads(pickle.dumps(ShardGenerator(shards[1], shuffle_groups=False)))
+    assert generator.load_image(2).shape == (200, 100, 3)
+
+
+def test_shard_generator_image_cache_key(shards):
+    generator = ShardGenerator(shards[1], shuffle_groups=False)
+    assert generator.image_cache_key(0) != generator.image_cache_key(1)
+    assert generator.image_cache_key(0)['image'].endswith('test-00000.shard:a')
+
+
+def test_shard_generator_requires_shards(tmp_path):
+    with pytest.raises(ValueError, match='no shard files'):
+        ShardGenerator(str(tmp_path / '*.shard'))
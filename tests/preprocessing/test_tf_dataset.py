@@ -0,0 +1,65 @@
+import numpy as np
+
+from keras_retinanet.preprocessing.tf_dataset import create_dataset
+from keras_retinanet.utils.transform import random_transform_generator
+from .test_generator import SimpleGenerator
+
+
+def create_generator(count=6, **kwargs):
+    # image i has a single box with x1 == i, to tell the batches apart
+    bboxes = [np.array([[i, 0, i + 1, 10]], dtype=float) for i in range(count)]
+    labels = [np.array([0], dtype=float) for _ in range(count)]
+    image  = np.zeros((20, 64, 3), dtype=np.uint8)
+    return SimpleGenerator(bboxes, labels, image=image, num_classes=1, no_resize=True, **kwargs)
+
+
+def batch_ids(dataset, count):
+    return [int(element[0][1][0, 0, 0]) for element in dataset.take(count).as_numpy_iterator()]
+
+
+def test_matches_generator():
+    generator = create_generator()
+    dataset   = create_dataset(generator, shuffle=False, repeat=False)
+
+    elements = list(dataset.as_numpy_iterator())
+    assert len(elements) == len(generator)
+    for index, (inputs, targets) in enumerate(elements):
+        expected_inputs, expected_targets = generator[index]
+        np.testing.assert_array_equal(inputs, expected_inputs)
+        assert len(targets) == len(expected_targets)
+        for target, expected in zip(targets, expected_targets):
+            np.testing.assert_array_equal(target, expected)
+            assert target.dtype == expected.dtype
+
+
+def test_targets_in_graph():
+    dataset = create_dataset(create_generator(targets_in_graph=True), shuffle=False)
+    assert batch_ids(dataset, 8) == [0, 1, 2, 3, 4, 5, 0, 1]
+
+
+def test_shuffle_is_deterministic():
+    first  = batch_ids(create_dataset(create_generator(targets_in_graph=True), shuffle=True, seed=1), 12)
+    second = batch_ids(create_dataset(create_generator(targets_in_graph=True), shuffle=True, seed=1), 12)
+
+    assert first == second
+    assert sorted(first[:6]) == sorted(first[6:]) == list(range(6))
+
+
+def test_shards():
+    dataset = create_dataset(create_generator(targets_in_graph=True), shuffle=False, repeat=False, num_shards=2, shard_index=1)
+    assert batch_ids(dataset, 6) == [1, 3, 5]
+
+
+def test_interleave():
+    dataset = create_dataset(create_generator(targets_in_graph=True), shuffle=False, repeat=False, interleave=2)
+    assert batch_ids(dataset, 6) == [0, 3, 1, 4, 2, 5]
+
+    dataset = create_dataset(create_generator(targets_in_graph=True), shuffle=True, seed=1, interleave=3)
+    ids     = batch_ids(dataset, 12)
+    assert sorted(ids[:6]) == list(range(6))
+
+
+def test_parallel_transforms():
+    generator = create_generator(count=32, transform_generator=random_transform_generator(min_translation=(-0.1, -0.1), max_translation=(0.1, 0.1)))
+    dataset   = create_dataset(generator, num_parallel_calls=8, shuffle=False, repeat=False)
+    assert len(list(dataset.as_numpy_iterator())) == 32
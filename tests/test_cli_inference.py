@@ -0,0 +1,54 @@
+import io
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import cli_inference
+
+
+class StubModel(object):
+    """ Detects a single box per image, at the pixel value of the image's top left corner.
+    """
+    def __init__(self):
+        self.batch_shapes = []
+
+    def predict_on_batch(self, batch):
+        self.batch_shapes.append(batch.shape)
+        values = batch[:, 0, 0, 0].astype(np.float32)
+        boxes  = np.repeat(values[:, np.newaxis, np.newaxis], 4, axis=2)
+        scores = np.full((len(batch), 1), 0.9, dtype=np.float32)
+        labels = np.zeros((len(batch), 1), dtype=np.int32)
+        return boxes, scores, labels
+
+
+def test_pad_batch():
+    images = [np.ones((2, 3, 3), dtype=np.uint8), np.full((4, 1, 3), 2, dtype=np.uint8)]
+    batch  = cli_inference.pad_batch(images, batch_size=3)
+
+    assert batch.shape == (3, 4, 3, 3)
+    assert batch.dtype == np.uint8
+    assert (batch[0, :2] == 1).all() and (batch[0, 2:] == 0).all()
+    assert (batch[1, :, :1] == 2).all() and (batch[1, :, 1:] == 0).all()
+    assert (batch[2] == 0).all()
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_predict_images(tmp_path, workers):
+    # five images of different sizes, image i has the value 10 * i
+    paths = []
+    for i in range(5):
+        paths.append(str(tmp_path / '{}.png'.format(i)))
+        cv2.imwrite(paths[-1], np.full((100, 100 + 20 * i, 3), 10 * i, dtype=np.uint8))
+
+    model  = StubModel()
+    output = io.StringIO()
+    cli_inference.predict_images(model, paths, output, {0: 'Pedestrian'}, batch_size=2, workers=workers,
+                                 min_side=50, max_side=100, preprocess_in_graph=True)
+
+    # the last batch is padded to the batch size, detections are written in input order and rescaled
+    assert [shape[0] for shape in model.batch_shapes] == [2, 2, 2]
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [line['image'] for line in lines] == paths
+    assert [line['detections'][0]['box'] for line in lines] == [[20 * i] * 4 for i in range(5)]
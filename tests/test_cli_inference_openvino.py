@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+import cli_inference_openvino
+
+
+def write_jpeg(path, width, height, orientation=1):
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    x, y = np.meshgrid(np.linspace(0, 255, width), np.linspace(0, 255, height))
+    Image.fromarray(np.stack([x, y, 255 - x], axis=-1).astype(np.uint8)).save(path, exif=exif)
+
+
+@pytest.mark.parametrize('orientation', [1, 3, 6, 8])
+def test_read_image_resized_matches_full_decode(tmp_path, orientation):
+    path = str(tmp_path / 'image.jpg')
+    write_jpeg(path, 3000, 1000, orientation)
+
+    expected, expected_scale = cli_inference_openvino.resize_image(cv2.imread(path), min_side=800, max_side=1333)
+    image, scale             = cli_inference_openvino.read_image_resized(path, min_side=800, max_side=1333)
+
+    assert image.shape == expected.shape
+    assert scale == pytest.approx(expected_scale)
+    assert np.abs(image.astype(np.float32) - expected.astype(np.float32)).mean() < 5
+
+
+class FakeRequest(object):
+    def __init__(self):
+        self.inputs  = None
+        self.outputs = None
+
+    def wait(self, timeout):
+        # the output is only available after waiting for the request
+        self.outputs, self.inputs = {'output': self.inputs['input_1'] * 10}, None
+
+
+class FakeExecutable(object):
+    def __init__(self, num_requests):
+        self.requests = [FakeRequest() for _ in range(num_requests)]
+        self.started  = []
+
+    def start_async(self, request_id, inputs):
+        assert self.requests[request_id].inputs is None, 'request {} is still in flight'.format(request_id)
+        self.requests[request_id].inputs = inputs
+        self.started.append(request_id)
+
+
+@pytest.mark.parametrize('count', [0, 2, 3, 7])
+def test_infer_async(count):
+    executable = FakeExecutable(3)
+    blobs      = (('image{}'.format(i), np.array([i])) for i in range(count))
+    results    = list(cli_inference_openvino.infer_async(executable, 'input_1', 'output', blobs, num_requests=3))
+
+    # requests are reused round robin, outputs are returned in input order
+    assert executable.started == [i % 3 for i in range(count)]
+    assert [key for key, _ in results] == ['image{}'.format(i) for i in range(count)]
+    assert [int(output[0]) for _, output in results] == [i * 10 for i in range(count)]
+
+
+def test_request_output():
+    class Blob(object):
+        buffer = np.array([1, 2])
+
+    class NewRequest(object):
+        output_blobs = {'output': Blob()}
+
+    class OldRequest(object):
+        outputs = {'output': np.array([1, 2])}
+
+    for request in [NewRequest(), OldRequest()]:
+        output = cli_inference_openvino.request_output(request, 'output')
+        np.testing.assert_array_equal(output, [1, 2])
+
+        # a copy, so the request can be reused
+        output[0] = 0
+        assert cli_inference_openvino.request_output(request, 'output')[0] == 1
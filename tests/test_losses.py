@@ -31,3 +31,37 @@ def test_smooth_l1():
     loss = keras.backend.eval(loss)
 
     assert loss == pytest.approx((((1 - 0.5 / 9) * 2 + (0.5 * 9 * 0.05 ** 2)) / 3))
+
+
+def test_sparse_targets():
+    prng           = np.random.RandomState(0)
+    regression     = prng.uniform(-1, 1, size=(2, 6, 4)).astype(keras.backend.floatx())
+    classification = prng.uniform(0.01, 0.99, size=(2, 6, 3)).astype(keras.backend.floatx())
+
+    # anchor 0 positive for class 2, anchor 3 ignored, padded with an anchor index of -1
+    sparse_regression = np.array([
+        [[0, 0.1, 0.2, 0.3, 0.4], [-1, -1, -1, -1, -1]],
+        [[4, 0.5, 0.6, 0.7, 0.8], [5, 0.1, 0.1, 0.1, 0.1]],
+    ], dtype=keras.backend.floatx())
+    sparse_labels = np.array([
+        [[0, 2], [3, -1], [-1, -1]],
+        [[4, 0], [5, 1], [-1, -1]],
+    ], dtype=keras.backend.floatx())
+
+    regression_target = np.zeros((2, 6, 5), dtype=keras.backend.floatx())
+    regression_target[0, 0] = [0.1, 0.2, 0.3, 0.4, 1]
+    regression_target[1, 4] = [0.5, 0.6, 0.7, 0.8, 1]
+    regression_target[1, 5] = [0.1, 0.1, 0.1, 0.1, 1]
+    labels_target = np.zeros((2, 6, 4), dtype=keras.backend.floatx())
+    labels_target[0, 0] = [0, 0, 1, 1]
+    labels_target[0, 3] = [0, 0, 0, -1]
+    labels_target[1, 4] = [1, 0, 0, 1]
+    labels_target[1, 5] = [0, 1, 0, 1]
+
+    expected = keras.backend.eval(keras_retinanet.losses.smooth_l1()(regression_target, regression))
+    actual   = keras.backend.eval(keras_retinanet.losses.smooth_l1(sparse_targets=True)(sparse_regression, regression))
+    assert actual == pytest.approx(expected)
+
+    expected = keras.backend.eval(keras_retinanet.losses.focal()(labels_target, classification))
+    actual   = keras.backend.eval(keras_retinanet.losses.focal(sparse_targets=True)(sparse_labels, classification))
+    assert actual == pytest.approx(expected)
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class StubGenerator(object):
+    """ Stands in for a generator in the evaluation tests, every pixel of an image holds the image index.
+
+    Args
+        num_images  : The number of images.
+        num_classes : The number of classes, all classes have labels.
+        shape       : A function of the image index returning the shape of the resized image.
+        scale       : The resize scale, images are loaded at shape / scale.
+        annotations : A function of the image index returning its annotations (defaults to a single box of label 0).
+    """
+    preprocess_in_graph = False
+
+    def __init__(self, num_images=3, num_classes=2, shape=lambda image_index: (20, 30, 3), scale=0.5, annotations=None):
+        self.num_images  = num_images
+        self.classes     = num_classes
+        self.shape       = shape
+        self.scale       = scale
+        self.annotations = annotations
+        self.loaded      = []
+
+    def size(self):
+        return self.num_images
+
+    def num_classes(self):
+        return self.classes
+
+    def has_label(self, label):
+        return True
+
+    def image_aspect_ratio(self, image_index):
+        rows, cols, _ = self.shape(image_index)
+        return cols / rows
+
+    def load_image(self, image_index):
+        self.loaded.append(image_index)
+        rows, cols, channels = self.shape(image_index)
+        return np.full((int(rows / self.scale), int(cols / self.scale), channels), image_index, dtype=np.uint8)
+
+    def resize_image(self, image):
+        image_index = image[0, 0, 0]
+        return np.full(self.shape(image_index), image_index, dtype=np.uint8), self.scale
+
+    def load_resized_image(self, image_index):
+        return self.resize_image(self.load_image(image_index))
+
+    def preprocess_image(self, image):
+        return image.astype(np.float32)
+
+    def load_annotations(self, image_index):
+        if self.annotations is not None:
+            return self.annotations(image_index)
+        return {'bboxes': np.array([[0, 0, 5, 5]], dtype=np.float64), 'labels': np.array([0])}
+
+
+class StubModel(object):
+    """ Stands in for a prediction model, reports the detections of detect for every image of a batch.
+
+    Args
+        detect         : A function of an image returning its boxes (N, 4), scores (N,) and labels (N,).
+        max_detections : The number of detections per image, detections are padded with -1 like filter_detections does.
+    """
+    def __init__(self, detect, max_detections=3):
+        self.detect         = detect
+        self.max_detections = max_detections
+        self.batch_sizes    = []
+
+    def predict_on_batch(self, batch):
+        self.batch_sizes.append(batch.shape[0])
+        boxes  = -np.ones((batch.shape[0], self.max_detections, 4), dtype=np.float32)
+        scores = -np.ones((batch.shape[0], self.max_detections), dtype=np.float32)
+        labels = -np.ones((batch.shape[0], self.max_detections), dtype=np.int32)
+        for index, image in enumerate(batch):
+            image_boxes, image_scores, image_labels = self.detect(image)
+            count = len(image_scores)
+            boxes[index, :count]  = image_boxes
+            scores[index, :count] = image_scores
+            labels[index, :count] = image_labels
+        return boxes, scores, labels
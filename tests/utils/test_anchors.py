@@ -1,8 +1,22 @@
 import numpy as np
 import configparser
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 from tensorflow import keras
 
-from keras_retinanet.utils.anchors import anchors_for_shape, AnchorParameters
+import keras_retinanet.backend
+from keras_retinanet.utils.anchors import (
+    anchors_for_shape,
+    anchor_grid_for_shape,
+    anchor_targets_bbox,
+    anchor_targets_bbox_sparse,
+    compute_gt_annotations,
+    compute_gt_annotations_sparse,
+    compute_overlap_sparse,
+    AnchorCache,
+    AnchorParameters,
+)
+from keras_retinanet.utils.compute_overlap import compute_overlap
 from keras_retinanet.utils.config import read_config_file, parse_anchor_parameters
 
 
@@ -167,3 +181,136 @@ def test_anchors_for_shape_values():
         strides[0] * 3 / 2 + (sizes[0] * scales[1] / np.sqrt(ratios[1])) / 2,
         strides[0] * 3 / 2 + (sizes[0] * scales[1] * np.sqrt(ratios[1])) / 2,
     ], decimal=6)
+
+
+def test_anchor_cache():
+    cache   = AnchorCache()
+    anchors = cache.anchors_for_shape((64, 96, 3), pyramid_levels=[3, 4])
+
+    assert anchors.dtype == np.float32
+    np.testing.assert_array_equal(anchors, anchors_for_shape((64, 96, 3), pyramid_levels=[3, 4], dtype=np.float32))
+    assert cache.anchors_for_shape((64, 96, 3), pyramid_levels=[3, 4]) is anchors
+    assert not anchors.flags.writeable
+
+    # different pyramid levels are cached separately
+    assert cache.anchors_for_shape((64, 96, 3), pyramid_levels=[3]).shape[0] < anchors.shape[0]
+    assert len(cache) == 2
+
+
+def test_anchor_cache_eviction():
+    first  = anchors_for_shape((64, 64, 3), dtype=np.float32)
+    cache  = AnchorCache(max_bytes=int(first.nbytes * 2.5))
+
+    cache.anchors_for_shape((64, 64, 3))
+    cache.anchors_for_shape((64, 72, 3))
+    cache.anchors_for_shape((64, 64, 3))  # mark the first shape as recently used
+    cache.anchors_for_shape((72, 64, 3))
+
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_bytes
+    assert cache._key((64, 64, 3), None, None, None) in cache.anchors
+    assert cache._key((64, 72, 3), None, None, None) not in cache.anchors
+
+
+def test_anchor_cache_threads():
+    cache  = AnchorCache(max_bytes=anchors_for_shape((64, 64, 3), dtype=np.float32).nbytes * 3)
+    shapes = [(64, 64 + 8 * (i % 5), 3) for i in range(200)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(cache.anchors_for_shape, shapes))
+
+    for shape, anchors in zip(shapes, results):
+        np.testing.assert_array_equal(anchors, anchors_for_shape(shape, dtype=np.float32))
+    assert cache.nbytes == sum(anchors.nbytes for anchors in cache.anchors.values())
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_anchor_cache_pickle():
+    cache = AnchorCache(max_bytes=1024 ** 2)
+    cache.anchors_for_shape((64, 64, 3))
+
+    # the lock can not be pickled, the anchors are computed again
+    unpickled = pickle.loads(pickle.dumps(cache))
+    assert unpickled.max_bytes == cache.max_bytes and len(unpickled) == 0
+    np.testing.assert_array_equal(unpickled.anchors_for_shape((64, 64, 3)), cache.anchors_for_shape((64, 64, 3)))
+
+
+def _random_boxes(count, width, height, seed=0):
+    prng = np.random.RandomState(seed)
+    x1 = prng.uniform(-20, width, count)
+    y1 = prng.uniform(-20, height, count)
+    w  = prng.uniform(2, 300, count)
+    h  = prng.uniform(2, 300, count)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+
+
+def test_compute_overlap_sparse():
+    image_shape   = (300, 400, 3)
+    anchor_params = AnchorParameters(
+        sizes   = [16, 32, 64, 128],
+        strides = [4, 8, 16, 32],
+        ratios  = np.array([0.5, 1, 2], keras.backend.floatx()),
+        scales  = np.array([1, 1.5], keras.backend.floatx()),
+    )
+    pyramid_levels = [2, 3, 4, 5]
+    anchors = anchors_for_shape(image_shape, pyramid_levels=pyramid_levels, anchor_params=anchor_params)
+    grid    = anchor_grid_for_shape(image_shape, pyramid_levels=pyramid_levels, anchor_params=anchor_params)
+    boxes   = _random_boxes(20, 400, 300)
+
+    expected = compute_overlap(anchors.astype(np.float64), boxes)
+    anchor_indices, box_indices, overlaps = compute_overlap_sparse(anchors, grid, boxes)
+
+    actual = np.zeros_like(expected)
+    actual[anchor_indices, box_indices] = overlaps
+    np.testing.assert_array_equal(actual, expected)
+    assert len(overlaps) == np.count_nonzero(expected)
+
+
+def test_compute_gt_annotations_float32_anchors():
+    image_shape = (256, 320, 3)
+    boxes       = _random_boxes(10, 320, 256, seed=1)
+
+    # the anchors of the generators are float32, the assignment matches the float64 one
+    expected = compute_gt_annotations(anchors_for_shape(image_shape), boxes)
+    actual   = compute_gt_annotations(AnchorCache().anchors_for_shape(image_shape), boxes)
+    for a, e in zip(actual, expected):
+        np.testing.assert_array_equal(a, e)
+
+def test_compute_gt_annotations_sparse():
+    image_shape = (256, 320, 3)
+    anchors = anchors_for_shape(image_shape)
+    grid    = anchor_grid_for_shape(image_shape)
+
+    # identical boxes test the tie break
+    boxes = _random_boxes(10, 320, 256, seed=1)
+    boxes = np.concatenate([boxes, boxes[:3]], axis=0)
+
+    for expected, actual in zip(compute_gt_annotations(anchors, boxes), compute_gt_annotations_sparse(anchors, grid, boxes)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_anchor_targets_bbox_sparse():
+    # the second image is smaller than the batch, so part of its anchors is outside of the image
+    image_group       = [np.zeros((256, 320, 3)), np.zeros((200, 240, 3))]
+    annotations_group = [
+        {'bboxes': _random_boxes(6, 320, 256, seed=1), 'labels': np.array([0, 1, 2, 0, 1, 2])},
+        {'bboxes': np.zeros((0, 4)), 'labels': np.zeros((0,))},
+    ]
+    anchors = anchors_for_shape((256, 320, 3))
+
+    regression, labels               = anchor_targets_bbox(anchors, image_group, annotations_group, num_classes=3)
+    sparse_regression, sparse_labels = anchor_targets_bbox_sparse(anchors, image_group, annotations_group, num_classes=3)
+    assert sparse_regression.shape[0] == sparse_labels.shape[0] == 2
+    assert sparse_labels.shape[1] < anchors.shape[0]
+
+    dense_regression = keras.backend.eval(keras_retinanet.backend.densify_regression_targets(sparse_regression, anchors.shape[0]))
+    dense_labels     = keras.backend.eval(keras_retinanet.backend.densify_classification_targets(sparse_labels, anchors.shape[0], 3))
+
+    # anchor states are equal, the classes and regression targets only matter where they are used by the losses
+    np.testing.assert_array_equal(dense_labels[..., -1], labels[..., -1])
+    np.testing.assert_array_equal(dense_regression[..., -1], regression[..., -1] == 1)
+
+    used = labels[..., -1] != -1
+    np.testing.assert_array_equal(dense_labels[used], labels[used])
+
+    positive = regression[..., -1] == 1
+    np.testing.assert_allclose(dense_regression[positive][:, :4], regression[positive][:, :4], rtol=1e-6)
@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+import pytest
+
+from keras_retinanet.utils.benchmark import STAGES, benchmark, save_benchmark
+from .stubs import StubGenerator, StubModel
+
+
+@pytest.mark.parametrize('full_decode', [False, True])
+def test_benchmark(tmp_path, full_decode):
+    generator = StubGenerator(num_classes=1, shape=lambda image_index: (40, 60, 3), scale=2.0)
+    model     = StubModel(lambda image: ([[0, 0, 10, 10]], [0.9], [0]), max_detections=2)
+    results   = benchmark(generator, model, num_images=4, warmup=2, full_decode=full_decode)
+
+    # warm-up images are run but not measured, images are cycled
+    assert generator.loaded == [0, 1, 2, 0, 1, 2]
+    assert results['num_images'] == 4
+    assert set(results['stages']) == set(STAGES)
+    assert results['images_per_second'] > 0
+    for summary in list(results['stages'].values()) + [results['total']]:
+        assert 0 <= summary['p50_ms'] <= summary['p90_ms'] <= summary['p99_ms'] <= summary['max_ms']
+
+    # with the reduced decode used by the evaluation, the resize is part of the decode
+    assert (results['stages']['resize']['max_ms'] == 0) != full_decode
+
+    path = str(tmp_path / 'benchmark.json')
+    save_benchmark(results, path)
+    with open(path) as f:
+        assert json.load(f)['total'] == results['total']
@@ -0,0 +1,53 @@
+import numpy as np
+
+from keras_retinanet.utils.compute_overlap import compute_overlap
+
+
+def reference_overlap(boxes, query_boxes):
+    iw = np.minimum(boxes[:, None, 2], query_boxes[None, :, 2]) - np.maximum(boxes[:, None, 0], query_boxes[None, :, 0])
+    ih = np.minimum(boxes[:, None, 3], query_boxes[None, :, 3]) - np.maximum(boxes[:, None, 1], query_boxes[None, :, 1])
+    intersection = np.maximum(iw, 0) * np.maximum(ih, 0)
+    box_areas    = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    query_areas  = (query_boxes[:, 2] - query_boxes[:, 0]) * (query_boxes[:, 3] - query_boxes[:, 1])
+    return intersection / (box_areas[:, None] + query_areas[None, :] - intersection)
+
+
+def random_boxes(count, seed):
+    random = np.random.RandomState(seed)
+    xy     = random.uniform(0, 500, size=(count, 2))
+    wh     = random.uniform(1, 200, size=(count, 2))
+    return np.concatenate([xy, xy + wh], axis=1)
+
+
+def test_compute_overlap_float64():
+    boxes       = random_boxes(1000, seed=0)
+    query_boxes = random_boxes(20, seed=1)
+
+    overlaps = compute_overlap(boxes, query_boxes)
+    assert overlaps.dtype == np.float64
+    np.testing.assert_allclose(overlaps, reference_overlap(boxes, query_boxes), rtol=1e-12)
+
+
+def test_compute_overlap_float32():
+    boxes       = random_boxes(1000, seed=0)
+    query_boxes = random_boxes(20, seed=1)
+
+    overlaps = compute_overlap(boxes.astype(np.float32), query_boxes.astype(np.float32))
+    assert overlaps.dtype == np.float32
+    np.testing.assert_allclose(overlaps, reference_overlap(boxes, query_boxes), atol=1e-5)
+
+
+def test_compute_overlap_mixed_inputs():
+    # mixed dtypes, extra label columns and read only inputs are accepted without copies by the caller
+    boxes       = random_boxes(100, seed=0).astype(np.float32)
+    boxes.flags.writeable = False
+    annotations = np.concatenate([random_boxes(5, seed=1), np.zeros((5, 1))], axis=1)
+
+    overlaps = compute_overlap(boxes, annotations)
+    assert overlaps.dtype == np.float64
+    np.testing.assert_allclose(overlaps, reference_overlap(boxes.astype(np.float64), annotations), rtol=1e-6)
+
+
+def test_compute_overlap_empty():
+    assert compute_overlap(np.zeros((0, 4)), random_boxes(3, seed=0)).shape == (0, 3)
+    assert compute_overlap(random_boxes(3, seed=0), np.zeros((0, 4))).shape == (3, 0)
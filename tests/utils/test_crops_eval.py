@@ -0,0 +1,59 @@
+import numpy as np
+
+from keras_retinanet.preprocessing.pascal_voc_grid_crops import CropReference
+from keras_retinanet.utils.crops_eval import _get_detections, _split_batches
+from .stubs import StubGenerator, StubModel
+
+
+class StubCropsGenerator(StubGenerator):
+    """ Two images cut into crops, every pixel of a crop holds the crop number.
+    """
+    group_by_image = True
+
+    def __init__(self):
+        super(StubCropsGenerator, self).__init__(num_images=2)
+        self.groups = [
+            [CropReference(0, c) for c in range(5)],
+            [CropReference(1, c) for c in range(3)],
+        ]
+
+    def load_crop(self, crop_reference):
+        # the last crop of the second image is cut by the image border
+        shape = (10, 20, 3) if crop_reference.image_index == 1 and crop_reference.crop_number == 2 else (20, 20, 3)
+        return np.full(shape, crop_reference.crop_number, dtype=np.uint8)
+
+    def get_crop_transformations(self, crop_reference):
+        return 100 * crop_reference.crop_number, 10, 0.5
+
+
+def crop_detections(crop):
+    """ One box per crop, labeled by the parity of the crop number.
+    """
+    crop_number = crop[0, 0, 0]
+    return [[1, 2, 3, 4]], [0.5 + crop_number / 10], [crop_number % 2]
+
+
+def test_split_batches():
+    images  = [np.zeros((2, 2)), np.zeros((2, 2)), np.zeros((2, 2)), np.zeros((1, 2)), np.zeros((2, 2))]
+    batches = [batch.tolist() for batch in _split_batches(images)]
+    assert batches == [[0, 1, 2], [3], [4]]
+
+    batches = [batch.tolist() for batch in _split_batches(images, batch_size=2)]
+    assert batches == [[0, 1], [2], [3], [4]]
+
+
+def test_get_detections_batched_crops():
+    model = StubModel(crop_detections, max_detections=2)
+    all_detections, all_inferences = _get_detections(StubCropsGenerator(), model, batch_size=4)
+
+    assert model.batch_sizes == [4, 1, 2, 1]
+    assert len(all_inferences) == 2
+
+    # boxes are shifted by the crop offset and scaled back to the original image
+    for image_index, crops in enumerate([range(5), range(3)]):
+        for label in range(2):
+            expected = [
+                [(1 + 100 * c) / 0.5, (2 + 10) / 0.5, (3 + 100 * c) / 0.5, (4 + 10) / 0.5, 0.5 + c / 10]
+                for c in crops if c % 2 == label
+            ]
+            np.testing.assert_allclose(all_detections[image_index][label], np.array(expected).reshape(-1, 5), rtol=1e-6)
@@ -0,0 +1,65 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from keras_retinanet.utils.detection_cache import DetectionCache
+from keras_retinanet.utils.eval import _get_detections
+from .stubs import StubGenerator, StubModel
+
+
+def image_detections(image):
+    """ One box per image, and a low scoring box.
+    """
+    return [[image[0, 0, 0], 0, 10, 10], [0, 0, 5, 5]], [0.9, 0.1], [1, 0]
+
+
+def test_detection_cache_resumes(tmp_path):
+    cache = DetectionCache(str(tmp_path), model='abc', image_min_side=800)
+    cache.add(0, np.zeros((1, 4)), np.ones((1,)), np.zeros((1,)), 0.1)
+    cache.add(1, np.ones((2, 4)), np.ones((2,)), np.ones((2,)), 0.2)
+
+    # simulate an interrupted write of the last record
+    with open(cache.path, 'r+b') as f:
+        f.truncate(f.seek(0, 2) - 5)
+
+    cache = DetectionCache(str(tmp_path), model='abc', image_min_side=800)
+    assert len(cache) == 1 and 0 in cache and 1 not in cache
+    cache.add(1, np.ones((2, 4)), np.ones((2,)), np.ones((2,)), 0.2)
+
+    cache = DetectionCache(str(tmp_path), model='abc', image_min_side=800)
+    assert len(cache) == 2
+    np.testing.assert_array_equal(cache.get(1)[0], np.ones((2, 4)))
+
+    # a different key uses a different file
+    assert len(DetectionCache(str(tmp_path), model='abc', image_min_side=600)) == 0
+
+
+def test_get_detections_from_cache(tmp_path):
+    model = StubModel(image_detections)
+    cache = DetectionCache(str(tmp_path), model='stub')
+    expected, _ = _get_detections(StubGenerator(), model, detection_cache=cache)
+    assert len(model.batch_sizes) == 3
+
+    # padded detections are not stored
+    assert cache.get(2)[0].shape == (2, 4)
+
+    # rescoring from the cache doesn't need the model
+    cache = DetectionCache(str(tmp_path), model='stub')
+    actual, _ = _get_detections(StubGenerator(), None, detection_cache=cache)
+    for expected_image, actual_image in zip(expected, actual):
+        for expected_label, actual_label in zip(expected_image, actual_image):
+            np.testing.assert_array_equal(actual_label, expected_label)
+
+    actual, _ = _get_detections(StubGenerator(), None, score_threshold=0.5, detection_cache=cache)
+    assert actual[2][0].shape == (0, 5)
+    np.testing.assert_array_almost_equal(actual[2][1], [[4, 0, 20, 20, 0.9]])
+
+
+def test_detection_cache_key_mismatch(tmp_path):
+    cache = DetectionCache(str(tmp_path), model='abc')
+    with open(cache.path, 'wb') as f:
+        pickle.dump({'model': 'other'}, f)
+
+    with pytest.raises(ValueError):
+        DetectionCache(str(tmp_path), model='abc')
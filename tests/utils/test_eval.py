@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+
+from keras_retinanet.utils.compute_overlap import compute_overlap
+from keras_retinanet.utils.eval import _compute_ap, _compute_average_precisions, _get_detections, _match_detections
+from .stubs import StubGenerator, StubModel
+
+
+def reference_average_precision(all_detections, all_annotations, label, iou_threshold, ignore_duplicates):
+    """ The per detection matching as it was done before vectorizing it.
+    """
+    false_positives = np.zeros((0,))
+    true_positives  = np.zeros((0,))
+    scores          = np.zeros((0,))
+    num_annotations = 0.0
+
+    for detections, annotations in zip(all_detections, all_annotations):
+        detections           = detections[label]
+        annotations          = annotations[label]
+        num_annotations     += annotations.shape[0]
+        detected_annotations = []
+
+        for d in detections:
+            scores = np.append(scores, d[4])
+
+            if annotations.shape[0] == 0:
+                false_positives = np.append(false_positives, 1)
+                true_positives  = np.append(true_positives, 0)
+                continue
+
+            overlaps            = compute_overlap(np.expand_dims(d, axis=0), annotations)
+            assigned_annotation = np.argmax(overlaps, axis=1)
+            max_overlap         = overlaps[0, assigned_annotation]
+
+            if max_overlap >= iou_threshold and assigned_annotation not in detected_annotations:
+                false_positives = np.append(false_positives, 0)
+                true_positives  = np.append(true_positives, 1)
+                detected_annotations.append(assigned_annotation)
+            elif max_overlap >= iou_threshold and ignore_duplicates:
+                false_positives = np.append(false_positives, 0)
+                true_positives  = np.append(true_positives, 0)
+            else:
+                false_positives = np.append(false_positives, 1)
+                true_positives  = np.append(true_positives, 0)
+
+    indices         = np.argsort(-scores)
+    false_positives = np.cumsum(false_positives[indices])
+    true_positives  = np.cumsum(true_positives[indices])
+
+    recall    = true_positives / num_annotations
+    precision = true_positives / np.maximum(true_positives + false_positives, np.finfo(np.float64).eps)
+    return _compute_ap(recall, precision), num_annotations
+
+
+def random_dataset(num_images, num_classes, seed=0):
+    prng = np.random.RandomState(seed)
+    all_detections, all_annotations = [], []
+    for _ in range(num_images):
+        detections, annotations = [], []
+        for _ in range(num_classes):
+            xy    = prng.uniform(0, 200, size=(prng.randint(0, 6), 2))
+            boxes = np.concatenate([xy, xy + prng.uniform(20, 60, size=xy.shape)], axis=1)
+            annotations.append(boxes)
+
+            # jittered copies of the annotations (some duplicated) and random boxes
+            matches    = np.repeat(boxes, prng.randint(0, 3, size=len(boxes)), axis=0)
+            matches    = matches + prng.normal(0, 5, size=matches.shape)
+            xy         = prng.uniform(0, 200, size=(prng.randint(0, 4), 2))
+            candidates = np.concatenate([matches, np.concatenate([xy, xy + 40], axis=1)])
+            scores     = prng.uniform(0, 1, size=(len(candidates), 1))
+            candidates = np.concatenate([candidates, scores], axis=1)
+            detections.append(candidates[np.argsort(-candidates[:, 4])])
+        all_detections.append(detections)
+        all_annotations.append(annotations)
+    return all_detections, all_annotations
+
+
+@pytest.mark.parametrize('ignore_duplicates', [False, True])
+def test_compute_average_precisions(ignore_duplicates):
+    all_detections, all_annotations = random_dataset(50, 2)
+
+    average_precisions = _compute_average_precisions(all_detections, all_annotations, [0, 1], iou_threshold=0.5, ignore_duplicates=ignore_duplicates)
+    for label in [0, 1]:
+        expected = reference_average_precision(all_detections, all_annotations, label, 0.5, ignore_duplicates)
+        assert average_precisions[label][0] == pytest.approx(expected[0])
+        assert average_precisions[label][1] == expected[1]
+
+
+def test_match_detections_orders_by_score():
+    annotations = np.array([[0, 0, 10, 10]], dtype=float)
+    detections  = np.array([
+        [0, 0, 9, 9, 0.5],
+        [0, 0, 10, 10, 0.9],
+        [50, 50, 60, 60, 0.7],
+    ])
+
+    true_positives, false_positives = _match_detections(detections, annotations)
+    np.testing.assert_array_equal(true_positives, [False, True, False])
+    np.testing.assert_array_equal(false_positives, [True, False, True])
+
+    true_positives, false_positives = _match_detections(detections, annotations, ignore_duplicates=True)
+    np.testing.assert_array_equal(true_positives, [False, True, False])
+    np.testing.assert_array_equal(false_positives, [False, False, True])
+
+
+def test_match_detections_thresholds():
+    annotations = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+    detections  = np.array([
+        [0, 0, 10, 12, 0.5],
+        [0, 0, 10, 10, 0.9],
+        [20, 20, 30, 36, 0.7],
+        [50, 50, 60, 60, 0.8],
+    ])
+
+    # an array of thresholds matches like a call per threshold
+    true_positives, false_positives, assigned = _match_detections(detections, annotations, [0.5, 0.75], return_assigned=True)
+    for t, iou_threshold in enumerate([0.5, 0.75]):
+        expected = _match_detections(detections, annotations, iou_threshold, return_assigned=True)
+        np.testing.assert_array_equal(true_positives[t], expected[0])
+        np.testing.assert_array_equal(false_positives[t], expected[1])
+        np.testing.assert_array_equal(assigned[t], expected[2])
+
+    np.testing.assert_array_equal(assigned, [[0, 0, 1, -1], [0, 0, -1, -1]])
+
+
+def test_compute_ap():
+    # precision envelope: the precision at recall 0.5 is raised to 1
+    assert _compute_ap(np.array([0.5, 0.5, 1.0]), np.array([1.0, 0.5, 2.0 / 3.0])) == pytest.approx(0.5 + 0.5 * 2.0 / 3.0)
+
+
+def image_detections(image):
+    """ A box and score depending on the image index, and a low scoring box.
+    """
+    index = image[0, 0, 0]
+    return [[index, 0, 10, 10], [0, 0, 5, 5]], [index / 10, 0.01], [index % 2, 0]
+
+
+def generator_shape(image_index):
+    """ Images of two different shapes.
+    """
+    return (20, 30, 3) if image_index % 3 else (30, 20, 3)
+
+
+def test_get_detections_batched():
+    model = StubModel(image_detections)
+    expected, _ = _get_detections(StubGenerator(7, shape=generator_shape), model)
+    assert model.batch_sizes == [1] * 7
+
+    model = StubModel(image_detections)
+    actual, inferences = _get_detections(StubGenerator(7, shape=generator_shape), model, batch_size=3, workers=2)
+    assert sorted(model.batch_sizes) == [1, 3, 3]
+    assert all(inference is not None for inference in inferences)
+
+    for expected_image, actual_image in zip(expected, actual):
+        for expected_label, actual_label in zip(expected_image, actual_image):
+            np.testing.assert_array_equal(actual_label, expected_label)
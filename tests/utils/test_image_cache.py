@@ -0,0 +1,71 @@
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from keras_retinanet.utils.image_cache import ImageCache
+
+
+def test_get_put(tmp_path):
+    cache = ImageCache(str(tmp_path), 1024 ** 2)
+    image = np.random.randint(0, 255, (20, 30, 3), dtype=np.uint8)
+
+    assert cache.get({'image': 'a.jpg', 'mtime': 1}) is None
+    cache.put({'image': 'a.jpg', 'mtime': 1}, image, 0.5)
+
+    cached, scale = cache.get({'image': 'a.jpg', 'mtime': 1})
+    assert isinstance(cached, np.memmap)
+    assert not cached.flags.writeable
+    np.testing.assert_array_equal(cached, image)
+    assert scale == 0.5
+
+    # a different key, for example a changed file, is not found
+    assert cache.get({'image': 'a.jpg', 'mtime': 2}) is None
+
+    # the cache is shared with other instances
+    assert ImageCache(str(tmp_path), 1024 ** 2).get({'image': 'a.jpg', 'mtime': 1}) is not None
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    cache = ImageCache(str(tmp_path), 3.5 * image.nbytes)
+
+    for i, name in enumerate('abc'):
+        cache.put({'image': name}, image, 1)
+        os.utime(cache._path({'image': name}), (i, i))
+
+    # reading a marks it as recently used, so b is evicted
+    assert cache.get({'image': 'a'}) is not None
+    cache.put({'image': 'd'}, image, 1)
+
+    assert [cache.get({'image': name}) is not None for name in 'abcd'] == [True, False, True, True]
+    assert cache.total_bytes <= cache.max_bytes
+
+
+def test_image_larger_than_cache(tmp_path):
+    cache = ImageCache(str(tmp_path), 100)
+    cache.put({'image': 'a'}, np.zeros((10, 10, 3), dtype=np.uint8), 1)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_put_from_threads(tmp_path):
+    # batches wrap around, so the same image can be written by several threads at once
+    cache  = ImageCache(str(tmp_path), 1024 ** 2)
+    image  = np.zeros((50, 50, 3), dtype=np.uint8)
+    keys   = [{'image': str(i % 4)} for i in range(64)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda key: cache.put(key, image, 1), keys))
+
+    assert sorted(os.listdir(str(tmp_path))) == sorted(os.path.basename(cache._path({'image': str(i)})) for i in range(4))
+    assert cache.writes == 64
+    assert all(cache.get({'image': str(i)}) is not None for i in range(4))
+
+
+def test_pickle(tmp_path):
+    cache = ImageCache(str(tmp_path), 1024 ** 2)
+    cache.put({'image': 'a'}, np.zeros((10, 10, 3), dtype=np.uint8), 1)
+
+    unpickled = pickle.loads(pickle.dumps(cache))
+    assert unpickled.total_bytes == cache.total_bytes
+    assert unpickled.get({'image': 'a'}) is not None
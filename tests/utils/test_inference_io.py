@@ -0,0 +1,28 @@
+import json
+
+import numpy as np
+
+from keras_retinanet.utils.inference_io import detections_to_json, list_images
+
+
+def test_list_images(tmp_path):
+    for name in ['b.JPG', 'a.png', 'c.txt', 'd.jpeg']:
+        open(str(tmp_path / name), 'w').close()
+
+    # a directory or a glob pattern, only images in sorted order
+    assert list_images(str(tmp_path)) == [str(tmp_path / name) for name in ['a.png', 'b.JPG', 'd.jpeg']]
+    assert list_images(str(tmp_path / '*.*g')) == [str(tmp_path / name) for name in ['a.png', 'd.jpeg']]
+    assert list_images(str(tmp_path / 'missing' / '*')) == []
+
+
+def test_detections_to_json():
+    boxes  = np.array([[1.6, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]], dtype=np.float32)
+    scores = np.array([0.9, 0.6, 0.4], dtype=np.float32)
+    labels = np.array([0, 1, 0])
+
+    # detections below the threshold are left out, labels without a name are numbers
+    line = json.loads(detections_to_json('a.jpg', boxes, scores, labels, {0: 'Pedestrian'}, score_threshold=0.5))
+    assert line == {'image': 'a.jpg', 'detections': [
+        {'label': 'Pedestrian', 'score': float(scores[0]), 'box': [1, 2, 3, 4]},
+        {'label': '1', 'score': float(scores[1]), 'box': [5, 6, 7, 8]},
+    ]}
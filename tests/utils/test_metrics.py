@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+from keras_retinanet.utils.eval import _compute_average_precisions
+from keras_retinanet.utils.metrics import compute_metrics, save_metrics
+
+from .test_eval import random_dataset
+
+
+@pytest.mark.parametrize('ignore_duplicates', [False, True])
+def test_compute_metrics_matches_single_threshold(ignore_duplicates):
+    all_detections, all_annotations = random_dataset(50, 2)
+    metrics = compute_metrics(all_detections, all_annotations, [0, 1], ignore_duplicates=ignore_duplicates)
+
+    assert metrics['iou_thresholds'] == pytest.approx([0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95])
+    for iou_threshold in [0.5, 0.75]:
+        average_precisions = _compute_average_precisions(all_detections, all_annotations, [0, 1], iou_threshold=iou_threshold,
+                                                         ignore_duplicates=ignore_duplicates)
+        for label in [0, 1]:
+            result = metrics['classes'][str(label)]
+            assert result['ap']['all']['{:.2f}'.format(iou_threshold)] == pytest.approx(average_precisions[label][0])
+            assert result['num_annotations']['all'] == average_precisions[label][1]
+
+    # stricter thresholds never improve AP
+    aps = list(metrics['classes']['0']['ap']['all'].values())
+    assert all(a >= b - 1e-12 for a, b in zip(aps, aps[1:]))
+
+
+def test_compute_metrics_size_buckets():
+    # a small object found exactly, a large object missed, a large false positive
+    annotations = [[np.array([[0, 0, 10, 10], [100, 100, 300, 300]], dtype=np.float64)]]
+    detections  = [[np.array([[0, 0, 10, 10, 0.9], [400, 400, 500, 500, 0.8]], dtype=np.float64)]]
+    metrics     = compute_metrics(detections, annotations, [0], label_to_name=lambda label: 'human')
+
+    result = metrics['classes']['human']
+    assert result['num_annotations'] == {'all': 2, 'small': 1, 'medium': 0, 'large': 1}
+    assert result['ap']['small']['0.50'] == pytest.approx(1.0)
+    assert result['ap']['large']['0.50'] == pytest.approx(0.0)
+    assert result['ap']['all']['0.50'] == pytest.approx(0.5)
+    assert metrics['summary']['mAP']['small']['0.95'] == pytest.approx(1.0)
+
+    # recall 0.5 is reached with precision 1 at the score of the first detection
+    assert result['recall_at_precision']['0.50']['0.90'] == {'recall': 0.5, 'score': 0.9}
+    curve = result['pr_curve']['0.50']
+    assert curve['precision'][0] == pytest.approx(1.0)
+    assert curve['precision'][-1] == 0.0
+    assert curve['score'][-1] is None
+
+
+def test_save_metrics(tmp_path):
+    all_detections, all_annotations = random_dataset(5, 1)
+    path = str(tmp_path / 'metrics.json')
+    save_metrics(compute_metrics(all_detections, all_annotations, [0]), path)
+
+    with open(path) as f:
+        metrics = json.load(f)
+    assert set(metrics['summary']['mAP_50_95']) == {'all', 'small', 'medium', 'large'}
+    assert metrics['area_ranges']['large'][1] is None
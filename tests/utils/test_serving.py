@@ -0,0 +1,118 @@
+import json
+import threading
+import urllib.error
+
+import cv2
+import numpy as np
+import pytest
+
+from keras_retinanet.utils.serving import InferenceClient, InferenceService, MicroBatcher, make_server
+
+
+class StubModel(object):
+    """ Stands in for a prediction model, reports one box covering the whole input.
+    """
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict_on_batch(self, batch):
+        self.batch_sizes.append(batch.shape[0])
+        height, width = batch.shape[1:3]
+        boxes  = np.tile(np.array([[[0, 0, width, height], [0, 0, 0, 0]]], dtype=np.float32), (batch.shape[0], 1, 1))
+        scores = np.tile(np.array([[0.9, -1]], dtype=np.float32), (batch.shape[0], 1))
+        labels = np.tile(np.array([[0, -1]], dtype=np.int32), (batch.shape[0], 1))
+        return boxes, scores, labels
+
+
+class FailingModel(object):
+    def predict_on_batch(self, batch):
+        raise RuntimeError('out of memory')
+
+
+def _encode(height, width):
+    return cv2.imencode('.png', np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+
+
+def test_micro_batcher_collects_batch():
+    batch_sizes = []
+
+    def predict_batch(inputs):
+        batch_sizes.append(len(inputs))
+        return [x * 2 for x in inputs]
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=4, max_wait_ms=500)
+    futures = [batcher.submit(x) for x in range(6)]
+    assert [f.result(timeout=5) for f in futures] == [0, 2, 4, 6, 8, 10]
+    batcher.close()
+
+    assert batch_sizes == [4, 2]
+
+
+def test_micro_batcher_propagates_errors():
+    def predict_batch(inputs):
+        raise RuntimeError('failure')
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=2, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.submit(1).result(timeout=5)
+    batcher.close()
+
+
+def test_server_roundtrip():
+    model   = StubModel()
+    service = InferenceService(model, min_side=100, max_side=200, max_batch_size=8, max_wait_ms=200)
+    server  = make_server(service, port=0)
+    thread  = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        client = InferenceClient('http://127.0.0.1:{}'.format(server.server_address[1]))
+        assert client.health()
+
+        results = [None] * 4
+
+        def request(index):
+            results[index] = client.detect(_encode(50, 100))
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(len(results))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # boxes are reported in original image coordinates
+        for detections in results:
+            assert len(detections) == 1
+            assert detections[0]['label'] == 0
+            assert detections[0]['score'] == pytest.approx(0.9)
+            np.testing.assert_almost_equal(detections[0]['box'], [0, 0, 100, 50], decimal=4)
+
+        # concurrent requests share batches
+        assert sum(model.batch_sizes) == 4
+        assert max(model.batch_sizes) > 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def test_server_model_error():
+    service = InferenceService(FailingModel(), min_side=100, max_side=200, max_wait_ms=1)
+    server  = make_server(service, port=0)
+    thread  = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        client = InferenceClient('http://127.0.0.1:{}'.format(server.server_address[1]))
+        for _ in range(2):
+            with pytest.raises(urllib.error.HTTPError) as e:
+                client.detect(_encode(50, 100))
+            assert e.value.code == 500
+            assert json.loads(e.value.read().decode('utf-8'))['error'] == 'RuntimeError: out of memory'
+
+        # the server still answers
+        assert client.health()
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
@@ -0,0 +1,79 @@
+import pickle
+
+import cv2
+import numpy as np
+import pytest
+
+from keras_retinanet.utils.image import decode_image_bgr, decode_image_bgr_resized, resize_image
+from keras_retinanet.utils.shards import ShardReader, ShardWriter
+
+
+def encode(width, height, value):
+    return cv2.imencode('.png', np.full((height, width, 3), value, dtype=np.uint8))[1].tobytes()
+
+
+@pytest.fixture
+def shard_path(tmp_path):
+    path = str(tmp_path / 'test-00000.shard')
+    with ShardWriter(path, ['Pedestrian', 'Car']) as writer:
+        writer.add('a', encode(40, 20, 10), 40, 20, [[1, 2, 3, 4], [5, 6, 7, 8]], [0, 1])
+        writer.add('b', encode(20, 40, 20), 20, 40, np.zeros((0, 4)), [])
+        writer.add('c', encode(30, 30, 30), 30, 30, [[0, 0, 10, 10]], [1])
+    return path
+
+
+def test_round_trip(shard_path):
+    reader = ShardReader(shard_path)
+
+    assert len(reader) == 3
+    assert reader.class_names == ['Pedestrian', 'Car']
+    assert reader.names.tolist() == ['a', 'b', 'c']
+    assert [reader.image_size(i) for i in range(3)] == [(40, 20), (20, 40), (30, 30)]
+
+    for i, value in enumerate([10, 20, 30]):
+        image = decode_image_bgr(reader.image_bytes(i))
+        assert (image.shape[1], image.shape[0]) == reader.image_size(i)
+        assert (image == value).all()
+
+    assert reader.annotations(0)['bboxes'].tolist() == [[1, 2, 3, 4], [5, 6, 7, 8]]
+    assert reader.annotations(0)['labels'].tolist() == [0, 1]
+    assert reader.annotations(1)['bboxes'].shape == (0, 4)
+    assert reader.annotations(2)['labels'].tolist() == [1]
+
+
+def test_annotations_are_copies(shard_path):
+    reader = ShardReader(shard_path)
+    reader.annotations(0)['bboxes'] *= 2
+    assert reader.annotations(0)['bboxes'][0].tolist() == [1, 2, 3, 4]
+
+
+def test_pickle(shard_path):
+    reader = pickle.loads(pickle.dumps(ShardReader(shard_path)))
+    assert (decode_image_bgr(reader.image_bytes(2)) == 30).all()
+
+
+def test_not_a_shard(tmp_path):
+    path = str(tmp_path / 'image.png')
+    with open(path, 'wb') as f:
+        f.write(encode(10, 10, 0))
+    with pytest.raises(ValueError, match='not a shard file'):
+        ShardReader(path)
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    path = str(tmp_path / 'test-00000.shard')
+    with pytest.raises(RuntimeError):
+        with ShardWriter(path, ['Pedestrian']) as writer:
+            writer.add('a', encode(10, 10, 0), 10, 10, [], [])
+            raise RuntimeError()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_decode_resized():
+    image           = np.random.randint(0, 255, (600, 900, 3), dtype=np.uint8)
+    buffer          = cv2.imencode('.jpg', image)[1]
+    expected, scale = resize_image(decode_image_bgr(buffer), min_side=200, max_side=400)
+
+    resized, resized_scale = decode_image_bgr_resized(buffer, 900, 600, min_side=200, max_side=400)
+    assert resized.shape == expected.shape
+    assert resized_scale == scale
@@ -0,0 +1,77 @@
+import numpy as np
+
+from keras_retinanet.utils.grid_cropper import ImageGridCropper
+from keras_retinanet.utils.tiling import crop_tiles, non_max_suppression, predict_tiled
+from .stubs import StubModel
+
+
+def bright_square(tile):
+    """ Reports the bright square of a tile, if it has one.
+    """
+    ys, xs = np.where(tile[..., 0] > 0)
+    if not len(xs):
+        return np.zeros((0, 4)), [], []
+    return [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], [0.9], [0]
+
+
+def test_crop_tiles_pads_small_images():
+    image   = np.ones((50, 60, 3), dtype=np.uint8)
+    cropper = ImageGridCropper(window_w=100, window_h=80, overlap_w=10, overlap_h=10, min_cropped_bbox_square=0)
+    tiles   = crop_tiles(image, cropper.get_image_grid(60, 50))
+    assert tiles.shape == (1, 80, 100, 3)
+    assert tiles[0, :50, :60].all()
+    assert not tiles[0, 50:].any()
+    assert not tiles[0, :, 60:].any()
+
+
+def test_non_max_suppression():
+    boxes  = np.array([
+        [0, 0, 10, 10],
+        [1, 1, 10, 10],
+        [0, 0, 10, 10],
+        [20, 20, 30, 30],
+    ], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.7, 0.6])
+    labels = np.array([0, 0, 1, 0])
+
+    keep = non_max_suppression(boxes, scores, labels, iou_threshold=0.5)
+    np.testing.assert_array_equal(keep, [1, 2, 3])
+
+    keep = non_max_suppression(boxes, scores, labels, iou_threshold=0.5, max_detections=2)
+    np.testing.assert_array_equal(keep, [1, 2])
+
+    assert non_max_suppression(np.zeros((0, 4)), np.zeros((0,)), np.zeros((0,))).shape == (0,)
+
+
+def test_predict_tiled_merges_tiles():
+    # an object in the overlap of the two tiles is seen by both tiles
+    image = np.zeros((100, 180, 3), dtype=np.uint8)
+    image[40:60, 90:100] = 255
+
+    model   = StubModel(bright_square, max_detections=2)
+    cropper = ImageGridCropper(window_w=100, window_h=100, overlap_w=20, overlap_h=0, min_cropped_bbox_square=0)
+    boxes, scores, labels = predict_tiled(model, image, cropper, preprocess_image=lambda x: x.astype(np.float32), batch_size=8)
+
+    assert model.batch_sizes == [2]
+    np.testing.assert_array_equal(boxes, [[90, 40, 100, 60]])
+    np.testing.assert_array_almost_equal(scores, [0.9])
+    np.testing.assert_array_equal(labels, [0])
+
+
+def test_predict_tiled_preprocesses_per_batch():
+    image = np.zeros((100, 340, 3), dtype=np.uint8)
+    image[40:60, 90:100] = 255
+
+    preprocessed = []
+
+    def preprocess_image(tiles):
+        preprocessed.append(len(tiles))
+        return tiles.astype(np.float32)
+
+    # only the tiles of one batch are preprocessed at a time, the detections are the same
+    model   = StubModel(bright_square, max_detections=2)
+    cropper = ImageGridCropper(window_w=100, window_h=100, overlap_w=20, overlap_h=0, min_cropped_bbox_square=0)
+    boxes, _, _ = predict_tiled(model, image, cropper, preprocess_image=preprocess_image, batch_size=3)
+
+    assert preprocessed == model.batch_sizes == [3, 1]
+    np.testing.assert_array_equal(boxes, [[90, 40, 100, 60]])
@@ -5,6 +5,7 @@ from math import pi
 from keras_retinanet.utils.transform import (
     colvec,
     transform_aabb,
+    transform_aabbs,
     rotation, random_rotation,
     translation, random_translation,
     scaling, random_scaling,
@@ -144,6 +145,19 @@ def test_transform_aabb():
     assert_almost_equal([ 2,  4,  4,  6], transform_aabb(translation([1, 2]), [1, 2, 3, 4]))
 
 
+def test_transform_aabbs():
+    boxes = np.array([
+        [1, 2, 3, 4],
+        [0, 0, 10, 5],
+        [-5, 3, 2, 8],
+    ], dtype=float)
+    for transform in [np.identity(3), rotation(0.3 * pi), translation([1, 2]), shear(0.1 * pi)]:
+        expected = [transform_aabb(transform, box) for box in boxes]
+        assert_almost_equal(expected, transform_aabbs(transform, boxes))
+
+    assert transform_aabbs(np.identity(3), np.zeros((0, 4))).shape == (0, 4)
+
+
 def test_change_transform_origin():
     assert np.array_equal(change_transform_origin(translation([3, 4]), [1, 2]), translation([3, 4]))
     assert_almost_equal(colvec(1, 2, 1), change_transform_origin(rotation(pi), [1, 2]).dot(colvec(1, 2, 1)))